@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "0002_product_stock_shards"
+down_revision = "0001_init"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "products",
+        sa.Column(
+            "inventory_mode", sa.String(length=16), nullable=False, server_default="single"
+        ),
+    )
+
+    op.create_table(
+        "product_stock_shards",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "product_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("products.id"),
+            nullable=False,
+        ),
+        sa.Column("shard_no", sa.Integer(), nullable=False),
+        sa.Column("stock_qty", sa.Integer(), nullable=False),
+        sa.UniqueConstraint("product_id", "shard_no", name="uq_product_stock_shard"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("product_stock_shards")
+    op.drop_column("products", "inventory_mode")
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0004_orders_user_created_index"
+down_revision = "0003_order_reservations"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Built concurrently so existing order traffic is not blocked; the new index also covers
+    # plain user_id lookups, so the single-column index goes away.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_orders_user_created",
+            "orders",
+            ["user_id", sa.text("created_at DESC"), sa.text("id DESC")],
+            postgresql_concurrently=True,
+        )
+        op.drop_index("ix_orders_user_id", table_name="orders", postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_orders_user_id", "orders", ["user_id"], postgresql_concurrently=True
+        )
+        op.drop_index(
+            "ix_orders_user_created", table_name="orders", postgresql_concurrently=True
+        )
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "0005_idempotency_claims"
+down_revision = "0004_orders_user_created_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing keys were only ever written once the checkout had finished.
+    op.add_column(
+        "idempotency_keys",
+        sa.Column("status", sa.String(length=16), nullable=False, server_default="COMPLETED"),
+    )
+    op.alter_column("idempotency_keys", "status", server_default=None)
+    op.alter_column(
+        "idempotency_keys",
+        "response",
+        existing_type=postgresql.JSONB(astext_type=sa.Text()),
+        nullable=True,
+    )
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM idempotency_keys WHERE status <> 'COMPLETED'")
+    op.alter_column(
+        "idempotency_keys",
+        "response",
+        existing_type=postgresql.JSONB(astext_type=sa.Text()),
+        nullable=False,
+    )
+    op.drop_column("idempotency_keys", "status")
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import zlib
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "0006_idempotency_retention"
+down_revision = "0005_idempotency_claims"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Responses move from JSONB to zlib-compressed JSON bytes.
+    op.add_column("idempotency_keys", sa.Column("response_z", sa.LargeBinary(), nullable=True))
+    bind = op.get_bind()
+    last_id = None
+    while True:
+        rows = bind.execute(
+            sa.text(
+                "SELECT id, response FROM idempotency_keys "
+                "WHERE response IS NOT NULL AND (CAST(:last_id AS uuid) IS NULL OR id > :last_id) "
+                "ORDER BY id LIMIT 1000"
+            ),
+            {"last_id": last_id},
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            sa.text("UPDATE idempotency_keys SET response_z = :packed WHERE id = :id"),
+            [
+                {"id": row.id, "packed": zlib.compress(json.dumps(row.response).encode("utf-8"))}
+                for row in rows
+            ],
+        )
+        last_id = rows[-1].id
+    op.drop_column("idempotency_keys", "response")
+    op.alter_column("idempotency_keys", "response_z", new_column_name="response")
+
+    # Purging walks created_at; the (user_id, key) unique index already serves user lookups.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_idempotency_keys_created_at",
+            "idempotency_keys",
+            ["created_at"],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_idempotency_keys_user_id",
+            table_name="idempotency_keys",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_idempotency_keys_user_id",
+            "idempotency_keys",
+            ["user_id"],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_idempotency_keys_created_at",
+            table_name="idempotency_keys",
+            postgresql_concurrently=True,
+        )
+
+    op.alter_column("idempotency_keys", "response", new_column_name="response_z")
+    op.add_column(
+        "idempotency_keys",
+        sa.Column("response", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+    bind = op.get_bind()
+    last_id = None
+    while True:
+        rows = bind.execute(
+            sa.text(
+                "SELECT id, response_z FROM idempotency_keys "
+                "WHERE response_z IS NOT NULL "
+                "AND (CAST(:last_id AS uuid) IS NULL OR id > :last_id) "
+                "ORDER BY id LIMIT 1000"
+            ),
+            {"last_id": last_id},
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            sa.text(
+                "UPDATE idempotency_keys SET response = CAST(:response AS jsonb) WHERE id = :id"
+            ),
+            [
+                {"id": row.id, "response": zlib.decompress(row.response_z).decode("utf-8")}
+                for row in rows
+            ],
+        )
+        last_id = rows[-1].id
+    op.drop_column("idempotency_keys", "response_z")
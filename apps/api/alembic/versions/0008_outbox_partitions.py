@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0008_outbox_partitions"
+down_revision = "0006_idempotency_retention"
+branch_labels = None
+depends_on = None
+
+# Must match OUTBOX_PARTITIONS at the time of the migration; see outbox_repo.outbox_partition.
+PARTITIONS = 16
+
+
+def upgrade() -> None:
+    op.add_column("outbox_events", sa.Column("partition_no", sa.SmallInteger(), nullable=True))
+    op.execute(
+        "UPDATE outbox_events SET partition_no = "
+        f"('x' || substr(md5(aggregate_id::text), 1, 8))::bit(32)::bigint % {PARTITIONS}"
+    )
+    op.alter_column("outbox_events", "partition_no", nullable=False)
+    op.create_index(
+        "ix_outbox_events_partition_pending",
+        "outbox_events",
+        ["partition_no", "created_at"],
+        postgresql_where=sa.text("status = 'PENDING'"),
+    )
+    # Claiming skips events behind an older pending event of the same aggregate; this keeps
+    # that check to the aggregate's own rows instead of the whole backlog.
+    op.create_index(
+        "ix_outbox_events_pending_aggregate",
+        "outbox_events",
+        ["aggregate_id", "created_at"],
+        postgresql_where=sa.text("status = 'PENDING'"),
+    )
+
+    op.create_table(
+        "outbox_partition_leases",
+        sa.Column("partition_no", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("owner", sa.String(length=128), nullable=True),
+        sa.Column("lease_until", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_table(
+        "outbox_consumers",
+        sa.Column("consumer_id", sa.String(length=128), primary_key=True),
+        sa.Column("heartbeat_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("outbox_consumers")
+    op.drop_table("outbox_partition_leases")
+    op.drop_index("ix_outbox_events_pending_aggregate", table_name="outbox_events")
+    op.drop_index("ix_outbox_events_partition_pending", table_name="outbox_events")
+    op.drop_column("outbox_events", "partition_no")
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0009_outbox_event_leases"
+down_revision = "0008_outbox_partitions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("outbox_events", sa.Column("locked_by", sa.String(length=128), nullable=True))
+    op.add_column(
+        "outbox_events", sa.Column("locked_until", sa.DateTime(timezone=True), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("outbox_events", "locked_until")
+    op.drop_column("outbox_events", "locked_by")
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0010_outbox_pending_index"
+down_revision = "0009_outbox_event_leases"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Claiming only ever looks at PENDING rows; a partial index stays the size of the backlog
+    # however many PROCESSED rows pile up, which the plain next_attempt_at index does not.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_outbox_events_pending_due",
+            "outbox_events",
+            ["next_attempt_at", "created_at"],
+            postgresql_where=sa.text("status = 'PENDING'"),
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_outbox_events_next_attempt",
+            table_name="outbox_events",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_outbox_events_next_attempt",
+            "outbox_events",
+            ["next_attempt_at"],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_outbox_events_pending_due",
+            table_name="outbox_events",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta, timezone
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "0011_outbox_time_partitions"
+down_revision = "0010_outbox_pending_index"
+branch_labels = None
+depends_on = None
+
+# OUTBOX_PARTITION_DAYS / OUTBOX_PARTITIONS_AHEAD at the time of the migration; the worker keeps
+# creating partitions ahead from the last one on.
+PARTITION_DAYS = 1
+PARTITIONS_AHEAD = 3
+
+COLUMNS = (
+    "id, aggregate_type, aggregate_id, partition_no, event_type, payload, status, attempt_count, "
+    "next_attempt_at, processed_at, last_error, created_at, locked_by, locked_until"
+)
+
+
+def _columns() -> list[sa.Column]:
+    return [
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("aggregate_type", sa.String(length=64), nullable=False),
+        sa.Column("aggregate_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("partition_no", sa.SmallInteger(), nullable=False),
+        sa.Column("event_type", sa.String(length=64), nullable=False),
+        sa.Column("payload", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("attempt_count", sa.Integer(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_error", sa.String(length=1024), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("locked_by", sa.String(length=128), nullable=True),
+        sa.Column("locked_until", sa.DateTime(timezone=True), nullable=True),
+    ]
+
+
+def _create_indexes() -> None:
+    op.create_index("ix_outbox_events_status", "outbox_events", ["status"])
+    op.create_index(
+        "ix_outbox_events_partition_pending",
+        "outbox_events",
+        ["partition_no", "created_at"],
+        postgresql_where=sa.text("status = 'PENDING'"),
+    )
+    op.create_index(
+        "ix_outbox_events_pending_due",
+        "outbox_events",
+        ["next_attempt_at", "created_at"],
+        postgresql_where=sa.text("status = 'PENDING'"),
+    )
+    op.create_index(
+        "ix_outbox_events_pending_aggregate",
+        "outbox_events",
+        ["aggregate_id", "created_at"],
+        postgresql_where=sa.text("status = 'PENDING'"),
+    )
+
+
+def _drop_indexes(table: str) -> None:
+    for name in (
+        "ix_outbox_events_status",
+        "ix_outbox_events_partition_pending",
+        "ix_outbox_events_pending_due",
+        "ix_outbox_events_pending_aggregate",
+    ):
+        op.drop_index(name, table_name=table)
+
+
+def _create_partition(start: date, end: date) -> None:
+    # Same naming as repo/outbox_archive_repo.py, which reads the bounds back from the name.
+    op.execute(
+        f"CREATE TABLE outbox_events_{start:%Y%m%d}_{end:%Y%m%d} PARTITION OF outbox_events "
+        f"FOR VALUES FROM ('{start.isoformat()} 00:00+00') TO ('{end.isoformat()} 00:00+00')"
+    )
+
+
+def upgrade() -> None:
+    # Index and constraint names are schema-wide, so the old table gives them up first.
+    op.rename_table("outbox_events", "outbox_events_unpartitioned")
+    op.execute(
+        "ALTER TABLE outbox_events_unpartitioned "
+        "RENAME CONSTRAINT outbox_events_pkey TO outbox_events_unpartitioned_pkey"
+    )
+    _drop_indexes("outbox_events_unpartitioned")
+
+    # The partition key has to be part of the primary key.
+    op.create_table(
+        "outbox_events",
+        *_columns(),
+        sa.PrimaryKeyConstraint("id", "created_at", name="outbox_events_pkey"),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    _create_indexes()
+
+    bind = op.get_bind()
+    today = datetime.now(timezone.utc).date()
+    oldest = bind.execute(sa.text("SELECT min(created_at) FROM outbox_events_unpartitioned"))
+    oldest_at = oldest.scalar()
+    # Existing history goes into one partition; it is archived like any other once it is done.
+    if oldest_at is not None and oldest_at.astimezone(timezone.utc).date() < today:
+        _create_partition(oldest_at.astimezone(timezone.utc).date(), today)
+    start = today
+    while start <= today + timedelta(days=PARTITIONS_AHEAD):
+        _create_partition(start, start + timedelta(days=PARTITION_DAYS))
+        start += timedelta(days=PARTITION_DAYS)
+    # Catches rows outside every range (e.g. when maintenance has not run for days) so inserts
+    # never fail; it is expected to stay empty.
+    op.execute("CREATE TABLE outbox_events_default PARTITION OF outbox_events DEFAULT")
+
+    op.execute(
+        f"INSERT INTO outbox_events ({COLUMNS}) SELECT {COLUMNS} FROM outbox_events_unpartitioned"
+    )
+    op.drop_table("outbox_events_unpartitioned")
+    op.execute("CREATE SCHEMA IF NOT EXISTS outbox_archive")
+
+
+def downgrade() -> None:
+    # The outbox_archive schema is left in place with whatever was archived into it.
+    op.rename_table("outbox_events", "outbox_events_partitioned")
+    op.execute(
+        "ALTER TABLE outbox_events_partitioned "
+        "RENAME CONSTRAINT outbox_events_pkey TO outbox_events_partitioned_pkey"
+    )
+    _drop_indexes("outbox_events_partitioned")
+    op.create_table(
+        "outbox_events",
+        *_columns(),
+        sa.PrimaryKeyConstraint("id", name="outbox_events_pkey"),
+    )
+    _create_indexes()
+    op.execute(
+        f"INSERT INTO outbox_events ({COLUMNS}) SELECT {COLUMNS} FROM outbox_events_partitioned"
+    )
+    op.drop_table("outbox_events_partitioned")
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "0012_outbox_deliveries"
+down_revision = "0011_outbox_time_partitions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "outbox_deliveries",
+        sa.Column("subscription", sa.String(length=64), nullable=False),
+        sa.Column("event_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("event_created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("aggregate_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("event_type", sa.String(length=64), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("attempt_count", sa.Integer(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_error", sa.String(length=1024), nullable=True),
+        sa.Column("locked_by", sa.String(length=128), nullable=True),
+        sa.Column("locked_until", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("subscription", "event_id"),
+    )
+    op.create_index(
+        "ix_outbox_deliveries_pending_due",
+        "outbox_deliveries",
+        ["subscription", "next_attempt_at"],
+        postgresql_where=sa.text("status = 'PENDING'"),
+    )
+    # Lookups by event and retention's deletes by a partition's created_at range.
+    op.create_index(
+        "ix_outbox_deliveries_event",
+        "outbox_deliveries",
+        ["event_created_at", "event_id"],
+    )
+    # The held-back check: older pending deliveries of the same aggregate.
+    op.create_index(
+        "ix_outbox_deliveries_pending_aggregate",
+        "outbox_deliveries",
+        ["subscription", "aggregate_id", "event_created_at"],
+        postgresql_where=sa.text("status = 'PENDING'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_outbox_deliveries_pending_aggregate", table_name="outbox_deliveries")
+    op.drop_index("ix_outbox_deliveries_event", table_name="outbox_deliveries")
+    op.drop_index("ix_outbox_deliveries_pending_due", table_name="outbox_deliveries")
+    op.drop_table("outbox_deliveries")
@@ -12,6 +12,9 @@ from eventcart.services.auth_service import authenticate_user, logout, refresh_t
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
+# None of these routes is @idempotent. Register, login and refresh answer with the access token
+# and the refresh cookie, which must not be kept in idempotency_keys; logout needs no key, since
+# repeating it changes nothing, and it is usually sent without an access token to scope one by.
 @router.post("/register", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
 async def register(
     payload: RegisterRequest, response: Response, session: AsyncSession = Depends(get_session)
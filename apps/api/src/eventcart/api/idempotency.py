@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import hashlib
+import zlib
+from datetime import datetime, timezone
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from jose import JWTError
+from starlette.requests import cookie_parser
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from eventcart.core.security import decode_token
+from eventcart.db.session import SessionLocal
+from eventcart.schemas.common import ProblemDetail
+from eventcart.services.idempotency_service import (
+    claim_key,
+    release_key,
+    request_hash,
+    single_flight,
+    store_response,
+)
+
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def idempotent(endpoint):
+    # Opts a route into IdempotencyMiddleware: a repeated Idempotency-Key replays the stored
+    # response bytes instead of calling the endpoint again.
+    endpoint.__idempotent__ = True
+    return endpoint
+
+
+def _pack(status_code: int, headers: list[tuple[bytes, bytes]], body: bytes) -> bytes:
+    meta = orjson.dumps(
+        {
+            "status": status_code,
+            "headers": [[k.decode("latin-1"), v.decode("latin-1")] for k, v in headers],
+        }
+    )
+    return zlib.compress(len(meta).to_bytes(4, "big") + meta + body)
+
+
+def _unpack(packed: bytes) -> tuple[int, list[tuple[bytes, bytes]], bytes]:
+    raw = zlib.decompress(packed)
+    size = int.from_bytes(raw[:4], "big")
+    meta = orjson.loads(raw[4 : 4 + size])
+    headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in meta["headers"]]
+    return meta["status"], headers, raw[4 + size :]
+
+
+def _idempotent_routes(routes) -> list:
+    found = []
+    for route in routes:
+        # Newer FastAPI keeps included routers as a single wrapper route.
+        included = getattr(route, "original_router", None)
+        if included is not None:
+            found.extend(_idempotent_routes(included.routes))
+        elif getattr(getattr(route, "endpoint", None), "__idempotent__", False):
+            found.append(route)
+    return found
+
+
+def _user_id(headers: dict[str, str]) -> str | None:
+    auth_header = headers.get("authorization", "")
+    if not auth_header.startswith("Bearer "):
+        return None
+    try:
+        payload = decode_token(auth_header.replace("Bearer ", "", 1))
+    except JWTError:
+        return None
+    return payload.get("sub") if payload.get("type") == "access" else None
+
+
+def _refresh_cookie(headers: dict[str, str]) -> str:
+    return cookie_parser(headers.get("cookie", "")).get("refresh_token", "")
+
+
+def _problem(scope: Scope, exc: HTTPException) -> JSONResponse:
+    problem = ProblemDetail(
+        title="Request failed",
+        status=exc.status_code,
+        detail=str(exc.detail),
+        instance=scope["path"],
+        timestamp=datetime.now(timezone.utc),
+    )
+    return JSONResponse(
+        status_code=exc.status_code,
+        content=problem.model_dump(mode="json"),
+        media_type="application/problem+json",
+        headers=exc.headers,
+    )
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._routes: list | None = None
+
+    def _route_for(self, scope: Scope):
+        if self._routes is None:
+            self._routes = _idempotent_routes(scope["app"].router.routes)
+        for route in self._routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in MUTATING_METHODS:
+            await self.app(scope, receive, send)
+            return
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        client_key = headers.get("idempotency-key")
+        route = self._route_for(scope) if client_key else None
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Keys are per endpoint, so one client key cannot replay another endpoint's response.
+        key = f"{route.endpoint.__name__}|{client_key}"
+        if len(key) > 128:
+            await _problem(scope, HTTPException(400, "Idempotency-Key too long"))(
+                scope, receive, send
+            )
+            return
+
+        user_id = _user_id(headers)
+        if user_id is None:
+            # Keys are scoped per user. Without one the endpoint runs as usual (and answers 401).
+            await self.app(scope, receive, send)
+            return
+        body = await self._read_body(receive)
+        payload_hash = request_hash(
+            {
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope["query_string"].decode("latin-1"),
+                "body": hashlib.sha256(body).hexdigest(),
+                # Refresh and logout act on the refresh cookie, so it is part of the request a
+                # replay must match.
+                "credentials": hashlib.sha256(
+                    (headers.get("authorization", "") + _refresh_cookie(headers)).encode()
+                ).hexdigest(),
+            }
+        )
+
+        async def run() -> bytes:
+            async with SessionLocal() as session:
+                async with session.begin():
+                    stored = await claim_key(session, user_id, key, payload_hash)
+            if stored is not None:
+                return stored
+            try:
+                status_code, response_headers, response_body = await self._capture(
+                    scope, body, receive
+                )
+            except BaseException:
+                async with SessionLocal() as session:
+                    async with session.begin():
+                        await release_key(session, user_id, key)
+                raise
+            packed = _pack(status_code, response_headers, response_body)
+            async with SessionLocal() as session:
+                async with session.begin():
+                    # Errors are not kept, so a retry after e.g. a 401 or 400 runs again.
+                    if status_code < 400:
+                        await store_response(session, user_id, key, packed)
+                    else:
+                        await release_key(session, user_id, key)
+            return packed
+
+        try:
+            packed = await single_flight(user_id, key, payload_hash, run)
+        except HTTPException as exc:
+            await _problem(scope, exc)(scope, receive, send)
+            return
+        status_code, response_headers, response_body = _unpack(packed)
+        await send(
+            {"type": "http.response.start", "status": status_code, "headers": response_headers}
+        )
+        await send({"type": "http.response.body", "body": response_body})
+
+    async def _read_body(self, receive: Receive) -> bytes:
+        chunks: list[bytes] = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        return b"".join(chunks)
+
+    async def _capture(
+        self, scope: Scope, body: bytes, receive: Receive
+    ) -> tuple[int, list[tuple[bytes, bytes]], bytes]:
+        replayed = False
+
+        async def replay_receive() -> Message:
+            nonlocal replayed
+            if replayed:
+                return await receive()
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        start: Message = {}
+        chunks: list[bytes] = []
+
+        async def capture_send(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, replay_receive, capture_send)
+        return start["status"], list(start.get("headers", [])), b"".join(chunks)
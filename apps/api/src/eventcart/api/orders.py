@@ -1,17 +1,77 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Header, HTTPException, status
+import base64
+import uuid
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from eventcart.core import order_cache
 from eventcart.core.deps import get_current_user
+from eventcart.core.settings import settings
 from eventcart.db.session import get_session
-from eventcart.repo.order_repo import get_order, list_order_items, list_orders
-from eventcart.schemas.order import OrderCreate, OrderResponse
-from eventcart.services.order_service import create_order_with_idempotency
+from eventcart.models.order import Order
+from eventcart.models.order_item import OrderItem
+from eventcart.repo.order_repo import (
+    get_order,
+    list_items_for_orders,
+    list_order_items,
+    list_orders,
+)
+from eventcart.schemas.order import (
+    OrderBatchCreate,
+    OrderBatchResponse,
+    OrderBatchResult,
+    OrderCreate,
+    OrderResponse,
+)
+from eventcart.services.checkout_coalescer import checkout_coalescer
+from eventcart.services.idempotency_service import request_hash, single_flight
+from eventcart.services.order_service import create_order_with_idempotency, create_orders_batch
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
 
+def _encode_cursor(order: Order) -> str:
+    raw = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode().split("|")
+        after = datetime.fromisoformat(created_at)
+        # Cursors always carry an offset; a naive one was not issued here.
+        if after.tzinfo is None:
+            raise ValueError("naive cursor timestamp")
+        return after, str(uuid.UUID(order_id))
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        ) from exc
+
+
+def _order_response(order: Order, items: list[OrderItem]) -> OrderResponse:
+    return OrderResponse(
+        id=str(order.id),
+        status=order.status,
+        total_cents=order.total_cents,
+        created_at=order.created_at,
+        updated_at=order.updated_at,
+        reserved_until=order.reserved_until,
+        items=[
+            {
+                "id": str(item.id),
+                "product_id": str(item.product_id),
+                "qty": item.qty,
+                "unit_price_cents": item.unit_price_cents,
+            }
+            for item in items
+        ],
+    )
+
+
 @router.post("", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
 async def create_order(
     payload: OrderCreate,
@@ -19,43 +79,77 @@ async def create_order(
     current_user=Depends(get_current_user),
     idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
 ) -> OrderResponse:
-    async with session.begin():
-        response = await create_order_with_idempotency(
-            session,
-            str(current_user.id),
-            [item.model_dump() for item in payload.items],
-            idempotency_key,
-        )
+    user_id = str(current_user.id)
+    items_payload = [item.model_dump() for item in payload.items]
+
+    async def checkout() -> dict:
+        if settings.checkout_coalesce_enabled:
+            return await checkout_coalescer.submit(user_id, items_payload, idempotency_key)
+        async with session.begin():
+            return await create_order_with_idempotency(
+                session, user_id, items_payload, idempotency_key
+            )
+
+    response = await single_flight(
+        user_id, idempotency_key, request_hash({"items": items_payload}), checkout
+    )
     return OrderResponse(**response)
 
 
+@router.post("/batch", response_model=OrderBatchResponse)
+async def create_order_batch(
+    payload: OrderBatchCreate,
+    session: AsyncSession = Depends(get_session),
+    current_user=Depends(get_current_user),
+) -> OrderBatchResponse:
+    if len(payload.carts) > settings.order_batch_max_carts:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.order_batch_max_carts} carts per batch",
+        )
+    carts = [
+        {
+            "user_id": str(current_user.id),
+            "items": [item.model_dump() for item in cart.items],
+            "idempotency_key": cart.idempotency_key,
+        }
+        for cart in payload.carts
+    ]
+    results: list[dict] = []
+    chunk_size = settings.order_batch_chunk_size
+    for start in range(0, len(carts), chunk_size):
+        async with session.begin():
+            results.extend(await create_orders_batch(session, carts[start : start + chunk_size]))
+    return OrderBatchResponse(
+        results=[OrderBatchResult(index=index, **result) for index, result in enumerate(results)]
+    )
+
+
 @router.get("", response_model=list[OrderResponse])
 async def list_user_orders(
-    session: AsyncSession = Depends(get_session), current_user=Depends(get_current_user)
+    response: Response,
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: str | None = None,
+    order_status: str | None = Query(default=None, alias="status"),
+    session: AsyncSession = Depends(get_session),
+    current_user=Depends(get_current_user),
 ) -> list[OrderResponse]:
-    orders = await list_orders(session, str(current_user.id))
-    responses: list[OrderResponse] = []
-    for order in orders:
-        items = await list_order_items(session, str(order.id))
-        responses.append(
-            OrderResponse(
-                id=str(order.id),
-                status=order.status,
-                total_cents=order.total_cents,
-                created_at=order.created_at,
-                updated_at=order.updated_at,
-                items=[
-                    {
-                        "id": str(item.id),
-                        "product_id": str(item.product_id),
-                        "qty": item.qty,
-                        "unit_price_cents": item.unit_price_cents,
-                    }
-                    for item in items
-                ],
-            )
-        )
-    return responses
+    before = _decode_cursor(cursor) if cursor else None
+    orders = await list_orders(
+        session, str(current_user.id), limit=limit + 1, before=before, status=order_status
+    )
+    if len(orders) > limit:
+        orders = orders[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(orders[-1])
+    items = await list_items_for_orders(session, [str(order.id) for order in orders])
+    return [_order_response(order, items[str(order.id)]) for order in orders]
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
 
 
 @router.get("/{order_id}", response_model=OrderResponse)
@@ -63,24 +157,19 @@ async def get_order_detail(
     order_id: str,
     session: AsyncSession = Depends(get_session),
     current_user=Depends(get_current_user),
-) -> OrderResponse:
+    if_none_match: str | None = Header(default=None),
+) -> Response:
     order = await get_order(session, str(current_user.id), order_id)
     if not order:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
-    items = await list_order_items(session, str(order.id))
-    return OrderResponse(
-        id=str(order.id),
-        status=order.status,
-        total_cents=order.total_cents,
-        created_at=order.created_at,
-        updated_at=order.updated_at,
-        items=[
-            {
-                "id": str(item.id),
-                "product_id": str(item.product_id),
-                "qty": item.qty,
-                "unit_price_cents": item.unit_price_cents,
-            }
-            for item in items
-        ],
-    )
+    order_key = str(order.id)
+    headers = {"ETag": order_cache.order_etag(order_key, order.updated_at)}
+    if _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    body = order_cache.get_rendered(order_key, order.updated_at)
+    if body is None:
+        items = await list_order_items(session, order_key)
+        body = _order_response(order, items).model_dump_json().encode("utf-8")
+        order_cache.put_rendered(order_key, order.updated_at, body)
+    return Response(content=body, media_type="application/json", headers=headers)
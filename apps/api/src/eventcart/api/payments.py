@@ -3,6 +3,7 @@ from __future__ import annotations
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from eventcart.api.idempotency import idempotent
 from eventcart.core.deps import get_current_user
 from eventcart.db.session import get_session
 from eventcart.repo.order_repo import get_order
@@ -12,6 +13,7 @@ router = APIRouter(prefix="/payments", tags=["payments"])
 
 
 @router.post("/confirm/{order_id}", status_code=status.HTTP_200_OK)
+@idempotent
 async def confirm_order_payment(
     order_id: str,
     session: AsyncSession = Depends(get_session),
@@ -6,6 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from eventcart.db.session import get_session
 from eventcart.repo.product_repo import list_products
 from eventcart.schemas.product import ProductResponse
+from eventcart.services.inventory_service import sharded_stock_levels
 
 router = APIRouter(prefix="/products", tags=["products"])
 
@@ -13,13 +14,16 @@ router = APIRouter(prefix="/products", tags=["products"])
 @router.get("", response_model=list[ProductResponse])
 async def get_products(session: AsyncSession = Depends(get_session)) -> list[ProductResponse]:
     products = await list_products(session)
+    sharded_stock: dict[str, int] = {}
+    if any(product.inventory_mode == "sharded" for product in products):
+        sharded_stock = await sharded_stock_levels(session)
     return [
         ProductResponse(
             id=str(product.id),
             sku=product.sku,
             name=product.name,
             price_cents=product.price_cents,
-            stock_qty=product.stock_qty,
+            stock_qty=sharded_stock.get(str(product.id), product.stock_qty),
         )
         for product in products
     ]
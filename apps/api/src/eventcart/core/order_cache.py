@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+from datetime import datetime
+
+from eventcart.core.settings import settings
+
+# Rendered order JSON keyed by order id. Entries remember the updated_at they were rendered
+# from, so a change made by another process (the worker) is never served once the row is re-read.
+_entries: OrderedDict[str, tuple[datetime, bytes]] = OrderedDict()
+
+
+def order_etag(order_id: str, updated_at: datetime) -> str:
+    # Items never change after checkout, so id + updated_at identify the exact representation.
+    digest = hashlib.blake2b(
+        f"{order_id}:{updated_at.isoformat()}".encode("utf-8"), digest_size=12
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def get_rendered(order_id: str, updated_at: datetime) -> bytes | None:
+    entry = _entries.get(order_id)
+    if entry is None or entry[0] != updated_at:
+        return None
+    _entries.move_to_end(order_id)
+    return entry[1]
+
+
+def put_rendered(order_id: str, updated_at: datetime, body: bytes) -> None:
+    _entries[order_id] = (updated_at, body)
+    _entries.move_to_end(order_id)
+    while len(_entries) > settings.order_cache_size:
+        _entries.popitem(last=False)
+
+
+def invalidate(*order_ids: str) -> None:
+    for order_id in order_ids:
+        _entries.pop(order_id, None)
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -16,9 +18,78 @@ class Settings(BaseSettings):
 
     database_url: str
     database_url_sync: str
+    # Per process. The worker supervisor sizes each worker process's pool to worker_concurrency
+    # unless DB_POOL_SIZE / DB_MAX_OVERFLOW are set.
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+
+    inventory_strategy: Literal["locking", "optimistic"] = "locking"
+    inventory_shard_cache_seconds: float = 1.0
+    order_reservation_minutes: int = 15
+    order_batch_max_carts: int = 500
+    order_batch_chunk_size: int = 100
+    checkout_coalesce_enabled: bool = False
+    checkout_coalesce_window_ms: float = 5.0
+    checkout_coalesce_max_batch: int = 50
+    order_cache_size: int = 10_000
+    idempotency_retention_hours: float = 24
+    idempotency_claim_timeout_seconds: float = 60
+    idempotency_purge_interval_seconds: float = 300
+    idempotency_purge_batch_size: int = 1000
 
     worker_poll_interval_seconds: float = 1.5
+    # With LISTEN/NOTIFY working, an idle worker only re-polls this often (or when a delayed
+    # event becomes due); worker_poll_interval_seconds applies while the listener is down.
+    worker_listen_enabled: bool = True
+    worker_fallback_poll_seconds: float = 30.0
     worker_max_attempts: int = 8
+    # The claim size starts at worker_batch_size and adapts: it grows while claims come back full
+    # and a pass stays under worker_batch_target_seconds, up to worker_batch_size_max.
+    worker_batch_size: int = 10
+    worker_batch_size_max: int = 500
+    worker_batch_target_seconds: float = 0.5
+    worker_stats_interval_seconds: float = 15.0
+    # The backlog and pending gauges count at most this many rows per refresh, so a deep backlog
+    # does not turn every stats interval into a full scan; past it they read as "at least".
+    worker_stats_count_limit: int = 10_000
+    # Prometheus text format on http://<worker>:<port>/metrics (0 = off) and/or written to a file
+    # for node_exporter's textfile collector; database-backed gauges refresh every stats interval.
+    worker_metrics_port: int = 0
+    worker_metrics_textfile: str = ""
+    worker_concurrency: int = 8
+    # Worker processes run by the supervisor (0 = one per CPU); 1 runs the loop in-process. On
+    # SIGTERM each gets worker_shutdown_seconds to finish its in-flight batch before it is killed.
+    worker_processes: int = 0
+    worker_shutdown_seconds: float = 30.0
+    # Changing the partition count re-homes aggregates; drain the outbox first.
+    outbox_partitions: int = 16
+    worker_lease_seconds: float = 30.0
+    # How long a claimed event stays reserved for its worker; a crashed worker's events are
+    # picked up again once it runs out. Handlers must finish well within it.
+    worker_event_lease_seconds: float = 60.0
+    # outbox_events is range-partitioned on created_at, outbox_partition_days per partition, and
+    # the worker keeps outbox_partitions_ahead of them created in advance. Partitions older than
+    # outbox_retention_days holding only PROCESSED/DEAD events are dropped, or with "archive"
+    # moved into the outbox_archive schema.
+    outbox_partition_days: int = 1
+    outbox_partitions_ahead: int = 3
+    outbox_retention_days: int = 7
+    outbox_archive_mode: Literal["drop", "archive"] = "drop"
+    outbox_maintenance_interval_seconds: float = 3600
+    # Finished subscription deliveries of a retired partition are deleted in chunks this size,
+    # before the partition is detached.
+    outbox_retention_batch_size: int = 5000
+    # Where the relay subscription ("relay" in outbox_subscriptions) publishes every event:
+    # file:///path/events.jsonl, redis://host:6379/0?stream=eventcart.outbox[&maxlen=n] or
+    # redis+unix:///path/redis.sock?stream=... . Each pass pipelines up to outbox_relay_in_flight
+    # batches of outbox_relay_batch_size.
+    outbox_relay_url: str = ""
+    outbox_relay_batch_size: int = 100
+    outbox_relay_in_flight: int = 4
+    # Named subscriptions (services/subscriptions.py) that get their own delivery of each event
+    # they subscribe to, comma-separated. Only enabled ones are written, and each needs a worker
+    # pool of its own (--subscription NAME), or its deliveries pile up and hold back retention.
+    outbox_subscriptions: str = ""
 
     seed_demo_email: str = "demo@eventcart.dev"
     seed_demo_password: str = "Demo1234!"
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 
 import structlog
@@ -12,28 +13,42 @@ from fastapi.responses import JSONResponse
 
 from eventcart.api.auth import router as auth_router
 from eventcart.api.health import router as health_router
+from eventcart.api.idempotency import IdempotencyMiddleware
 from eventcart.api.orders import router as orders_router
 from eventcart.api.payments import router as payments_router
 from eventcart.api.products import router as products_router
 from eventcart.core.logging import configure_logging
 from eventcart.core.settings import settings
 from eventcart.schemas.common import ProblemDetail
+from eventcart.services.checkout_coalescer import checkout_coalescer
 
 configure_logging(settings.api_log_level)
 logger = structlog.get_logger()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Let checkouts already waiting in the coalescer commit before shutting down.
+    await checkout_coalescer.close()
+
+
 app = FastAPI(
     title="EventCart API",
     description="Order system with outbox pattern and async processing.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
+# Innermost, so replayed responses still get CORS and X-Request-ID headers from the layers above.
+app.add_middleware(IdempotencyMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.allowed_origins_list(),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 
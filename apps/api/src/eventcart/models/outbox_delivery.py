@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import DateTime, Index, Integer, String, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from eventcart.db.base import Base
+
+
+class OutboxDelivery(Base):
+    # One row per event and named subscription that wants it, written with the event. Each
+    # subscription has its own status, retries and lease per event, next to the event's own
+    # status (which stays with the worker's handlers).
+    __tablename__ = "outbox_deliveries"
+    __table_args__ = (
+        Index(
+            "ix_outbox_deliveries_pending_due",
+            "subscription",
+            "next_attempt_at",
+            postgresql_where=text("status = 'PENDING'"),
+        ),
+        Index("ix_outbox_deliveries_event", "event_created_at", "event_id"),
+        Index(
+            "ix_outbox_deliveries_pending_aggregate",
+            "subscription",
+            "aggregate_id",
+            "event_created_at",
+            postgresql_where=text("status = 'PENDING'"),
+        ),
+    )
+
+    subscription: Mapped[str] = mapped_column(String(64), primary_key=True)
+    event_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    # With event_id, the primary key of the event row; no foreign key, since outbox partitions
+    # are detached and dropped (their deliveries go with them).
+    event_created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    aggregate_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    event_type: Mapped[str] = mapped_column(String(64), nullable=False)
+    status: Mapped[str] = mapped_column(String(16), default="PENDING", nullable=False)
+    attempt_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False
+    )
+    processed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+    locked_by: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    locked_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
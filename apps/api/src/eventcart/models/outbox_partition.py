@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from eventcart.db.base import Base
+
+
+class OutboxPartitionLease(Base):
+    __tablename__ = "outbox_partition_leases"
+
+    partition_no: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    owner: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    lease_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class OutboxConsumer(Base):
+    # Worker heartbeats; the number of live consumers decides each one's share of partitions.
+    __tablename__ = "outbox_consumers"
+
+    consumer_id: Mapped[str] = mapped_column(String(128), primary_key=True)
+    heartbeat_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
@@ -18,6 +18,9 @@ class Product(Base):
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     price_cents: Mapped[int] = mapped_column(Integer, nullable=False)
     stock_qty: Mapped[int] = mapped_column(Integer, nullable=False)
+    # "single" keeps stock in stock_qty; "sharded" spreads it over product_stock_shards rows and
+    # leaves stock_qty at 0.
+    inventory_mode: Mapped[str] = mapped_column(String(16), default="single", nullable=False)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False
     )
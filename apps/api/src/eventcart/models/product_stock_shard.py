@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import uuid
+
+from sqlalchemy import ForeignKey, Integer, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from eventcart.db.base import Base
+
+
+class ProductStockShard(Base):
+    __tablename__ = "product_stock_shards"
+    __table_args__ = (UniqueConstraint("product_id", "shard_no", name="uq_product_stock_shard"),)
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    product_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("products.id"), nullable=False
+    )
+    shard_no: Mapped[int] = mapped_column(Integer, nullable=False)
+    stock_qty: Mapped[int] = mapped_column(Integer, nullable=False)
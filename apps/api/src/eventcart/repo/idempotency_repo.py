@@ -1,26 +1,110 @@
 from __future__ import annotations
 
-from sqlalchemy import select
+from datetime import datetime
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from eventcart.models.idempotency import IdempotencyKey
 
 
+def _key_filter(user_id: str, key: str):
+    return IdempotencyKey.user_id == user_id, IdempotencyKey.key == key
+
+
 async def get_idempotency_key(
     session: AsyncSession, user_id: str, key: str
 ) -> IdempotencyKey | None:
     result = await session.execute(
-        select(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        select(IdempotencyKey)
+        .where(*_key_filter(user_id, key))
+        .execution_options(populate_existing=True)
     )
     return result.scalar_one_or_none()
 
 
-async def create_idempotency_key(
-    session: AsyncSession, user_id: str, key: str, request_hash: str, response: dict
-) -> IdempotencyKey:
-    record = IdempotencyKey(
-        user_id=user_id, key=key, request_hash=request_hash, response=response
+async def claim_idempotency_key(
+    session: AsyncSession,
+    user_id: str,
+    key: str,
+    request_hash: str,
+    now: datetime,
+    expired_before: datetime,
+    stale_before: datetime,
+) -> IdempotencyKey | None:
+    # Returns None when this transaction now owns the key, otherwise the existing record. If
+    # another transaction holds an uncommitted claim, the INSERT waits for it to finish. A key
+    # past its retention window counts as free even if the purge has not removed it yet, and so
+    # does a committed IN_PROGRESS claim whose owner died before finishing.
+    # Replays are the common case, and the upsert would row-lock the completed record on every
+    # one of them, so a live completed record is read with a plain SELECT first.
+    existing = await get_idempotency_key(session, user_id, key)
+    if (
+        existing is not None
+        and existing.status == "COMPLETED"
+        and existing.created_at >= expired_before
+    ):
+        return existing
+    stmt = insert(IdempotencyKey).values(
+        user_id=user_id, key=key, request_hash=request_hash, status="IN_PROGRESS", created_at=now
+    )
+    result = await session.execute(
+        stmt.on_conflict_do_update(
+            constraint="uq_user_idempotency",
+            set_={
+                "request_hash": stmt.excluded.request_hash,
+                "status": stmt.excluded.status,
+                "response": None,
+                "created_at": stmt.excluded.created_at,
+            },
+            where=or_(
+                IdempotencyKey.created_at < expired_before,
+                (IdempotencyKey.status == "IN_PROGRESS")
+                & (IdempotencyKey.created_at < stale_before),
+            ),
+        ).returning(IdempotencyKey.id)
+    )
+    if result.first() is not None:
+        return None
+    return await get_idempotency_key(session, user_id, key)
+
+
+async def complete_idempotency_key(
+    session: AsyncSession, user_id: str, key: str, response: bytes
+) -> None:
+    await session.execute(
+        update(IdempotencyKey)
+        .where(*_key_filter(user_id, key))
+        .values(status="COMPLETED", response=response)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def release_idempotency_key(
+    session: AsyncSession, user_id: str, key: str
+) -> None:
+    await session.execute(
+        delete(IdempotencyKey)
+        .where(*_key_filter(user_id, key), IdempotencyKey.status == "IN_PROGRESS")
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def purge_idempotency_keys(
+    session: AsyncSession, expired_before: datetime, limit: int
+) -> int:
+    # One bounded chunk per call; rows a live request is touching are skipped, not waited on.
+    expired = (
+        select(IdempotencyKey.id)
+        .where(IdempotencyKey.created_at < expired_before)
+        .order_by(IdempotencyKey.created_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await session.execute(
+        delete(IdempotencyKey)
+        .where(IdempotencyKey.id.in_(expired.scalar_subquery()))
+        .execution_options(synchronize_session=False)
     )
-    session.add(record)
-    await session.flush()
-    return record
+    return result.rowcount
@@ -1,18 +1,27 @@
 from __future__ import annotations
 
+import uuid
 from datetime import datetime, timezone
 
-from sqlalchemy import select
+from sqlalchemy import any_, bindparam, insert, select, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from eventcart.core import order_cache
 from eventcart.models.order import Order
 from eventcart.models.order_item import OrderItem
 
 
 async def create_order(
-    session: AsyncSession, user_id: str, status: str, total_cents: int
+    session: AsyncSession,
+    user_id: str,
+    status: str,
+    total_cents: int,
+    reserved_until: datetime | None = None,
 ) -> Order:
-    order = Order(user_id=user_id, status=status, total_cents=total_cents)
+    order = Order(
+        user_id=user_id, status=status, total_cents=total_cents, reserved_until=reserved_until
+    )
     session.add(order)
     await session.flush()
     return order
@@ -29,8 +38,34 @@ async def add_order_item(
     return item
 
 
-async def list_orders(session: AsyncSession, user_id: str) -> list[Order]:
-    result = await session.execute(select(Order).where(Order.user_id == user_id))
+async def add_order_items(
+    session: AsyncSession, order_id: str, lines: list[dict]
+) -> list[OrderItem]:
+    result = await session.scalars(
+        insert(OrderItem).returning(OrderItem, sort_by_parameter_order=True),
+        [{"order_id": order_id, **line} for line in lines],
+    )
+    return list(result.all())
+
+
+async def list_orders(
+    session: AsyncSession,
+    user_id: str,
+    limit: int | None = None,
+    before: tuple[datetime, str] | None = None,
+    status: str | None = None,
+) -> list[Order]:
+    # Newest first; ``before`` is the (created_at, id) of the last order of the previous page,
+    # which keeps every page a range scan on ix_orders_user_created.
+    stmt = select(Order).where(Order.user_id == user_id)
+    if status:
+        stmt = stmt.where(Order.status == status)
+    if before:
+        stmt = stmt.where(tuple_(Order.created_at, Order.id) < before)
+    stmt = stmt.order_by(Order.created_at.desc(), Order.id.desc())
+    if limit:
+        stmt = stmt.limit(limit)
+    result = await session.execute(stmt)
     return list(result.scalars().all())
 
 
@@ -51,7 +86,64 @@ async def list_order_items(session: AsyncSession, order_id: str) -> list[OrderIt
     return list(result.scalars().all())
 
 
+async def list_items_for_orders(
+    session: AsyncSession, order_ids: list[str]
+) -> dict[str, list[OrderItem]]:
+    items: dict[str, list[OrderItem]] = {order_id: [] for order_id in order_ids}
+    if not order_ids:
+        return items
+    result = await session.execute(select(OrderItem).where(OrderItem.order_id.in_(order_ids)))
+    for item in result.scalars():
+        items[str(item.order_id)].append(item)
+    return items
+
+
 async def update_order_status(session: AsyncSession, order: Order, status: str) -> None:
     order.status = status
     order.updated_at = datetime.now(timezone.utc)
     await session.flush()
+    order_cache.invalidate(str(order.id))
+
+
+async def cancel_expired_orders(
+    session: AsyncSession, order_ids: list[str], now: datetime
+) -> list[str]:
+    result = await session.execute(
+        update(Order)
+        .where(
+            Order.id.in_(order_ids),
+            Order.status == "PENDING_PAYMENT",
+            Order.reserved_until <= now,
+        )
+        .values(status="CANCELLED", updated_at=now)
+        .returning(Order.id)
+        .execution_options(synchronize_session=False)
+    )
+    cancelled = [str(order_id) for order_id in result.scalars()]
+    order_cache.invalidate(*cancelled)
+    return cancelled
+
+
+def _any_order_id(order_ids: list[uuid.UUID]):
+    # One array parameter, so the statement text is the same whatever the batch size.
+    return Order.id == any_(bindparam("order_ids", order_ids, type_=ARRAY(UUID(as_uuid=True))))
+
+
+async def fulfill_paid_orders(
+    session: AsyncSession, order_ids: list[uuid.UUID], now: datetime
+) -> list[str]:
+    result = await session.execute(
+        update(Order)
+        .where(_any_order_id(order_ids), Order.status == "PAID")
+        .values(status="FULFILLED", updated_at=now)
+        .returning(Order.id)
+        .execution_options(synchronize_session=False)
+    )
+    fulfilled = [str(order_id) for order_id in result.scalars()]
+    order_cache.invalidate(*fulfilled)
+    return fulfilled
+
+
+async def existing_order_ids(session: AsyncSession, order_ids: list[uuid.UUID]) -> set[str]:
+    result = await session.execute(select(Order.id).where(_any_order_id(order_ids)))
+    return {str(order_id) for order_id in result.scalars()}
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import re
+from datetime import date, datetime, timezone
+
+from sqlalchemy import delete, exists, func, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from eventcart.models.outbox_delivery import OutboxDelivery
+
+ARCHIVE_SCHEMA = "outbox_archive"
+# Serialises maintenance between worker replicas.
+MAINTENANCE_LOCK_ID = 0x6F7574626F78
+
+# outbox_events_<start>_<end>: each partition covers [start, end) of created_at, in UTC.
+_PARTITION_NAME = re.compile(r"^outbox_events_(\d{8})_(\d{8})$")
+
+
+def partition_name(start: date, end: date) -> str:
+    return f"outbox_events_{start:%Y%m%d}_{end:%Y%m%d}"
+
+
+def partition_range(name: str) -> tuple[datetime, datetime]:
+    start, end = _PARTITION_NAME.match(name).groups()
+    return tuple(
+        datetime.strptime(part, "%Y%m%d").replace(tzinfo=timezone.utc) for part in (start, end)
+    )
+
+
+async def try_maintenance_lock(session: AsyncSession) -> bool:
+    result = await session.execute(select(func.pg_try_advisory_xact_lock(MAINTENANCE_LOCK_ID)))
+    return bool(result.scalar_one())
+
+
+async def list_partitions(session: AsyncSession) -> list[tuple[str, date, date]]:
+    # Oldest first; the default partition and anything not named by partition_name are left out.
+    result = await session.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = 'outbox_events'::regclass"
+        )
+    )
+    partitions = []
+    for (name,) in result:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            start, end = (datetime.strptime(part, "%Y%m%d").date() for part in match.groups())
+            partitions.append((name, start, end))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+async def create_partition(session: AsyncSession, start: date, end: date) -> str:
+    name = partition_name(start, end)
+    await session.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF outbox_events "
+            f"FOR VALUES FROM ('{start.isoformat()} 00:00+00') TO ('{end.isoformat()} 00:00+00')"
+        )
+    )
+    return name
+
+
+async def set_lock_timeout(session: AsyncSession, seconds: float) -> None:
+    await session.execute(text(f"SET LOCAL lock_timeout = '{int(seconds * 1000)}ms'"))
+
+
+async def has_open_events(session: AsyncSession, name: str) -> bool:
+    # Events are PENDING, PROCESSED or DEAD; this reads the partial PENDING index.
+    result = await session.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {name} WHERE status = 'PENDING')")
+    )
+    return bool(result.scalar_one())
+
+
+async def has_pending_deliveries(session: AsyncSession, start: datetime, end: datetime) -> bool:
+    # Deliveries of a partition's events, found by its created_at range.
+    result = await session.execute(
+        select(
+            exists().where(
+                OutboxDelivery.status == "PENDING",
+                OutboxDelivery.event_created_at >= start,
+                OutboxDelivery.event_created_at < end,
+            )
+        )
+    )
+    return bool(result.scalar_one())
+
+
+async def delete_finished_deliveries(
+    session: AsyncSession, start: datetime, end: datetime, limit: int
+) -> int:
+    chunk = (
+        select(OutboxDelivery.subscription, OutboxDelivery.event_id)
+        .where(
+            OutboxDelivery.status != "PENDING",
+            OutboxDelivery.event_created_at >= start,
+            OutboxDelivery.event_created_at < end,
+        )
+        .limit(limit)
+        .cte("chunk")
+        .prefix_with("MATERIALIZED")
+    )
+    result = await session.execute(
+        delete(OutboxDelivery).where(
+            tuple_(OutboxDelivery.subscription, OutboxDelivery.event_id).in_(
+                select(chunk.c.subscription, chunk.c.event_id)
+            )
+        )
+    )
+    return result.rowcount
+
+
+async def detach_partition(session: AsyncSession, name: str) -> None:
+    await session.execute(text(f"ALTER TABLE outbox_events DETACH PARTITION {name}"))
+
+
+async def drop_partition(session: AsyncSession, name: str) -> None:
+    await session.execute(text(f"DROP TABLE {name}"))
+
+
+async def archive_partition(session: AsyncSession, name: str) -> None:
+    await session.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import and_, exists, func, insert, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from eventcart.models.outbox import OutboxEvent
+from eventcart.models.outbox_delivery import OutboxDelivery
+
+
+async def create_deliveries(
+    session: AsyncSession, event: OutboxEvent, subscriptions: list[str]
+) -> None:
+    if not subscriptions:
+        return
+    await session.execute(
+        insert(OutboxDelivery),
+        [
+            {
+                "subscription": subscription,
+                "event_id": event.id,
+                "event_created_at": event.created_at,
+                "aggregate_id": event.aggregate_id,
+                "event_type": event.event_type,
+                "status": "PENDING",
+                "attempt_count": 0,
+                "next_attempt_at": event.next_attempt_at,
+            }
+            for subscription in subscriptions
+        ],
+    )
+
+
+def _not_held_back(now: datetime):
+    # Same rule as for the events themselves, within one subscription: a delivery waits behind
+    # an older one for the same aggregate that is backing off or leased.
+    earlier = aliased(OutboxDelivery)
+    return ~exists().where(
+        earlier.subscription == OutboxDelivery.subscription,
+        earlier.aggregate_id == OutboxDelivery.aggregate_id,
+        earlier.event_created_at < OutboxDelivery.event_created_at,
+        earlier.status == "PENDING",
+        or_(
+            and_(earlier.attempt_count > 0, earlier.next_attempt_at > now),
+            earlier.locked_until > now,
+        ),
+    )
+
+
+async def lease_due_deliveries(
+    session: AsyncSession,
+    subscription: str,
+    owner: str,
+    now: datetime,
+    lease_until: datetime,
+    limit: int,
+) -> list[OutboxDelivery]:
+    # Subscription pools have no partition leases, so lease passes of one subscription take
+    # turns instead: each then reads, in a fresh snapshot, the leases of the pass before it, and
+    # _not_held_back keeps a second process off the next delivery of an aggregate that is being
+    # delivered. The lock is held only until the lease commits, not while delivering.
+    await session.execute(
+        select(func.pg_advisory_xact_lock(func.hashtext(f"outbox_deliveries:{subscription}")))
+    )
+    due = (
+        select(OutboxDelivery.event_id)
+        .where(
+            OutboxDelivery.subscription == subscription,
+            OutboxDelivery.status == "PENDING",
+            OutboxDelivery.next_attempt_at <= now,
+            or_(OutboxDelivery.locked_until.is_(None), OutboxDelivery.locked_until <= now),
+            _not_held_back(now),
+        )
+        .order_by(OutboxDelivery.event_created_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        # Materialized, so the LIMIT applies once: as a plain IN subquery it can be planned as a
+        # rescanned semi-join that picks up further rows on every rescan.
+        .cte("due")
+        .prefix_with("MATERIALIZED")
+    )
+    result = await session.execute(
+        update(OutboxDelivery)
+        .where(
+            OutboxDelivery.subscription == subscription,
+            OutboxDelivery.event_id.in_(select(due.c.event_id)),
+        )
+        .values(locked_by=owner, locked_until=lease_until)
+        .returning(OutboxDelivery)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    return sorted(result.scalars().all(), key=lambda delivery: delivery.event_created_at)
+
+
+async def lock_leased_delivery(
+    session: AsyncSession, subscription: str, event_id: str, owner: str
+) -> tuple[OutboxDelivery, OutboxEvent] | None:
+    # The event row is read through its full primary key, so only its partition is touched.
+    result = await session.execute(
+        select(OutboxDelivery, OutboxEvent)
+        .join(
+            OutboxEvent,
+            tuple_(OutboxEvent.id, OutboxEvent.created_at)
+            == tuple_(OutboxDelivery.event_id, OutboxDelivery.event_created_at),
+        )
+        .where(
+            OutboxDelivery.subscription == subscription,
+            OutboxDelivery.event_id == event_id,
+            OutboxDelivery.status == "PENDING",
+            OutboxDelivery.locked_by == owner,
+        )
+        .with_for_update(of=OutboxDelivery, skip_locked=True)
+        .execution_options(populate_existing=True)
+    )
+    row = result.first()
+    return None if row is None else (row[0], row[1])
+
+
+async def lock_leased_deliveries(
+    session: AsyncSession, subscription: str, event_ids: list[str], owner: str
+) -> list[tuple[OutboxDelivery, OutboxEvent]]:
+    # lock_leased_delivery for a whole batch, oldest event first.
+    result = await session.execute(
+        select(OutboxDelivery, OutboxEvent)
+        .join(
+            OutboxEvent,
+            tuple_(OutboxEvent.id, OutboxEvent.created_at)
+            == tuple_(OutboxDelivery.event_id, OutboxDelivery.event_created_at),
+        )
+        .where(
+            OutboxDelivery.subscription == subscription,
+            OutboxDelivery.event_id.in_(event_ids),
+            OutboxDelivery.status == "PENDING",
+            OutboxDelivery.locked_by == owner,
+        )
+        .order_by(OutboxDelivery.event_created_at)
+        .with_for_update(of=OutboxDelivery, skip_locked=True)
+        .execution_options(populate_existing=True)
+    )
+    return [(delivery, event) for delivery, event in result]
+
+
+async def mark_delivery_done(
+    session: AsyncSession, delivery: OutboxDelivery, processed_at: datetime
+) -> None:
+    delivery.status = "PROCESSED"
+    delivery.processed_at = processed_at
+    delivery.locked_by = None
+    delivery.locked_until = None
+    await session.flush()
+
+
+async def mark_deliveries_done(
+    session: AsyncSession, subscription: str, event_ids: list[str], processed_at: datetime
+) -> None:
+    if not event_ids:
+        return
+    await session.execute(
+        update(OutboxDelivery)
+        .where(OutboxDelivery.subscription == subscription, OutboxDelivery.event_id.in_(event_ids))
+        .values(status="PROCESSED", processed_at=processed_at, locked_by=None, locked_until=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def mark_delivery_failed(
+    session: AsyncSession,
+    delivery: OutboxDelivery,
+    attempt: int,
+    next_attempt_at: datetime,
+    error: str,
+    status: str,
+) -> None:
+    delivery.attempt_count = attempt
+    delivery.next_attempt_at = next_attempt_at
+    delivery.last_error = error
+    delivery.status = status
+    delivery.locked_by = None
+    delivery.locked_until = None
+    await session.flush()
+
+
+async def release_delivery_leases(
+    session: AsyncSession, subscription: str, event_ids: list[str], owner: str
+) -> None:
+    if not event_ids:
+        return
+    await session.execute(
+        update(OutboxDelivery)
+        .where(
+            OutboxDelivery.subscription == subscription,
+            OutboxDelivery.event_id.in_(event_ids),
+            OutboxDelivery.locked_by == owner,
+        )
+        .values(locked_by=None, locked_until=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def next_delivery_due_at(session: AsyncSession, subscription: str) -> datetime | None:
+    result = await session.execute(
+        select(
+            func.min(func.greatest(OutboxDelivery.next_attempt_at, OutboxDelivery.locked_until))
+        ).where(OutboxDelivery.subscription == subscription, OutboxDelivery.status == "PENDING")
+    )
+    return result.scalar_one()
+
+
+async def pending_deliveries_by_subscription(session: AsyncSession, limit: int) -> dict[str, int]:
+    # Like pending_counts_by_type: over the first ``limit`` pending deliveries in due order.
+    pending = (
+        select(OutboxDelivery.subscription)
+        .where(OutboxDelivery.status == "PENDING")
+        .order_by(OutboxDelivery.next_attempt_at)
+        .limit(limit)
+        .subquery()
+    )
+    result = await session.execute(
+        select(pending.c.subscription, func.count()).group_by(pending.c.subscription)
+    )
+    return {subscription: count for subscription, count in result}
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from eventcart.models.outbox_partition import OutboxConsumer, OutboxPartitionLease
+
+
+async def ensure_partitions(session: AsyncSession, partitions: int) -> None:
+    await session.execute(
+        insert(OutboxPartitionLease)
+        .values([{"partition_no": partition_no} for partition_no in range(partitions)])
+        .on_conflict_do_nothing()
+    )
+
+
+async def heartbeat_consumer(session: AsyncSession, consumer_id: str, now: datetime) -> None:
+    stmt = insert(OutboxConsumer).values(consumer_id=consumer_id, heartbeat_at=now)
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[OutboxConsumer.consumer_id], set_={"heartbeat_at": now}
+        )
+    )
+
+
+async def count_live_consumers(session: AsyncSession, alive_after: datetime) -> int:
+    result = await session.execute(
+        select(func.count()).where(OutboxConsumer.heartbeat_at > alive_after)
+    )
+    return result.scalar_one()
+
+
+async def remove_consumer(session: AsyncSession, consumer_id: str) -> None:
+    await session.execute(delete(OutboxConsumer).where(OutboxConsumer.consumer_id == consumer_id))
+
+
+async def purge_dead_consumers(session: AsyncSession, dead_before: datetime) -> None:
+    await session.execute(delete(OutboxConsumer).where(OutboxConsumer.heartbeat_at < dead_before))
+
+
+async def renew_leases(
+    session: AsyncSession, owner: str, now: datetime, lease_until: datetime, partitions: int
+) -> list[int]:
+    # A lease that already ran out may have been taken over; only unexpired ones are renewed.
+    result = await session.execute(
+        update(OutboxPartitionLease)
+        .where(
+            OutboxPartitionLease.owner == owner,
+            OutboxPartitionLease.lease_until > now,
+            OutboxPartitionLease.partition_no < partitions,
+        )
+        .values(lease_until=lease_until)
+        .returning(OutboxPartitionLease.partition_no)
+    )
+    return sorted(result.scalars())
+
+
+async def acquire_leases(
+    session: AsyncSession,
+    owner: str,
+    now: datetime,
+    lease_until: datetime,
+    partitions: int,
+    limit: int,
+) -> list[int]:
+    free = (
+        select(OutboxPartitionLease.partition_no)
+        .where(
+            OutboxPartitionLease.partition_no < partitions,
+            or_(
+                OutboxPartitionLease.lease_until.is_(None),
+                OutboxPartitionLease.lease_until <= now,
+            ),
+        )
+        .order_by(OutboxPartitionLease.partition_no)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        # Materialized, so the LIMIT applies once and a consumer never takes more than its share.
+        .cte("free")
+        .prefix_with("MATERIALIZED")
+    )
+    result = await session.execute(
+        update(OutboxPartitionLease)
+        .where(OutboxPartitionLease.partition_no.in_(select(free.c.partition_no)))
+        .values(owner=owner, lease_until=lease_until)
+        .returning(OutboxPartitionLease.partition_no)
+    )
+    return sorted(result.scalars())
+
+
+async def release_leases(
+    session: AsyncSession, owner: str, partition_nos: list[int] | None = None
+) -> None:
+    stmt = update(OutboxPartitionLease).where(OutboxPartitionLease.owner == owner)
+    if partition_nos is not None:
+        stmt = stmt.where(OutboxPartitionLease.partition_no.in_(partition_nos))
+    await session.execute(stmt.values(owner=None, lease_until=None))
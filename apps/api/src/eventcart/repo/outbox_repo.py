@@ -1,11 +1,38 @@
 from __future__ import annotations
 
-from datetime import datetime
+import hashlib
+from datetime import datetime, timezone
 
-from sqlalchemy import select
+from sqlalchemy import (
+    DateTime,
+    Integer,
+    String,
+    and_,
+    column,
+    exists,
+    func,
+    or_,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
+from eventcart.core.settings import settings
 from eventcart.models.outbox import OutboxEvent
+from eventcart.repo.outbox_delivery_repo import create_deliveries
+
+# Workers LISTEN on this channel; a notification means "something is due now".
+OUTBOX_CHANNEL = "outbox_events"
+
+
+def outbox_partition(aggregate_id: str) -> int:
+    # Same value as ('x' || substr(md5(aggregate_id::text), 1, 8))::bit(32)::bigint % n in SQL,
+    # which migration 0008 used for existing rows.
+    digest = hashlib.md5(str(aggregate_id).encode("utf-8")).hexdigest()
+    return int(digest[:8], 16) % settings.outbox_partitions
 
 
 async def create_outbox_event(
@@ -14,21 +41,34 @@ async def create_outbox_event(
     aggregate_id: str,
     event_type: str,
     payload: dict,
+    next_attempt_at: datetime | None = None,
+    subscriptions: list[str] | None = None,
 ) -> OutboxEvent:
     event = OutboxEvent(
         aggregate_type=aggregate_type,
         aggregate_id=aggregate_id,
         event_type=event_type,
         payload=payload,
+        partition_no=outbox_partition(aggregate_id),
     )
+    if next_attempt_at is not None:
+        event.next_attempt_at = next_attempt_at
     session.add(event)
     await session.flush()
+    # Named subscribers get their own delivery, committed together with the event.
+    await create_deliveries(session, event, subscriptions or [])
+    if next_attempt_at is None or next_attempt_at <= datetime.now(timezone.utc):
+        # Delivered by Postgres only when the transaction commits (and collapsed to one per
+        # transaction), so workers never wake for an event they cannot see yet.
+        await session.execute(select(func.pg_notify(OUTBOX_CHANNEL, "")))
     return event
 
 
 async def mark_outbox_processed(session: AsyncSession, event: OutboxEvent, processed_at: datetime) -> None:
     event.status = "PROCESSED"
     event.processed_at = processed_at
+    event.locked_by = None
+    event.locked_until = None
     await session.flush()
 
 
@@ -44,17 +84,269 @@ async def mark_outbox_failed(
     event.next_attempt_at = next_attempt_at
     event.last_error = last_error
     event.status = status
+    event.locked_by = None
+    event.locked_until = None
     await session.flush()
 
 
-async def fetch_due_events(session: AsyncSession, now: datetime, limit: int = 10) -> list[OutboxEvent]:
-    stmt = (
-        select(OutboxEvent)
-        .where(OutboxEvent.status == "PENDING", OutboxEvent.next_attempt_at <= now)
+async def mark_outbox_failed_many(session: AsyncSession, failures: list[dict]) -> None:
+    # Each dict carries id, attempt_count, next_attempt_at, last_error and status; all rows are
+    # written by one UPDATE ... FROM (VALUES ...).
+    if not failures:
+        return
+    rows = values(
+        column("id", UUID(as_uuid=True)),
+        column("attempt_count", Integer),
+        column("next_attempt_at", DateTime(timezone=True)),
+        column("last_error", String),
+        column("status", String),
+        name="failed",
+    ).data(
+        [
+            (
+                failure["id"],
+                failure["attempt_count"],
+                failure["next_attempt_at"],
+                failure["last_error"],
+                failure["status"],
+            )
+            for failure in failures
+        ]
+    )
+    await session.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id == rows.c.id)
+        .values(
+            attempt_count=rows.c.attempt_count,
+            next_attempt_at=rows.c.next_attempt_at,
+            last_error=rows.c.last_error,
+            status=rows.c.status,
+            locked_by=None,
+            locked_until=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def next_due_at(session: AsyncSession) -> datetime | None:
+    # GREATEST skips NULLs, so an unclaimed event counts from next_attempt_at and a claimed one
+    # from when its lease runs out.
+    result = await session.execute(
+        select(
+            func.min(func.greatest(OutboxEvent.next_attempt_at, OutboxEvent.locked_until))
+        ).where(OutboxEvent.status == "PENDING")
+    )
+    return result.scalar_one()
+
+
+async def count_due_events(
+    session: AsyncSession, now: datetime, partitions: list[int] | None, limit: int
+) -> int:
+    # Counts up to ``limit`` rows off the partial index and stops there.
+    due = select(OutboxEvent.id).where(
+        OutboxEvent.status == "PENDING", OutboxEvent.next_attempt_at <= now
+    )
+    if partitions is not None:
+        due = due.where(OutboxEvent.partition_no.in_(partitions))
+    result = await session.execute(select(func.count()).select_from(due.limit(limit).subquery()))
+    return result.scalar_one()
+
+
+async def pending_counts_by_type(session: AsyncSession, limit: int) -> dict[str, int]:
+    # Over the first ``limit`` pending events in due order: exact below the limit, and past it
+    # the mix of what is next in line rather than a full scan of the backlog.
+    pending = (
+        select(OutboxEvent.event_type)
+        .where(OutboxEvent.status == "PENDING")
+        .order_by(OutboxEvent.next_attempt_at)
+        .limit(limit)
+        .subquery()
+    )
+    result = await session.execute(
+        select(pending.c.event_type, func.count()).group_by(pending.c.event_type)
+    )
+    return {event_type: count for event_type, count in result}
+
+
+async def oldest_due_at(session: AsyncSession, now: datetime) -> datetime | None:
+    result = await session.execute(
+        select(func.min(OutboxEvent.next_attempt_at)).where(
+            OutboxEvent.status == "PENDING", OutboxEvent.next_attempt_at <= now
+        )
+    )
+    return result.scalar_one()
+
+
+def _not_held_back(now: datetime):
+    # An event waits while an older event of the same aggregate is backing off after a failure
+    # or is claimed by a worker (possibly the previous owner of its partition). Older events
+    # that are due sort ahead of it in the same claim, and events scheduled for later
+    # (reservation expiry) do not hold anything up.
+    earlier = aliased(OutboxEvent)
+    return ~exists().where(
+        earlier.aggregate_id == OutboxEvent.aggregate_id,
+        earlier.created_at < OutboxEvent.created_at,
+        earlier.status == "PENDING",
+        or_(
+            and_(earlier.attempt_count > 0, earlier.next_attempt_at > now),
+            earlier.locked_until > now,
+        ),
+    )
+
+
+async def lease_due_events(
+    session: AsyncSession,
+    owner: str,
+    now: datetime,
+    lease_until: datetime,
+    limit: int,
+    partitions: list[int] | None = None,
+) -> list[OutboxEvent]:
+    # Stamps the lease and returns; the caller commits straight away instead of keeping row
+    # locks open while the events are handled. Expired leases are free to take again.
+    due = (
+        select(OutboxEvent.id)
+        .where(
+            OutboxEvent.status == "PENDING",
+            OutboxEvent.next_attempt_at <= now,
+            or_(OutboxEvent.locked_until.is_(None), OutboxEvent.locked_until <= now),
+            _not_held_back(now),
+        )
         .order_by(OutboxEvent.created_at)
         .limit(limit)
         .with_for_update(skip_locked=True)
     )
-    result = await session.execute(stmt)
+    if partitions is not None:
+        due = due.where(OutboxEvent.partition_no.in_(partitions))
+    # Materialized, so the LIMIT applies once: as a plain IN subquery it can be planned as a
+    # rescanned semi-join that leases further rows on every rescan.
+    due = due.cte("due").prefix_with("MATERIALIZED")
+    result = await session.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id.in_(select(due.c.id)))
+        .values(locked_by=owner, locked_until=lease_until)
+        .returning(OutboxEvent)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    return sorted(result.scalars().all(), key=lambda event: event.created_at)
+
+
+async def lock_leased_events(
+    session: AsyncSession, event_ids: list[str], owner: str
+) -> list[OutboxEvent]:
+    # Leaves out events whose lease has been taken over (or that were finished) by another
+    # worker; the row locks keep them from being taken over while the outcome is being written.
+    result = await session.execute(
+        select(OutboxEvent)
+        .where(
+            OutboxEvent.id.in_(event_ids),
+            OutboxEvent.status == "PENDING",
+            OutboxEvent.locked_by == owner,
+        )
+        .order_by(OutboxEvent.created_at)
+        .with_for_update(skip_locked=True)
+        .execution_options(populate_existing=True)
+    )
     return list(result.scalars().all())
 
+
+async def mark_outbox_processed_many(
+    session: AsyncSession, event_ids: list[str], processed_at: datetime
+) -> None:
+    if not event_ids:
+        return
+    await session.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id.in_(event_ids))
+        .values(status="PROCESSED", processed_at=processed_at, locked_by=None, locked_until=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def release_outbox_leases(session: AsyncSession, event_ids: list[str], owner: str) -> None:
+    if not event_ids:
+        return
+    await session.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id.in_(event_ids), OutboxEvent.locked_by == owner)
+        .values(locked_by=None, locked_until=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _dead_events(
+    event_type: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    error_pattern: str | None = None,
+) -> list:
+    # created_at bounds also let Postgres skip whole time partitions.
+    conditions = [OutboxEvent.status == "DEAD"]
+    if event_type:
+        conditions.append(OutboxEvent.event_type == event_type)
+    if since:
+        conditions.append(OutboxEvent.created_at >= since)
+    if until:
+        conditions.append(OutboxEvent.created_at < until)
+    if error_pattern:
+        conditions.append(OutboxEvent.last_error.ilike(error_pattern))
+    return conditions
+
+
+async def list_dead_events(
+    session: AsyncSession, limit: int, offset: int = 0, **filters
+) -> list[OutboxEvent]:
+    result = await session.execute(
+        select(OutboxEvent)
+        .where(*_dead_events(**filters))
+        .order_by(OutboxEvent.created_at, OutboxEvent.id)
+        .limit(limit)
+        .offset(offset)
+    )
+    return list(result.scalars().all())
+
+
+async def count_dead_events(session: AsyncSession, **filters) -> dict[str, int]:
+    result = await session.execute(
+        select(OutboxEvent.event_type, func.count())
+        .where(*_dead_events(**filters))
+        .group_by(OutboxEvent.event_type)
+        .order_by(OutboxEvent.event_type)
+    )
+    return {event_type: count for event_type, count in result}
+
+
+async def get_outbox_event(session: AsyncSession, event_id: str) -> OutboxEvent | None:
+    result = await session.execute(select(OutboxEvent).where(OutboxEvent.id == event_id))
+    return result.scalar_one_or_none()
+
+
+async def requeue_dead_events(session: AsyncSession, now: datetime, limit: int, **filters) -> int:
+    # Oldest first, one chunk per call; SKIP LOCKED leaves rows another requeue is working on.
+    chunk = (
+        select(OutboxEvent.id)
+        .where(*_dead_events(**filters))
+        .order_by(OutboxEvent.created_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        # Materialized, so a chunk is never larger than limit (which --limit and --rate rely on).
+        .cte("chunk")
+        .prefix_with("MATERIALIZED")
+    )
+    result = await session.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id.in_(select(chunk.c.id)))
+        .values(
+            status="PENDING",
+            attempt_count=0,
+            next_attempt_at=now,
+            locked_by=None,
+            locked_until=None,
+        )
+        .returning(OutboxEvent.id)
+        .execution_options(synchronize_session=False)
+    )
+    requeued = len(result.all())
+    if requeued:
+        await session.execute(select(func.pg_notify(OUTBOX_CHANNEL, "")))
+    return requeued
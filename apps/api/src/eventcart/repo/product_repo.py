@@ -1,9 +1,12 @@
 from __future__ import annotations
 
-from sqlalchemy import select
+from sqlalchemy import Integer, column, func, select, update, values
+from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from eventcart.models.order_item import OrderItem
 from eventcart.models.product import Product
+from eventcart.repo.stock_shard_repo import count_shards, replace_shards
 
 
 async def list_products(session: AsyncSession) -> list[Product]:
@@ -16,6 +19,88 @@ async def get_products_by_ids(session: AsyncSession, product_ids: list[str]) ->
     return list(result.scalars().all())
 
 
+async def lock_products(session: AsyncSession, product_ids: list[str]) -> list[Product]:
+    # Lock in primary key order so concurrent checkouts with overlapping carts cannot deadlock.
+    # Sharded products are not returned: their stock lives in product_stock_shards. Rows are
+    # refreshed because earlier checkouts in the same transaction may have decremented them.
+    result = await session.execute(
+        select(Product)
+        .where(Product.id.in_(product_ids), Product.inventory_mode == "single")
+        .order_by(Product.id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    return list(result.scalars().all())
+
+
 async def update_stock(session: AsyncSession, product: Product, new_qty: int) -> None:
+    if product.inventory_mode == "sharded":
+        product_id = str(product.id)
+        await replace_shards(session, product_id, new_qty, await count_shards(session, product_id))
+        return
     product.stock_qty = new_qty
     await session.flush()
+
+
+def _quantities(quantities: dict[str, int]):
+    return values(
+        column("product_id", UUID(as_uuid=True)), column("qty", Integer), name="quantities"
+    ).data(list(quantities.items()))
+
+
+async def decrement_stock(session: AsyncSession, quantities: dict[str, int]) -> None:
+    # Loaded Product instances keep their old stock_qty; re-select if it is needed afterwards.
+    deltas = _quantities(quantities)
+    await session.execute(
+        update(Product)
+        .where(Product.id == deltas.c.product_id)
+        .values(stock_qty=Product.stock_qty - deltas.c.qty)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def decrement_stock_if_available(
+    session: AsyncSession, quantities: dict[str, int]
+) -> dict[str, int]:
+    # Conditional decrement without a prior read; returns product id -> price for the unsharded
+    # rows that had enough stock, the others are left untouched. The UPDATE joined to VALUES
+    # locks rows in join order, so they are locked in primary key order first, as in
+    # lock_products, to keep overlapping carts from deadlocking.
+    await session.execute(
+        select(Product.id)
+        .where(Product.id.in_(list(quantities)), Product.inventory_mode == "single")
+        .order_by(Product.id)
+        .with_for_update()
+    )
+    deltas = _quantities(quantities)
+    result = await session.execute(
+        update(Product)
+        .where(
+            Product.id == deltas.c.product_id,
+            Product.inventory_mode == "single",
+            Product.stock_qty >= deltas.c.qty,
+        )
+        .values(stock_qty=Product.stock_qty - deltas.c.qty)
+        .returning(Product.id, Product.price_cents)
+        .execution_options(synchronize_session=False)
+    )
+    return {str(row.id): row.price_cents for row in result}
+
+
+def ordered_quantities(order_ids: list[str]):
+    return (
+        select(OrderItem.product_id, func.sum(OrderItem.qty).label("qty"))
+        .where(OrderItem.order_id.in_(order_ids))
+        .group_by(OrderItem.product_id)
+        .subquery("ordered")
+    )
+
+
+async def restore_stock_for_orders(session: AsyncSession, order_ids: list[str]) -> None:
+    ordered = ordered_quantities(order_ids)
+    await session.execute(
+        update(Product)
+        .where(Product.id == ordered.c.product_id, Product.inventory_mode == "single")
+        .values(stock_qty=Product.stock_qty + ordered.c.qty)
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import random
+
+from sqlalchemy import Integer, column, delete, func, select, update, values
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from eventcart.models.product_stock_shard import ProductStockShard
+
+
+def _split(stock_qty: int, shard_count: int) -> list[int]:
+    base, extra = divmod(stock_qty, shard_count)
+    return [base + (1 if shard_no < extra else 0) for shard_no in range(shard_count)]
+
+
+async def replace_shards(
+    session: AsyncSession, product_id: str, stock_qty: int, shard_count: int
+) -> None:
+    await session.execute(
+        delete(ProductStockShard).where(ProductStockShard.product_id == product_id)
+    )
+    session.add_all(
+        [
+            ProductStockShard(product_id=product_id, shard_no=shard_no, stock_qty=qty)
+            for shard_no, qty in enumerate(_split(stock_qty, shard_count))
+        ]
+    )
+    await session.flush()
+
+
+async def count_shards(session: AsyncSession, product_id: str) -> int:
+    result = await session.execute(
+        select(func.count()).where(ProductStockShard.product_id == product_id)
+    )
+    return result.scalar_one()
+
+
+async def take_from_random_shard(session: AsyncSession, product_id: str, qty: int) -> bool:
+    # Shards another checkout is already decrementing are skipped rather than waited on.
+    candidate = (
+        select(ProductStockShard.id)
+        .where(ProductStockShard.product_id == product_id, ProductStockShard.stock_qty >= qty)
+        .order_by(func.random())
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await session.execute(
+        update(ProductStockShard)
+        .where(ProductStockShard.id == candidate)
+        .values(stock_qty=ProductStockShard.stock_qty - qty)
+        .returning(ProductStockShard.id)
+        .execution_options(synchronize_session=False)
+    )
+    return result.first() is not None
+
+
+async def take_across_shards(session: AsyncSession, product_id: str, qty: int) -> bool:
+    result = await session.execute(
+        select(ProductStockShard.id, ProductStockShard.stock_qty)
+        .where(ProductStockShard.product_id == product_id, ProductStockShard.stock_qty > 0)
+        .order_by(ProductStockShard.shard_no)
+        .with_for_update()
+    )
+    shards = list(result)
+    if sum(shard.stock_qty for shard in shards) < qty:
+        return False
+
+    start = random.randrange(len(shards))
+    takes: list[tuple] = []
+    remaining = qty
+    for shard in shards[start:] + shards[:start]:
+        take = min(remaining, shard.stock_qty)
+        takes.append((shard.id, take))
+        remaining -= take
+        if not remaining:
+            break
+
+    deltas = values(
+        column("shard_id", UUID(as_uuid=True)), column("qty", Integer), name="deltas"
+    ).data(takes)
+    await session.execute(
+        update(ProductStockShard)
+        .where(ProductStockShard.id == deltas.c.shard_id)
+        .values(stock_qty=ProductStockShard.stock_qty - deltas.c.qty)
+        .execution_options(synchronize_session=False)
+    )
+    return True
+
+
+async def sum_shard_stock(
+    session: AsyncSession, product_ids: list[str] | None = None
+) -> dict[str, int]:
+    stmt = select(ProductStockShard.product_id, func.sum(ProductStockShard.stock_qty)).group_by(
+        ProductStockShard.product_id
+    )
+    if product_ids is not None:
+        stmt = stmt.where(ProductStockShard.product_id.in_(product_ids))
+    result = await session.execute(stmt)
+    return {str(product_id): int(total) for product_id, total in result}
+
+
+async def restore_shard_stock(session: AsyncSession, ordered) -> None:
+    # ``ordered`` is a (product_id, qty) subquery; each product's quantity goes back to its
+    # emptiest shard.
+    target = (
+        select(ProductStockShard.id, ordered.c.qty)
+        .join(ordered, ProductStockShard.product_id == ordered.c.product_id)
+        .distinct(ProductStockShard.product_id)
+        .order_by(ProductStockShard.product_id, ProductStockShard.stock_qty)
+        .subquery("target")
+    )
+    await session.execute(
+        update(ProductStockShard)
+        .where(ProductStockShard.id == target.c.id)
+        .values(stock_qty=ProductStockShard.stock_qty + target.c.qty)
+        .execution_options(synchronize_session=False)
+    )
@@ -14,6 +14,15 @@ class OrderCreate(BaseModel):
     items: list[OrderItemCreate]
 
 
+class OrderBatchCart(BaseModel):
+    items: list[OrderItemCreate]
+    idempotency_key: str | None = Field(default=None, max_length=128)
+
+
+class OrderBatchCreate(BaseModel):
+    carts: list[OrderBatchCart] = Field(min_length=1)
+
+
 class OrderItemResponse(BaseModel):
     id: str
     product_id: str
@@ -27,8 +36,20 @@ class OrderResponse(BaseModel):
     total_cents: int
     created_at: datetime
     updated_at: datetime
+    reserved_until: datetime | None = None
     items: list[OrderItemResponse]
 
 
 class OrderListResponse(BaseModel):
     orders: list[OrderResponse]
+
+
+class OrderBatchResult(BaseModel):
+    index: int
+    status: int
+    order: OrderResponse | None = None
+    error: str | None = None
+
+
+class OrderBatchResponse(BaseModel):
+    results: list[OrderBatchResult]
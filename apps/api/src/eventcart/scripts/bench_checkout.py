@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from sqlalchemy import delete, event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from eventcart.core.settings import settings
+from eventcart.models.order import Order
+from eventcart.models.order_item import OrderItem
+from eventcart.models.product import Product
+from eventcart.models.user import User
+from eventcart.services.checkout_coalescer import CheckoutCoalescer
+from eventcart.services.inventory_service import INVENTORY_STRATEGIES
+from eventcart.services.order_service import create_order_with_idempotency
+
+
+async def _setup(sessionmaker: async_sessionmaker, orders: int, products: int):
+    run_id = uuid.uuid4().hex[:8]
+    user = User(email=f"bench-{run_id}@eventcart.dev", password_hash="-")
+    hot = [
+        Product(
+            sku=f"BENCH-{run_id}-{idx}",
+            name=f"Bench Ticket {idx}",
+            price_cents=1000,
+            stock_qty=orders,
+        )
+        for idx in range(products)
+    ]
+    async with sessionmaker() as session:
+        async with session.begin():
+            session.add_all([user, *hot])
+    return str(user.id), [str(product.id) for product in hot]
+
+
+async def _teardown(sessionmaker: async_sessionmaker, user_id: str, product_ids: list[str]) -> None:
+    async with sessionmaker() as session:
+        async with session.begin():
+            order_ids = select(Order.id).where(Order.user_id == user_id)
+            await session.execute(delete(OrderItem).where(OrderItem.order_id.in_(order_ids)))
+            await session.execute(delete(Order).where(Order.user_id == user_id))
+            await session.execute(delete(Product).where(Product.id.in_(product_ids)))
+            await session.execute(delete(User).where(User.id == user_id))
+
+
+MODES = ("direct", "coalesced")
+
+
+async def _run_strategy(
+    sessionmaker: async_sessionmaker,
+    strategy: str,
+    mode: str,
+    orders: int,
+    concurrency: int,
+    products: int,
+    commits: list[int],
+) -> dict:
+    user_id, product_ids = await _setup(sessionmaker, orders, products)
+    coalescer = CheckoutCoalescer(sessionmaker, inventory_strategy=strategy)
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for idx in range(orders):
+        queue.put_nowait(idx)
+    latencies: list[float] = []
+    failures = 0
+
+    async def client() -> None:
+        nonlocal failures
+        while not queue.empty():
+            idx = queue.get_nowait()
+            items = [{"product_id": product_ids[idx % len(product_ids)], "qty": 1}]
+            start = time.perf_counter()
+            try:
+                if mode == "coalesced":
+                    await coalescer.submit(user_id, items, None)
+                else:
+                    async with sessionmaker() as session:
+                        async with session.begin():
+                            await create_order_with_idempotency(
+                                session, user_id, items, None, inventory_strategy=strategy
+                            )
+            except Exception:  # noqa: BLE001
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    commits_before = commits[0]
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    committed = commits[0] - commits_before
+    await coalescer.close()
+
+    await _teardown(sessionmaker, user_id, product_ids)
+    latencies.sort()
+    return {
+        "strategy": strategy,
+        "mode": mode,
+        "orders": orders,
+        "failures": failures,
+        "seconds": round(elapsed, 3),
+        "orders_per_second": round(orders / elapsed, 1),
+        "commits": committed,
+        "commits_per_second": round(committed / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+
+async def bench(
+    strategies: list[str], modes: list[str], orders: int, concurrency: int, products: int
+) -> None:
+    engine = create_async_engine(
+        settings.database_url, pool_size=concurrency, max_overflow=0, pool_pre_ping=True
+    )
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    commits = [0]
+
+    @event.listens_for(engine.sync_engine, "commit")
+    def _count_commit(conn) -> None:
+        commits[0] += 1
+
+    try:
+        for strategy in strategies:
+            for mode in modes:
+                print(
+                    await _run_strategy(
+                        sessionmaker, strategy, mode, orders, concurrency, products, commits
+                    )
+                )
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent checkout benchmark on hot products.")
+    parser.add_argument("--strategy", choices=[*INVENTORY_STRATEGIES, "all"], default="all")
+    parser.add_argument("--mode", choices=[*MODES, "all"], default="direct")
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--products", type=int, default=1, help="number of hot products")
+    args = parser.parse_args()
+    strategies = list(INVENTORY_STRATEGIES) if args.strategy == "all" else [args.strategy]
+    modes = list(MODES) if args.mode == "all" else [args.mode]
+    asyncio.run(bench(strategies, modes, args.orders, args.concurrency, args.products))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from eventcart.core.settings import settings
+from eventcart.services.outbox_service import claim_due_events
+
+BENCH_TYPE = "bench"
+CHUNK = 1_000_000
+
+_SEED = text(
+    """
+    INSERT INTO outbox_events (
+        id, aggregate_type, aggregate_id, partition_no, event_type, payload, status,
+        attempt_count, next_attempt_at, processed_at, created_at
+    )
+    SELECT gen_random_uuid(), :aggregate_type, gen_random_uuid(), g % :partitions, :event_type,
+           '{}'::jsonb, CAST(:status AS varchar), 0, now() - interval '1 day',
+           CASE WHEN CAST(:status AS varchar) = 'PROCESSED' THEN now() END,
+           now() - interval '1 minute' + g * interval '1 microsecond'
+    FROM generate_series(:start, :stop - 1) AS g
+    """
+)
+
+
+async def _seed(sessionmaker: async_sessionmaker, status: str, start: int, stop: int) -> None:
+    for chunk_start in range(start, stop, CHUNK):
+        async with sessionmaker() as session:
+            async with session.begin():
+                await session.execute(
+                    _SEED,
+                    {
+                        "aggregate_type": BENCH_TYPE,
+                        "event_type": f"bench.{status.lower()}",
+                        "status": status,
+                        "partitions": settings.outbox_partitions,
+                        "start": chunk_start,
+                        "stop": min(stop, chunk_start + CHUNK),
+                    },
+                )
+    async with sessionmaker() as session:
+        await session.execute(text("ANALYZE outbox_events"))
+        await session.commit()
+
+
+async def _measure(sessionmaker: async_sessionmaker, samples: int, batch_size: int) -> dict:
+    latencies: list[float] = []
+    for _ in range(samples):
+        async with sessionmaker() as session:
+            start = time.perf_counter()
+            claimed = await claim_due_events(session, batch_size, owner="bench")
+            # Leave the backlog as it was so every sample claims the same kind of rows.
+            await session.rollback()
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "claimed": len(claimed),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000, 2),
+    }
+
+
+async def _teardown(sessionmaker: async_sessionmaker) -> None:
+    async with sessionmaker() as session:
+        async with session.begin():
+            await session.execute(
+                text("DELETE FROM outbox_events WHERE aggregate_type = :aggregate_type"),
+                {"aggregate_type": BENCH_TYPE},
+            )
+
+
+async def bench(processed: int, steps: int, pending: int, samples: int, batch_size: int) -> None:
+    engine = create_async_engine(settings.database_url, pool_pre_ping=True)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    try:
+        await _seed(sessionmaker, "PENDING", 0, pending)
+        seeded = 0
+        print({"processed_rows": seeded, **await _measure(sessionmaker, samples, batch_size)})
+        for step in range(1, steps + 1):
+            target = processed * step // steps
+            await _seed(sessionmaker, "PROCESSED", seeded, target)
+            seeded = target
+            print({"processed_rows": seeded, **await _measure(sessionmaker, samples, batch_size)})
+    finally:
+        await _teardown(sessionmaker)
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Outbox claim latency as PROCESSED rows accumulate (seeded, then deleted)."
+    )
+    parser.add_argument("--processed", type=int, default=10_000_000)
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--pending", type=int, default=1000, help="backlog kept while measuring")
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=settings.worker_batch_size)
+    args = parser.parse_args()
+    asyncio.run(bench(args.processed, args.steps, args.pending, args.samples, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
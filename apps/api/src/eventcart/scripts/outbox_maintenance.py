@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+
+from eventcart.core.settings import settings
+from eventcart.services.outbox_retention import maintain_outbox_partitions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Create upcoming outbox partitions and drop or archive finished old ones."
+    )
+    parser.add_argument("--retention-days", type=int, default=settings.outbox_retention_days)
+    parser.add_argument("--mode", choices=["drop", "archive"], default=settings.outbox_archive_mode)
+    args = parser.parse_args()
+    result = asyncio.run(
+        maintain_outbox_partitions(retention_days=args.retention_days, mode=args.mode)
+    )
+    for name in result["created"]:
+        print(f"created {name}")
+    for name in result["retired"]:
+        print(f"{'archived' if args.mode == 'archive' else 'dropped'} {name}")
+
+
+if __name__ == "__main__":
+    main()
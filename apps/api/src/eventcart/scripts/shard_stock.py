@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+
+from sqlalchemy import select
+
+from eventcart.db.session import SessionLocal
+from eventcart.models.product import Product
+from eventcart.services.inventory_service import shard_product_stock
+
+
+async def shard_stock(sku: str, shards: int) -> None:
+    async with SessionLocal() as session:
+        async with session.begin():
+            result = await session.execute(
+                select(Product).where(Product.sku == sku).with_for_update()
+            )
+            product = result.scalar_one_or_none()
+            if not product:
+                raise SystemExit(f"Unknown sku {sku}")
+            await shard_product_stock(session, product, shards)
+    print(f"{sku}: stock split across {shards} shards")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move a product's stock into sharded counters.")
+    parser.add_argument("sku")
+    parser.add_argument("--shards", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(shard_stock(args.sku, args.shards))
+
+
+if __name__ == "__main__":
+    main()
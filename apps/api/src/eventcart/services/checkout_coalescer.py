@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from dataclasses import dataclass, field
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from eventcart.core.settings import settings
+from eventcart.db.session import SessionLocal
+from eventcart.services.order_service import create_orders_batch
+
+
+@dataclass
+class _PendingCheckout:
+    cart: dict
+    future: asyncio.Future = field(repr=False)
+
+
+class CheckoutCoalescer:
+    # Collects concurrent checkouts for a few milliseconds and commits them together: one
+    # transaction (and one WAL flush) per batch, with a savepoint per cart.
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker = SessionLocal,
+        window_ms: float | None = None,
+        max_batch: int | None = None,
+        inventory_strategy: str | None = None,
+    ) -> None:
+        self._sessionmaker = sessionmaker
+        if window_ms is None:
+            window_ms = settings.checkout_coalesce_window_ms
+        self._window = window_ms / 1000
+        self._max_batch = max_batch or settings.checkout_coalesce_max_batch
+        self._inventory_strategy = inventory_strategy
+        self._queue: asyncio.Queue[_PendingCheckout] | None = None
+        self._task: asyncio.Task | None = None
+        self.batches = 0
+
+    async def submit(
+        self, user_id: str, items_payload: list[dict], idempotency_key: str | None
+    ) -> dict:
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+        cart = {"user_id": user_id, "items": items_payload, "idempotency_key": idempotency_key}
+        pending = _PendingCheckout(cart, asyncio.get_running_loop().create_future())
+        self._queue.put_nowait(pending)
+        return await pending.future
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def _collect(self) -> list[_PendingCheckout]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self._window
+        while len(batch) < self._max_batch:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: list[_PendingCheckout]) -> None:
+        try:
+            async with self._sessionmaker() as session:
+                async with session.begin():
+                    results = await create_orders_batch(
+                        session, [pending.cart for pending in batch], self._inventory_strategy
+                    )
+        except Exception as exc:  # noqa: BLE001
+            # The shared commit failed, so none of the orders exist.
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(exc)
+            return
+
+        self.batches += 1
+        for pending, result in zip(batch, results):
+            if pending.future.done():
+                continue
+            if "order" in result:
+                pending.future.set_result(result["order"])
+            else:
+                pending.future.set_exception(
+                    HTTPException(status_code=result["status"], detail=result["error"])
+                )
+
+
+checkout_coalescer = CheckoutCoalescer()
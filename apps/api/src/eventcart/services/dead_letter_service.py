@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import structlog
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from eventcart.db.session import SessionLocal
+from eventcart.models.outbox import OutboxEvent
+from eventcart.repo.outbox_repo import (
+    count_dead_events,
+    get_outbox_event,
+    list_dead_events,
+    requeue_dead_events,
+)
+
+logger = structlog.get_logger()
+
+
+async def list_dead(
+    session: AsyncSession, limit: int = 50, offset: int = 0, **filters
+) -> list[OutboxEvent]:
+    return await list_dead_events(session, limit, offset, **filters)
+
+
+async def count_dead(session: AsyncSession, **filters) -> dict[str, int]:
+    return await count_dead_events(session, **filters)
+
+
+async def get_event(session: AsyncSession, event_id: str) -> OutboxEvent | None:
+    return await get_outbox_event(session, event_id)
+
+
+async def requeue_dead(
+    sessionmaker: async_sessionmaker = SessionLocal,
+    batch_size: int = 500,
+    rate_per_second: float | None = None,
+    limit: int | None = None,
+    **filters,
+) -> int:
+    # Chunks of batch_size, each its own short transaction; rate_per_second paces the chunks so
+    # a large replay reaches the live worker at a rate it can absorb.
+    requeued = 0
+    while limit is None or requeued < limit:
+        size = batch_size if limit is None else min(batch_size, limit - requeued)
+        started = time.monotonic()
+        async with sessionmaker() as session:
+            async with session.begin():
+                count = await requeue_dead_events(
+                    session, datetime.now(timezone.utc), size, **filters
+                )
+        requeued += count
+        if count:
+            logger.info("dlq.requeued", count=count, total=requeued)
+        if count < size:
+            break
+        if rate_per_second:
+            await asyncio.sleep(max(0.0, count / rate_per_second - (time.monotonic() - started)))
+    return requeued
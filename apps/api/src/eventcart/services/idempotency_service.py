@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+import orjson
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from eventcart.core.settings import settings
+from eventcart.models.idempotency import IdempotencyKey
+from eventcart.repo.idempotency_repo import (
+    claim_idempotency_key,
+    complete_idempotency_key,
+    purge_idempotency_keys,
+    release_idempotency_key,
+)
+
+# (user_id, key) -> the in-flight request's outcome: (request_hash, response) once it has
+# committed, or None if it failed and followers should try for themselves.
+_in_flight: dict[tuple[str, str], asyncio.Future] = {}
+
+
+def request_hash(payload: dict) -> str:
+    encoded = json.dumps(payload, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _expired_before(now: datetime) -> datetime:
+    return now - timedelta(hours=settings.idempotency_retention_hours)
+
+
+def _pack(response: dict) -> bytes:
+    return zlib.compress(orjson.dumps(response))
+
+
+def _unpack(packed: bytes) -> dict:
+    return orjson.loads(zlib.decompress(packed))
+
+
+def _replay(payload_hash: str, stored_hash: str, response):
+    if stored_hash != payload_hash:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Idempotency key reuse with different payload",
+        )
+    if response is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this idempotency key is still in progress",
+        )
+    return response
+
+
+async def claim_key(
+    session: AsyncSession, user_id: str, key: str, payload_hash: str
+) -> bytes | None:
+    # None means this transaction owns the key and must run the request; otherwise the stored
+    # (packed) response of the earlier request is returned.
+    now = datetime.now(timezone.utc)
+    existing: IdempotencyKey | None = await claim_idempotency_key(
+        session,
+        user_id,
+        key,
+        payload_hash,
+        now,
+        _expired_before(now),
+        now - timedelta(seconds=settings.idempotency_claim_timeout_seconds),
+    )
+    if existing is None:
+        return None
+    return _replay(payload_hash, existing.request_hash, existing.response)
+
+
+async def release_key(session: AsyncSession, user_id: str, key: str) -> None:
+    await release_idempotency_key(session, user_id, key)
+
+
+async def store_response(
+    session: AsyncSession, user_id: str, key: str, packed: bytes
+) -> None:
+    await complete_idempotency_key(session, user_id, key, packed)
+
+
+async def claim_or_replay(
+    session: AsyncSession, user_id: str, key: str, payload_hash: str
+) -> dict | None:
+    packed = await claim_key(session, user_id, key, payload_hash)
+    return None if packed is None else _unpack(packed)
+
+
+async def complete_claim(session: AsyncSession, user_id: str, key: str, response: dict) -> None:
+    await store_response(session, user_id, key, _pack(response))
+
+
+async def purge_expired_keys(session: AsyncSession) -> int:
+    return await purge_idempotency_keys(
+        session,
+        _expired_before(datetime.now(timezone.utc)),
+        settings.idempotency_purge_batch_size,
+    )
+
+
+async def single_flight(
+    user_id: str,
+    key: str | None,
+    payload_hash: str,
+    run: Callable[[], Awaitable],
+):
+    # Duplicates that reach this process while the first request is still running wait for its
+    # committed response instead of opening their own transaction. ``run`` must commit before
+    # returning.
+    if not key:
+        return await run()
+    flight_key = (user_id, key)
+    while (leader := _in_flight.get(flight_key)) is not None:
+        outcome = await asyncio.shield(leader)
+        if outcome is not None:
+            return _replay(payload_hash, *outcome)
+
+    flight = asyncio.get_running_loop().create_future()
+    _in_flight[flight_key] = flight
+    outcome = None
+    try:
+        response = await run()
+        outcome = (payload_hash, response)
+        return response
+    finally:
+        del _in_flight[flight_key]
+        flight.set_result(outcome)
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import time
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from eventcart.core.settings import settings
+from eventcart.models.product import Product
+from eventcart.repo.product_repo import (
+    decrement_stock,
+    decrement_stock_if_available,
+    get_products_by_ids,
+    lock_products,
+    ordered_quantities,
+    restore_stock_for_orders,
+)
+from eventcart.repo.stock_shard_repo import (
+    replace_shards,
+    restore_shard_stock,
+    sum_shard_stock,
+    take_across_shards,
+    take_from_random_shard,
+)
+
+INVENTORY_STRATEGIES = ("locking", "optimistic")
+
+_shard_totals: tuple[float, dict[str, int]] | None = None
+
+
+def _invalid_product() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid product")
+
+
+def _insufficient_stock(name: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST, detail=f"Insufficient stock for {name}"
+    )
+
+
+async def _reserve_sharded(
+    session: AsyncSession, products: list[Product], quantities: dict[str, int]
+) -> dict[str, int]:
+    prices: dict[str, int] = {}
+    for product in products:
+        product_id = str(product.id)
+        qty = quantities[product_id]
+        if not await take_from_random_shard(session, product_id, qty):
+            # The picked shard ran dry (or every big-enough shard is busy): drain several.
+            if not await take_across_shards(session, product_id, qty):
+                raise _insufficient_stock(product.name)
+        prices[product_id] = product.price_cents
+    return prices
+
+
+async def _reserve_locking(session: AsyncSession, items_payload: list[dict]) -> dict[str, int]:
+    quantities = {item["product_id"]: item["qty"] for item in items_payload}
+    products = await lock_products(session, list(quantities))
+    sharded: list[Product] = []
+    if len(products) != len(quantities):
+        locked = {str(product.id) for product in products}
+        sharded = await get_products_by_ids(
+            session, [product_id for product_id in quantities if product_id not in locked]
+        )
+        if len(products) + len(sharded) != len(quantities):
+            raise _invalid_product()
+
+    for product in products:
+        if quantities[str(product.id)] > product.stock_qty:
+            raise _insufficient_stock(product.name)
+
+    prices = {str(product.id): product.price_cents for product in products}
+    if prices:
+        await decrement_stock(session, {pid: quantities[pid] for pid in prices})
+    prices.update(await _reserve_sharded(session, sharded, quantities))
+    return prices
+
+
+async def _reserve_optimistic(session: AsyncSession, items_payload: list[dict]) -> dict[str, int]:
+    quantities = {item["product_id"]: item["qty"] for item in items_payload}
+    prices = await decrement_stock_if_available(session, quantities)
+    if len(prices) == len(quantities):
+        return prices
+
+    # Some lines did not match: either sharded products, unknown ids or not enough stock. On
+    # error the caller's transaction rolls back the lines that were already decremented.
+    remaining = [product_id for product_id in quantities if product_id not in prices]
+    products = await get_products_by_ids(session, remaining)
+    if len(products) != len(remaining):
+        raise _invalid_product()
+    for product in products:
+        if product.inventory_mode != "sharded":
+            raise _insufficient_stock(product.name)
+
+    prices.update(await _reserve_sharded(session, products, quantities))
+    return prices
+
+
+async def reserve_stock(
+    session: AsyncSession, items_payload: list[dict], strategy: str | None = None
+) -> dict[str, int]:
+    strategy = strategy or settings.inventory_strategy
+    if strategy == "optimistic":
+        return await _reserve_optimistic(session, items_payload)
+    if strategy == "locking":
+        return await _reserve_locking(session, items_payload)
+    raise ValueError(f"Unknown inventory strategy: {strategy}")
+
+
+async def release_order_stock(session: AsyncSession, order_ids: list[str]) -> None:
+    if not order_ids:
+        return
+    await restore_stock_for_orders(session, order_ids)
+    await restore_shard_stock(session, ordered_quantities(order_ids))
+
+
+async def shard_product_stock(session: AsyncSession, product: Product, shard_count: int) -> None:
+    if shard_count < 1:
+        raise ValueError("shard_count must be positive")
+    total = product.stock_qty
+    if product.inventory_mode == "sharded":
+        total = (await sum_shard_stock(session, [str(product.id)])).get(str(product.id), 0)
+    await replace_shards(session, str(product.id), total, shard_count)
+    product.stock_qty = 0
+    product.inventory_mode = "sharded"
+    await session.flush()
+
+
+async def sharded_stock_levels(session: AsyncSession) -> dict[str, int]:
+    # Summing the shards on every product listing would read every hot shard row; a short-lived
+    # per-process cache is accurate enough for display.
+    global _shard_totals
+    now = time.monotonic()
+    if _shard_totals is None or now - _shard_totals[0] > settings.inventory_shard_cache_seconds:
+        _shard_totals = (now, await sum_shard_stock(session))
+    return _shard_totals[1]
@@ -1,24 +1,27 @@
 from __future__ import annotations
 
-import hashlib
-import json
-from datetime import datetime, timezone
+import uuid
+from datetime import datetime, timedelta, timezone
 
+import structlog
 from fastapi import HTTPException, status
-from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from eventcart.core.settings import settings
 from eventcart.models.order import Order
 from eventcart.models.order_item import OrderItem
-from eventcart.models.product import Product
-from eventcart.repo.idempotency_repo import create_idempotency_key, get_idempotency_key
-from eventcart.repo.order_repo import add_order_item, create_order, update_order_status
-from eventcart.repo.product_repo import update_stock
+from eventcart.repo.order_repo import add_order_items, create_order, update_order_status
+from eventcart.repo.outbox_repo import create_outbox_event
+from eventcart.repo.product_repo import lock_products
+from eventcart.services.idempotency_service import claim_or_replay, complete_claim, request_hash
+from eventcart.services.inventory_service import reserve_stock
+from eventcart.services.subscriptions import subscribers
 
+logger = structlog.get_logger()
 
-def _request_hash(payload: dict) -> str:
-    encoded = json.dumps(payload, sort_keys=True).encode("utf-8")
-    return hashlib.sha256(encoded).hexdigest()
+# Deadlock and serialization failures: the cart may well go through if it is sent again.
+_RETRYABLE_SQLSTATES = {"40P01", "40001"}
 
 
 def _order_response(order: Order, items: list[OrderItem]) -> dict:
@@ -28,6 +31,7 @@ def _order_response(order: Order, items: list[OrderItem]) -> dict:
         "total_cents": order.total_cents,
         "created_at": order.created_at.isoformat(),
         "updated_at": order.updated_at.isoformat(),
+        "reserved_until": order.reserved_until.isoformat() if order.reserved_until else None,
         "items": [
             {
                 "id": str(item.id),
@@ -45,65 +49,113 @@ async def create_order_with_idempotency(
     user_id: str,
     items_payload: list[dict],
     idempotency_key: str | None,
+    inventory_strategy: str | None = None,
 ) -> dict:
-    payload_hash = _request_hash({"items": items_payload})
+    payload_hash = request_hash({"items": items_payload})
 
     if not items_payload:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No items")
 
     if idempotency_key:
-        existing = await get_idempotency_key(session, user_id, idempotency_key)
-        if existing:
-            if existing.request_hash != payload_hash:
-                raise HTTPException(
-                    status_code=status.HTTP_409_CONFLICT,
-                    detail="Idempotency key reuse with different payload",
-                )
-            return existing.response
+        # Claimed before any stock is touched, so a concurrent duplicate waits here (or on the
+        # in-process single flight) rather than racing for product locks.
+        replayed = await claim_or_replay(session, user_id, idempotency_key, payload_hash)
+        if replayed is not None:
+            return replayed
 
     product_ids = [item["product_id"] for item in items_payload]
     if len(product_ids) != len(set(product_ids)):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Duplicate items")
 
-    stmt = select(Product).where(Product.id.in_(product_ids)).with_for_update()
-    result = await session.execute(stmt)
-    products = list(result.scalars().all())
-
-    if len(products) != len(product_ids):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid product")
-
-    products_by_id = {str(product.id): product for product in products}
-
-    total_cents = 0
-    for item in items_payload:
-        product = products_by_id[item["product_id"]]
-        if item["qty"] > product.stock_qty:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Insufficient stock for {product.name}",
-            )
-        total_cents += product.price_cents * item["qty"]
-
-    order = await create_order(session, user_id, "PENDING_PAYMENT", total_cents)
-
-    order_items: list[OrderItem] = []
-    for item in items_payload:
-        product = products_by_id[item["product_id"]]
-        await update_stock(session, product, product.stock_qty - item["qty"])
-        order_item = await add_order_item(
-            session, str(order.id), str(product.id), item["qty"], product.price_cents
+    prices = await reserve_stock(session, items_payload, inventory_strategy)
+    total_cents = sum(prices[item["product_id"]] * item["qty"] for item in items_payload)
+
+    reserved_until = None
+    if settings.order_reservation_minutes > 0:
+        reserved_until = datetime.now(timezone.utc) + timedelta(
+            minutes=settings.order_reservation_minutes
+        )
+    order = await create_order(session, user_id, "PENDING_PAYMENT", total_cents, reserved_until)
+    order_items = await add_order_items(
+        session,
+        str(order.id),
+        [
+            {
+                "product_id": item["product_id"],
+                "qty": item["qty"],
+                "unit_price_cents": prices[item["product_id"]],
+            }
+            for item in items_payload
+        ],
+    )
+
+    if reserved_until:
+        # Fires once the reservation lapses; the handler leaves paid orders alone.
+        await create_outbox_event(
+            session,
+            aggregate_type="order",
+            aggregate_id=str(order.id),
+            event_type="order.reservation_expired",
+            payload={"order_id": str(order.id), "user_id": user_id},
+            next_attempt_at=reserved_until,
+            subscriptions=subscribers("order.reservation_expired"),
         )
-        order_items.append(order_item)
 
-    order.updated_at = datetime.now(timezone.utc)
     response = _order_response(order, order_items)
 
     if idempotency_key:
-        await create_idempotency_key(session, user_id, idempotency_key, payload_hash, response)
+        await complete_claim(session, user_id, idempotency_key, response)
 
     return response
 
 
+def _is_uuid(value: str) -> bool:
+    try:
+        uuid.UUID(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+async def create_orders_batch(
+    session: AsyncSession, carts: list[dict], inventory_strategy: str | None = None
+) -> list[dict]:
+    # Each cart is {"user_id", "items", "idempotency_key"}; carts may belong to different users.
+    strategy = inventory_strategy or settings.inventory_strategy
+    product_ids = {item["product_id"] for cart in carts for item in cart["items"]}
+    if strategy == "locking":
+        # Take every row lock up front in one deterministic pass; the per-cart checkouts below
+        # then re-read rows this transaction already holds instead of queueing for them.
+        await lock_products(session, sorted(pid for pid in product_ids if _is_uuid(pid)))
+
+    results: list[dict] = []
+    for cart in carts:
+        if not all(_is_uuid(item["product_id"]) for item in cart["items"]):
+            results.append({"status": status.HTTP_400_BAD_REQUEST, "error": "Invalid product"})
+            continue
+        try:
+            async with session.begin_nested():
+                order = await create_order_with_idempotency(
+                    session, cart["user_id"], cart["items"], cart.get("idempotency_key"), strategy
+                )
+        except HTTPException as exc:
+            results.append({"status": exc.status_code, "error": str(exc.detail)})
+        except SQLAlchemyError as exc:
+            # The savepoint has rolled this cart back and the transaction is usable again, so
+            # a database error only fails its own cart.
+            sqlstate = getattr(getattr(exc, "orig", None), "sqlstate", None)
+            logger.warning("order.batch_cart_failed", error=str(exc), sqlstate=sqlstate)
+            if isinstance(exc, DBAPIError) and sqlstate in _RETRYABLE_SQLSTATES:
+                results.append({"status": status.HTTP_409_CONFLICT, "error": "Conflict, retry"})
+            else:
+                results.append(
+                    {"status": status.HTTP_500_INTERNAL_SERVER_ERROR, "error": "Checkout failed"}
+                )
+        else:
+            results.append({"status": status.HTTP_201_CREATED, "order": order})
+    return results
+
+
 async def mark_order_paid(session: AsyncSession, order: Order) -> None:
     await update_order_status(session, order, "PAID")
 
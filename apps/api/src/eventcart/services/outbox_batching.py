@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import time
+
+from eventcart.core.settings import settings
+
+
+class AdaptiveBatchSize:
+    # Claim size for the next pass. Full, fast passes mean a backlog: grow (at most doubling, and
+    # no further than the target duration allows). Slow passes shrink in proportion, and mostly
+    # empty ones halve back towards the minimum as the backlog drains.
+    def __init__(
+        self,
+        minimum: int | None = None,
+        maximum: int | None = None,
+        target_seconds: float | None = None,
+    ) -> None:
+        self.minimum = minimum or settings.worker_batch_size
+        self.maximum = max(self.minimum, maximum or settings.worker_batch_size_max)
+        self.target_seconds = target_seconds or settings.worker_batch_target_seconds
+        self.size = self.minimum
+
+    def observe(self, handled: int, elapsed: float) -> int:
+        if elapsed > self.target_seconds:
+            scaled = int(self.size * self.target_seconds / elapsed)
+        elif handled >= self.size:
+            per_event = elapsed / handled
+            fits = int(self.target_seconds / per_event) if per_event > 0 else self.maximum
+            scaled = min(self.size * 2, fits)
+        elif handled < self.size // 2:
+            scaled = self.size // 2
+        else:
+            scaled = self.size
+        self.size = max(self.minimum, min(self.maximum, scaled))
+        return self.size
+
+
+class DrainRate:
+    # Events handled per second since the last report.
+    def __init__(self) -> None:
+        self._handled = 0
+        self._since = time.monotonic()
+
+    def add(self, handled: int) -> None:
+        self._handled += handled
+
+    def take(self) -> tuple[int, float]:
+        now = time.monotonic()
+        handled, elapsed = self._handled, max(now - self._since, 1e-9)
+        self._handled, self._since = 0, now
+        return handled, handled / elapsed
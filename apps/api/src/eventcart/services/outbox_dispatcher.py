@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import structlog
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from eventcart.core.settings import settings
+from eventcart.db.session import SessionLocal
+from eventcart.repo.outbox_repo import lock_leased_events, release_outbox_leases
+from eventcart.services.outbox_metrics import BATCH_FILL, CLAIM_SECONDS, HANDLER_SECONDS
+from eventcart.services.outbox_service import (
+    DEFAULT_OWNER,
+    claim_due_events,
+    mark_failed,
+    mark_failed_many,
+    mark_processed,
+    mark_processed_many,
+)
+from eventcart.services.processor import (
+    handle_outbox_event,
+    handle_outbox_events,
+    has_batch_handler,
+)
+
+logger = structlog.get_logger()
+
+
+async def _process_event(
+    sessionmaker: async_sessionmaker, event_id: str, owner: str
+) -> dict[str, str]:
+    # One short transaction per claimed event: the handler's writes and the outcome commit
+    # together, and nothing that goes wrong here touches the other events of the batch.
+    async with sessionmaker() as session:
+        async with session.begin():
+            locked = await lock_leased_events(session, [event_id], owner)
+            if not locked:
+                logger.warning("outbox.lease_lost", event_id=event_id, owner=owner)
+                return {event_id: "skipped"}
+            event = locked[0]
+            started = time.perf_counter()
+            error = None
+            try:
+                # The savepoint discards a failed handler's partial writes, including after a
+                # database error, and keeps the transaction usable for recording the failure.
+                async with session.begin_nested():
+                    await handle_outbox_event(session, event)
+            except Exception as exc:  # noqa: BLE001
+                error = str(exc)[:1000]
+            HANDLER_SECONDS.observe(time.perf_counter() - started, event_type=event.event_type)
+            if error is not None:
+                await mark_failed(
+                    session, event, event.attempt_count + 1, error, settings.worker_max_attempts
+                )
+                return {event_id: "failed"}
+            await mark_processed(session, event)
+            return {event_id: "processed"}
+
+
+async def _process_batch(
+    sessionmaker: async_sessionmaker, event_type: str, event_ids: list[str], owner: str
+) -> dict[str, str]:
+    # All claimed events of one type that has a batch handler: one handler call and one bulk
+    # status update for the lot, in one transaction.
+    outcomes = dict.fromkeys(event_ids, "skipped")
+    async with sessionmaker() as session:
+        async with session.begin():
+            events = await lock_leased_events(session, event_ids, owner)
+            if not events:
+                return outcomes
+            locked_ids = [str(event.id) for event in events]
+            started = time.perf_counter()
+            try:
+                async with session.begin_nested():
+                    failures = await handle_outbox_events(session, event_type, events)
+            except Exception as exc:  # noqa: BLE001
+                failures = None
+                logger.warning("outbox.batch_failed", event_type=event_type, error=str(exc))
+            HANDLER_SECONDS.observe(time.perf_counter() - started, event_type=event_type)
+            if failures is not None:
+                # Both outcomes are written set-based, one statement each.
+                await mark_processed_many(
+                    session, [event for event in events if str(event.id) not in failures]
+                )
+                await mark_failed_many(
+                    session,
+                    [
+                        (event, failures[str(event.id)][:1000])
+                        for event in events
+                        if str(event.id) in failures
+                    ],
+                    settings.worker_max_attempts,
+                )
+                for event in events:
+                    failed = str(event.id) in failures
+                    outcomes[str(event.id)] = "failed" if failed else "processed"
+                return outcomes
+    # The batch as a whole broke (e.g. a database error); go one event at a time so only the
+    # event at fault is retried.
+    for event_id in locked_ids:
+        outcomes.update(await _process_event(sessionmaker, event_id, owner))
+    return outcomes
+
+
+async def _guarded(semaphore: asyncio.Semaphore, work) -> dict[str, str]:
+    async with semaphore:
+        return await work
+
+
+async def _process_wave(
+    sessionmaker: async_sessionmaker,
+    wave: list[tuple[str, str]],
+    owner: str,
+    semaphore: asyncio.Semaphore,
+) -> dict[str, str]:
+    batches: dict[str, list[str]] = {}
+    work = []
+    for event_id, event_type in wave:
+        if has_batch_handler(event_type):
+            batches.setdefault(event_type, []).append(event_id)
+        else:
+            work.append(_process_event(sessionmaker, event_id, owner))
+    work.extend(
+        _process_batch(sessionmaker, event_type, event_ids, owner)
+        for event_type, event_ids in batches.items()
+    )
+    outcomes: dict[str, str] = {}
+    results = await asyncio.gather(
+        *(_guarded(semaphore, item) for item in work), return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.error("outbox.dispatch_failed", error=str(result))
+            continue
+        outcomes.update(result)
+    return outcomes
+
+
+async def process_due_events(
+    sessionmaker: async_sessionmaker = SessionLocal,
+    batch_size: int | None = None,
+    concurrency: int | None = None,
+    partitions: list[int] | None = None,
+    owner: str = DEFAULT_OWNER,
+) -> int:
+    # ``partitions`` limits the pass to the ones this worker has leased; None means all.
+    if partitions == []:
+        return 0
+    # The claim commits on its own; handlers run afterwards without it holding anything open.
+    batch_size = batch_size or settings.worker_batch_size
+    started = time.perf_counter()
+    async with sessionmaker() as session:
+        async with session.begin():
+            claimed = await claim_due_events(session, batch_size, owner, partitions)
+            queues: dict[str, list[tuple[str, str]]] = {}
+            for event in claimed:
+                queues.setdefault(str(event.aggregate_id), []).append(
+                    (str(event.id), event.event_type)
+                )
+    CLAIM_SECONDS.observe(time.perf_counter() - started)
+    BATCH_FILL.observe(len(claimed) / batch_size)
+
+    # Each wave takes the oldest remaining event of every aggregate, so different aggregates run
+    # side by side (same-type events in one batch) while one aggregate's events stay in order.
+    semaphore = asyncio.Semaphore(concurrency or settings.worker_concurrency)
+    handled = 0
+    while queues:
+        wave = {aggregate_id: queue.pop(0) for aggregate_id, queue in queues.items()}
+        outcomes = await _process_wave(sessionmaker, list(wave.values()), owner, semaphore)
+        held_back: list[str] = []
+        for aggregate_id, (event_id, _) in wave.items():
+            outcome = outcomes.get(event_id, "skipped")
+            handled += outcome != "skipped"
+            if outcome != "processed":
+                # Later events of this aggregate wait until this one has gone through; hand
+                # their leases back so they do not sit out the full lease.
+                held_back.extend(queued_id for queued_id, _ in queues[aggregate_id])
+                queues[aggregate_id] = []
+        queues = {aggregate_id: queue for aggregate_id, queue in queues.items() if queue}
+        if held_back:
+            async with sessionmaker() as session:
+                async with session.begin():
+                    await release_outbox_leases(session, held_back, owner)
+    return handled
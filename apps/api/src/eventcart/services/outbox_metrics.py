@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from eventcart.core.metrics import registry
+from eventcart.core.settings import settings
+from eventcart.repo.outbox_delivery_repo import pending_deliveries_by_subscription
+from eventcart.repo.outbox_repo import oldest_due_at, pending_counts_by_type
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FILL_BUCKETS = (0.1, 0.25, 0.5, 0.75, 0.9, 1.0)
+
+# Refreshed from the database every WORKER_STATS_INTERVAL_SECONDS, not on every pass, and by one
+# worker process only. Counts stop at WORKER_STATS_COUNT_LIMIT rows.
+PENDING = registry.gauge(
+    "eventcart_outbox_pending_events",
+    "PENDING outbox events per event_type, among the next WORKER_STATS_COUNT_LIMIT due.",
+)
+PENDING_DELIVERIES = registry.gauge(
+    "eventcart_outbox_pending_deliveries",
+    "PENDING subscription deliveries per subscription, among the next WORKER_STATS_COUNT_LIMIT.",
+)
+OLDEST_DUE_AGE = registry.gauge(
+    "eventcart_outbox_oldest_due_age_seconds",
+    "How long the longest-waiting due event has been due.",
+)
+
+CLAIM_SECONDS = registry.histogram(
+    "eventcart_outbox_claim_seconds", "Time to claim one batch of due events.", LATENCY_BUCKETS
+)
+HANDLER_SECONDS = registry.histogram(
+    "eventcart_outbox_handler_seconds",
+    "Handler run time per call (a batch handler call counts once).",
+    LATENCY_BUCKETS,
+)
+EVENTS = registry.counter(
+    "eventcart_outbox_events_total", "Outbox events handled, by event_type and outcome."
+)
+BATCH_FILL = registry.histogram(
+    "eventcart_outbox_batch_fill_ratio",
+    "Claimed events over the requested batch size.",
+    FILL_BUCKETS,
+)
+PUBLISH_SECONDS = registry.histogram(
+    "eventcart_outbox_publish_seconds",
+    "Time for the relay sink to accept one batch.",
+    LATENCY_BUCKETS,
+)
+BATCH_SIZE = registry.gauge("eventcart_outbox_batch_size", "Current adaptive claim size.")
+
+
+def record_outcome(event_type: str, status: str) -> None:
+    # status is what the event was left in: PROCESSED, PENDING (will retry) or DEAD.
+    outcome = {"PROCESSED": "processed", "DEAD": "dead"}.get(status, "failed")
+    EVENTS.inc(event_type=event_type, outcome=outcome)
+
+
+async def refresh_outbox_gauges(session: AsyncSession) -> None:
+    now = datetime.now(timezone.utc)
+    limit = settings.worker_stats_count_limit
+    PENDING.replace(await pending_counts_by_type(session, limit), "event_type")
+    pending_deliveries = await pending_deliveries_by_subscription(session, limit)
+    PENDING_DELIVERIES.replace(pending_deliveries, "subscription")
+    due_at = await oldest_due_at(session, now)
+    OLDEST_DUE_AGE.set(0.0 if due_at is None else (now - due_at).total_seconds())
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import math
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from eventcart.core.settings import settings
+from eventcart.repo.outbox_partition_repo import (
+    acquire_leases,
+    count_live_consumers,
+    ensure_partitions,
+    heartbeat_consumer,
+    purge_dead_consumers,
+    release_leases,
+    remove_consumer,
+    renew_leases,
+)
+
+
+async def refresh_partition_leases(session: AsyncSession, consumer_id: str) -> list[int]:
+    # Called every third of a lease period. Each live consumer aims for an equal share: it
+    # renews what it holds, hands back any surplus, and picks up free or expired partitions.
+    now = datetime.now(timezone.utc)
+    ttl = timedelta(seconds=settings.worker_lease_seconds)
+    partitions = settings.outbox_partitions
+
+    await ensure_partitions(session, partitions)
+    await heartbeat_consumer(session, consumer_id, now)
+    await purge_dead_consumers(session, now - 10 * ttl)
+    share = math.ceil(partitions / max(1, await count_live_consumers(session, now - ttl)))
+
+    held = await renew_leases(session, consumer_id, now, now + ttl, partitions)
+    if len(held) > share:
+        await release_leases(session, consumer_id, held[share:])
+        held = held[:share]
+    elif len(held) < share:
+        held += await acquire_leases(
+            session, consumer_id, now, now + ttl, partitions, share - len(held)
+        )
+    return sorted(held)
+
+
+async def leave_partitions(session: AsyncSession, consumer_id: str) -> None:
+    # On shutdown, so the remaining workers take over without waiting for leases to run out.
+    await release_leases(session, consumer_id)
+    await remove_consumer(session, consumer_id)
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import structlog
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from eventcart.core.settings import settings
+from eventcart.db.session import SessionLocal
+from eventcart.models.outbox import OutboxEvent
+from eventcart.repo.outbox_delivery_repo import (
+    lease_due_deliveries,
+    lock_leased_deliveries,
+    mark_deliveries_done,
+    mark_delivery_failed,
+)
+from eventcart.services.outbox_metrics import PUBLISH_SECONDS
+from eventcart.services.outbox_service import DEFAULT_OWNER, failure_outcome
+from eventcart.services.outbox_sinks import OutboxSink
+from eventcart.services.subscriptions import RELAY_SUBSCRIPTION
+
+logger = structlog.get_logger()
+
+
+def relay_message(event: OutboxEvent, attempt: int) -> dict:
+    # The event id is the de-duplication key: delivery is at-least-once, so a consumer can see
+    # the same event again (e.g. when the worker dies between publishing and recording it).
+    return {
+        "id": str(event.id),
+        "event_type": event.event_type,
+        "aggregate_type": event.aggregate_type,
+        "aggregate_id": str(event.aggregate_id),
+        "payload": event.payload,
+        "created_at": event.created_at.isoformat(),
+        "attempt": attempt,
+    }
+
+
+def _split(events: list[OutboxEvent], batch_size: int) -> list[list[OutboxEvent]]:
+    # All events of an aggregate go into one batch, in lease (created_at) order, so batches in
+    # flight side by side cannot reorder them.
+    aggregates: dict[str, list[OutboxEvent]] = {}
+    for event in events:
+        aggregates.setdefault(str(event.aggregate_id), []).append(event)
+    batches: list[list[OutboxEvent]] = []
+    current: list[OutboxEvent] = []
+    for aggregate_events in aggregates.values():
+        if current and len(current) + len(aggregate_events) > batch_size:
+            batches.append(current)
+            current = []
+        current.extend(aggregate_events)
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def _publish(
+    sink: OutboxSink, semaphore: asyncio.Semaphore, messages: list[dict]
+) -> str | None:
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            await sink.publish(messages)
+        except Exception as exc:  # noqa: BLE001
+            return str(exc)[:1000] or type(exc).__name__
+        finally:
+            PUBLISH_SECONDS.observe(time.perf_counter() - started)
+    return None
+
+
+async def relay_due_deliveries(
+    sink: OutboxSink,
+    sessionmaker: async_sessionmaker = SessionLocal,
+    batch_size: int | None = None,
+    in_flight: int | None = None,
+    owner: str = DEFAULT_OWNER,
+) -> int:
+    # Publishes the relay subscription's due deliveries. The events themselves are left to the
+    # worker's handlers; the relay only ever changes its own delivery rows. One pass leases up to
+    # in_flight batches, publishes them concurrently and records every outcome in one
+    # transaction afterwards.
+    batch_size = batch_size or settings.outbox_relay_batch_size
+    in_flight = in_flight or settings.outbox_relay_in_flight
+    now = datetime.now(timezone.utc)
+    lease_until = now + timedelta(seconds=settings.worker_event_lease_seconds)
+    async with sessionmaker() as session:
+        async with session.begin():
+            leased = await lease_due_deliveries(
+                session, RELAY_SUBSCRIPTION, owner, now, lease_until, batch_size * in_flight
+            )
+            locked = await lock_leased_deliveries(
+                session, RELAY_SUBSCRIPTION, [str(delivery.event_id) for delivery in leased], owner
+            )
+            attempts = {str(event.id): delivery.attempt_count + 1 for delivery, event in locked}
+            batches = [
+                (
+                    [str(event.id) for event in batch],
+                    [relay_message(event, attempts[str(event.id)]) for event in batch],
+                )
+                for batch in _split([event for _, event in locked], batch_size)
+            ]
+    if not batches:
+        return 0
+
+    semaphore = asyncio.Semaphore(in_flight)
+    errors = await asyncio.gather(
+        *(_publish(sink, semaphore, messages) for _, messages in batches)
+    )
+    failed = {
+        event_id: error
+        for (event_ids, _), error in zip(batches, errors)
+        if error is not None
+        for event_id in event_ids
+    }
+    for error in set(failed.values()):
+        logger.warning("outbox.publish_failed", error=error)
+
+    async with sessionmaker() as session:
+        async with session.begin():
+            # Deliveries whose lease ran out meanwhile belong to another relay process now; they
+            # may be published twice, which the event id lets consumers absorb.
+            locked = await lock_leased_deliveries(
+                session,
+                RELAY_SUBSCRIPTION,
+                [event_id for event_ids, _ in batches for event_id in event_ids],
+                owner,
+            )
+            await mark_deliveries_done(
+                session,
+                RELAY_SUBSCRIPTION,
+                [str(event.id) for _, event in locked if str(event.id) not in failed],
+                datetime.now(timezone.utc),
+            )
+            for delivery, event in locked:
+                error = failed.get(str(event.id))
+                if error is None:
+                    continue
+                # A sink outage is not the events' fault: they back off but are never
+                # dead-lettered.
+                attempt = delivery.attempt_count + 1
+                status, next_attempt = failure_outcome(attempt, None)
+                await mark_delivery_failed(session, delivery, attempt, next_attempt, error, status)
+    return len(locked)
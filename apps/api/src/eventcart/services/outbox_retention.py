@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta, timezone
+
+import structlog
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from eventcart.core.settings import settings
+from eventcart.db.session import SessionLocal
+from eventcart.repo.outbox_archive_repo import (
+    archive_partition,
+    create_partition,
+    delete_finished_deliveries,
+    detach_partition,
+    drop_partition,
+    has_open_events,
+    has_pending_deliveries,
+    list_partitions,
+    partition_range,
+    set_lock_timeout,
+    try_maintenance_lock,
+)
+
+logger = structlog.get_logger()
+
+
+async def create_upcoming_partitions(session: AsyncSession, today: date) -> list[str]:
+    if not await try_maintenance_lock(session):
+        return []
+    partitions = await list_partitions(session)
+    # Ranges continue from the newest partition; after a long pause they restart at today and
+    # the gap is left to the default partition.
+    start = max(partitions[-1][2], today) if partitions else today
+    created: list[str] = []
+    while start <= today + timedelta(days=settings.outbox_partitions_ahead):
+        end = start + timedelta(days=settings.outbox_partition_days)
+        try:
+            async with session.begin_nested():
+                created.append(await create_partition(session, start, end))
+        except DBAPIError as exc:
+            # The default partition already holds rows in this range; leave it for an operator.
+            logger.warning("outbox.partition_create_failed", start=str(start), error=str(exc))
+            break
+        start = end
+    return created
+
+
+async def expired_partitions(session: AsyncSession, today: date, retention_days: int) -> list[str]:
+    cutoff = today - timedelta(days=retention_days)
+    return [name for name, _, end in await list_partitions(session) if end <= cutoff]
+
+
+async def clear_partition_deliveries(
+    sessionmaker: async_sessionmaker, name: str, batch_size: int
+) -> bool:
+    # Finished subscription deliveries go with their events. They are deleted in short chunked
+    # transactions ahead of the detach, so none of this runs under the parent's lock. False
+    # (and nothing deleted) while the partition still has anything pending.
+    start, end = partition_range(name)
+    async with sessionmaker() as session:
+        async with session.begin():
+            if await has_open_events(session, name):
+                return False
+            if await has_pending_deliveries(session, start, end):
+                return False
+    while True:
+        async with sessionmaker() as session:
+            async with session.begin():
+                if await delete_finished_deliveries(session, start, end, batch_size) < batch_size:
+                    return True
+
+
+async def retire_partition(session: AsyncSession, name: str, mode: str) -> bool:
+    # Cheap check first so partitions with open events never take the parent's lock.
+    if not await try_maintenance_lock(session) or await has_open_events(session, name):
+        return False
+    # DETACH briefly takes an ACCESS EXCLUSIVE lock on outbox_events; give up rather than queue
+    # every claim and insert behind it.
+    await set_lock_timeout(session, 5)
+    await detach_partition(session, name)
+    # Nothing can write to it now; a DLQ requeue may have slipped in before the detach. The
+    # deliveries were cleared beforehand and, as they are only written with new events, stay so.
+    if await has_open_events(session, name):
+        await session.rollback()
+        return False
+    if mode == "archive":
+        await archive_partition(session, name)
+    else:
+        await drop_partition(session, name)
+    return True
+
+
+async def maintain_outbox_partitions(
+    sessionmaker: async_sessionmaker = SessionLocal,
+    today: date | None = None,
+    retention_days: int | None = None,
+    mode: str | None = None,
+) -> dict[str, list[str]]:
+    # One short transaction per step, so the parent table is only locked for a single detach.
+    today = today or datetime.now(timezone.utc).date()
+    retention_days = settings.outbox_retention_days if retention_days is None else retention_days
+    mode = mode or settings.outbox_archive_mode
+    async with sessionmaker() as session:
+        async with session.begin():
+            created = await create_upcoming_partitions(session, today)
+        async with session.begin():
+            candidates = await expired_partitions(session, today, retention_days)
+
+    retired: list[str] = []
+    for name in candidates:
+        try:
+            batch_size = settings.outbox_retention_batch_size
+            if not await clear_partition_deliveries(sessionmaker, name, batch_size):
+                continue
+            async with sessionmaker() as session:
+                async with session.begin():
+                    if await retire_partition(session, name, mode):
+                        retired.append(name)
+        except DBAPIError as exc:
+            logger.warning("outbox.partition_retire_failed", partition=name, error=str(exc))
+    if created or retired:
+        logger.info("outbox.partitions_maintained", created=created, retired=retired, mode=mode)
+    return {"created": created, "retired": retired}
@@ -1,12 +1,27 @@
 from __future__ import annotations
 
+import os
 import random
+import socket
 from datetime import datetime, timedelta, timezone
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from eventcart.core.settings import settings
 from eventcart.models.outbox import OutboxEvent
-from eventcart.repo.outbox_repo import fetch_due_events, mark_outbox_failed, mark_outbox_processed
+from eventcart.repo.outbox_repo import (
+    count_due_events,
+    lease_due_events,
+    mark_outbox_failed,
+    mark_outbox_failed_many,
+    mark_outbox_processed,
+    mark_outbox_processed_many,
+    next_due_at,
+)
+from eventcart.services.outbox_metrics import record_outcome
+
+# Lease owner for callers that do not name one (the worker passes its consumer id).
+DEFAULT_OWNER = f"{socket.gethostname()}-{os.getpid()}"
 
 
 def compute_backoff(attempt: int, base_seconds: float = 2.0, max_seconds: float = 60.0) -> float:
@@ -15,24 +30,75 @@ def compute_backoff(attempt: int, base_seconds: float = 2.0, max_seconds: float
     return exp + jitter
 
 
-async def claim_due_events(session: AsyncSession, batch_size: int = 10) -> list[OutboxEvent]:
+async def claim_due_events(
+    session: AsyncSession,
+    batch_size: int = 10,
+    owner: str = DEFAULT_OWNER,
+    partitions: list[int] | None = None,
+) -> list[OutboxEvent]:
     now = datetime.now(timezone.utc)
-    return await fetch_due_events(session, now, limit=batch_size)
+    lease_until = now + timedelta(seconds=settings.worker_event_lease_seconds)
+    return await lease_due_events(session, owner, now, lease_until, batch_size, partitions)
+
+
+async def seconds_until_next_due(session: AsyncSession) -> float | None:
+    due_at = await next_due_at(session)
+    if due_at is None:
+        return None
+    return max(0.0, (due_at - datetime.now(timezone.utc)).total_seconds())
+
+
+async def count_backlog(session: AsyncSession, partitions: list[int] | None = None) -> int:
+    return await count_due_events(
+        session, datetime.now(timezone.utc), partitions, settings.worker_stats_count_limit
+    )
 
 
 async def mark_processed(session: AsyncSession, event: OutboxEvent) -> None:
     await mark_outbox_processed(session, event, datetime.now(timezone.utc))
+    record_outcome(event.event_type, "PROCESSED")
+
+
+async def mark_processed_many(session: AsyncSession, events: list[OutboxEvent]) -> None:
+    await mark_outbox_processed_many(
+        session, [str(event.id) for event in events], datetime.now(timezone.utc)
+    )
+    for event in events:
+        record_outcome(event.event_type, "PROCESSED")
+
+
+def failure_outcome(attempt: int, max_attempts: int | None) -> tuple[str, datetime]:
+    # max_attempts=None retries for good (with the backoff capped), e.g. while a broker is down.
+    if max_attempts is not None and attempt >= max_attempts:
+        return "DEAD", datetime.now(timezone.utc) + timedelta(days=365)
+    delay = compute_backoff(attempt)
+    return "PENDING", datetime.now(timezone.utc) + timedelta(seconds=delay)
 
 
 async def mark_failed(
     session: AsyncSession, event: OutboxEvent, attempt: int, error: str, max_attempts: int
 ) -> None:
-    if attempt >= max_attempts:
-        status = "DEAD"
-        next_attempt = datetime.now(timezone.utc) + timedelta(days=365)
-    else:
-        status = "PENDING"
-        delay = compute_backoff(attempt)
-        next_attempt = datetime.now(timezone.utc) + timedelta(seconds=delay)
-
+    status, next_attempt = failure_outcome(attempt, max_attempts)
     await mark_outbox_failed(session, event, attempt, next_attempt, error, status)
+    record_outcome(event.event_type, status)
+
+
+async def mark_failed_many(
+    session: AsyncSession, failures: list[tuple[OutboxEvent, str]], max_attempts: int
+) -> None:
+    rows = []
+    for event, error in failures:
+        attempt = event.attempt_count + 1
+        status, next_attempt = failure_outcome(attempt, max_attempts)
+        rows.append(
+            {
+                "id": event.id,
+                "attempt_count": attempt,
+                "next_attempt_at": next_attempt,
+                "last_error": error,
+                "status": status,
+            }
+        )
+    await mark_outbox_failed_many(session, rows)
+    for (event, _), row in zip(failures, rows):
+        record_outcome(event.event_type, row["status"])
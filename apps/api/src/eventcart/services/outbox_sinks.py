@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+import orjson
+
+DEFAULT_STREAM = "eventcart.outbox"
+
+
+class SinkError(Exception):
+    pass
+
+
+class OutboxSink(ABC):
+    # Where the relay publishes outbox events. publish() returns once every message of the batch
+    # is durably accepted and raises otherwise; the relay may call it for several batches at once.
+    async def open(self) -> None:
+        pass
+
+    @abstractmethod
+    async def publish(self, messages: list[dict]) -> None: ...
+
+    async def close(self) -> None:
+        pass
+
+
+class FileSink(OutboxSink):
+    # JSON lines appended to a local file and fsynced per batch: a stand-in broker for local runs.
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = None
+        self._lock = asyncio.Lock()
+
+    async def open(self) -> None:
+        if self._file is None:
+            self._file = await asyncio.to_thread(open, self.path, "ab")
+
+    async def publish(self, messages: list[dict]) -> None:
+        data = b"".join(orjson.dumps(message) + b"\n" for message in messages)
+        async with self._lock:
+            await self.open()
+            await asyncio.to_thread(self._write, data)
+
+    def _write(self, data: bytes) -> None:
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    async def close(self) -> None:
+        if self._file is not None:
+            await asyncio.to_thread(self._file.close)
+            self._file = None
+
+
+def _command(*args: str | bytes) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        value = arg if isinstance(arg, bytes) else arg.encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(value), value))
+    return b"".join(parts)
+
+
+async def _read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("connection closed by the server")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        # Returned rather than raised so the replies after it stay in step.
+        return SinkError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        if int(body) < 0:
+            return None
+        data = await reader.readexactly(int(body) + 2)
+        return data[:-2].decode()
+    if kind == b"*":
+        if int(body) < 0:
+            return None
+        return [await _read_reply(reader) for _ in range(int(body))]
+    raise ConnectionError(f"unexpected reply {line!r}")
+
+
+class RedisStreamSink(OutboxSink):
+    # XADD per event on one connection, speaking RESP directly. Batches are pipelined: each
+    # publish() writes its commands without waiting for earlier batches' replies, and a reader
+    # task hands replies back in order.
+    #   redis://[:password@]host[:port][/db]?stream=name[&maxlen=n]
+    #   redis+unix:///path/to/redis.sock?stream=name[&db=n]
+    def __init__(self, url: str) -> None:
+        parsed = urlsplit(url)
+        query = {name: values[-1] for name, values in parse_qs(parsed.query).items()}
+        self._unix_path = parsed.path if parsed.scheme == "redis+unix" else None
+        self._host = parsed.hostname or "localhost"
+        self._port = parsed.port or 6379
+        self._password = parsed.password
+        if self._unix_path is None:
+            self._db = int(parsed.path.strip("/") or 0)
+        else:
+            self._db = int(query.get("db", 0))
+        self.stream = query.get("stream", DEFAULT_STREAM)
+        # Approximate trimming (MAXLEN ~), so Redis trims whole nodes cheaply.
+        self._maxlen = query.get("maxlen")
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._pending: deque[tuple[int, asyncio.Future]] = deque()
+        self._connecting: asyncio.Lock = asyncio.Lock()
+
+    async def open(self) -> None:
+        async with self._connecting:
+            if self._writer is not None:
+                return
+            if self._unix_path is not None:
+                reader, writer = await asyncio.open_unix_connection(self._unix_path)
+            else:
+                reader, writer = await asyncio.open_connection(self._host, self._port)
+            self._writer = writer
+            self._reader_task = asyncio.create_task(self._read_replies(reader))
+            setup = []
+            if self._password:
+                setup.append(("AUTH", self._password))
+            if self._db:
+                setup.append(("SELECT", str(self._db)))
+            if setup:
+                try:
+                    await self._send(setup)
+                except BaseException:
+                    # Not kept half set up: after a failed AUTH nothing would ever reconnect, and
+                    # after a failed SELECT every XADD would go to db 0.
+                    await self.close()
+                    raise
+
+    def _xadd(self, message: dict) -> tuple[str | bytes, ...]:
+        trim = ("MAXLEN", "~", self._maxlen) if self._maxlen else ()
+        # event_id travels as a field so consumers can drop the duplicates at-least-once allows.
+        return (
+            "XADD",
+            self.stream,
+            *trim,
+            "*",
+            "event_id",
+            message["id"],
+            "event_type",
+            message["event_type"],
+            "aggregate_id",
+            message["aggregate_id"],
+            "data",
+            orjson.dumps(message),
+        )
+
+    async def publish(self, messages: list[dict]) -> None:
+        if not messages:
+            return
+        await self.open()
+        await self._send([self._xadd(message) for message in messages])
+
+    async def _send(self, commands: list[tuple]) -> list:
+        if self._writer is None:
+            raise SinkError("redis connection lost")
+        future = asyncio.get_running_loop().create_future()
+        # Queued and written with no await in between, so the queue matches the order on the wire.
+        self._pending.append((len(commands), future))
+        self._writer.write(b"".join(_command(*command) for command in commands))
+        await self._writer.drain()
+        replies = await future
+        errors = [reply for reply in replies if isinstance(reply, SinkError)]
+        if errors:
+            raise errors[0]
+        return replies
+
+    async def _read_replies(self, reader: asyncio.StreamReader) -> None:
+        replies: list = []
+        try:
+            while True:
+                replies.append(await _read_reply(reader))
+                count, future = self._pending[0]
+                if len(replies) == count:
+                    self._pending.popleft()
+                    if not future.done():
+                        future.set_result(replies)
+                    replies = []
+        except (ConnectionError, OSError, asyncio.IncompleteReadError) as exc:
+            self._fail_pending(SinkError(f"redis connection lost: {exc}"))
+        except asyncio.CancelledError:
+            self._fail_pending(SinkError("redis sink closed"))
+            raise
+
+    def _fail_pending(self, error: SinkError) -> None:
+        # Whatever was sent but not acknowledged counts as not published; the next publish()
+        # reconnects.
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        while self._pending:
+            _, future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(error)
+
+    async def close(self) -> None:
+        writer = self._writer
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+        self._writer = None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+
+def create_sink(url: str) -> OutboxSink:
+    parsed = urlsplit(url)
+    if parsed.scheme == "file":
+        return FileSink(parsed.path)
+    if parsed.scheme in ("redis", "redis+unix"):
+        return RedisStreamSink(url)
+    raise ValueError(f"unsupported outbox sink {url!r}")
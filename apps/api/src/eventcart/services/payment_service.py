@@ -1,16 +1,23 @@
 from __future__ import annotations
 
+from datetime import datetime, timezone
+
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from eventcart.models.order import Order
 from eventcart.repo.order_repo import update_order_status
 from eventcart.repo.outbox_repo import create_outbox_event
+from eventcart.services.subscriptions import subscribers
 
 
 async def confirm_payment(session: AsyncSession, order: Order) -> None:
+    # Lock the order so the reservation expiry handler cannot cancel it underneath us.
+    await session.refresh(order, with_for_update=True)
     if order.status != "PENDING_PAYMENT":
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid order state")
+    if order.reserved_until and order.reserved_until <= datetime.now(timezone.utc):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Reservation expired")
 
     await update_order_status(session, order, "PAID")
 
@@ -20,4 +27,5 @@ async def confirm_payment(session: AsyncSession, order: Order) -> None:
         aggregate_id=str(order.id),
         event_type="order.paid",
         payload={"order_id": str(order.id), "user_id": str(order.user_id)},
+        subscriptions=subscribers("order.paid"),
     )
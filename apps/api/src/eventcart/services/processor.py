@@ -1,21 +1,107 @@
 from __future__ import annotations
 
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
 import structlog
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from eventcart.repo.order_repo import get_order_by_id, update_order_status
+from eventcart.models.outbox import OutboxEvent
+from eventcart.repo.order_repo import (
+    cancel_expired_orders,
+    existing_order_ids,
+    fulfill_paid_orders,
+)
+from eventcart.services.inventory_service import release_order_stock
 
 logger = structlog.get_logger()
 
+EventHandler = Callable[[AsyncSession, OutboxEvent], Awaitable[None]]
+# Receives every claimed event of its type at once and returns an error for each event it could
+# not handle (by event id); all others count as handled.
+BatchHandler = Callable[[AsyncSession, list[OutboxEvent]], Awaitable[dict[str, str]]]
+
+_handlers: dict[str, EventHandler] = {}
+_batch_handlers: dict[str, BatchHandler] = {}
+
+
+def handles(event_type: str) -> Callable[[EventHandler], EventHandler]:
+    def register(handler: EventHandler) -> EventHandler:
+        _handlers[event_type] = handler
+        return handler
+
+    return register
+
+
+def handles_batch(event_type: str) -> Callable[[BatchHandler], BatchHandler]:
+    def register(handler: BatchHandler) -> BatchHandler:
+        _batch_handlers[event_type] = handler
+        return handler
+
+    return register
+
+
+def has_batch_handler(event_type: str) -> bool:
+    return event_type in _batch_handlers
+
 
 async def handle_outbox_event(session: AsyncSession, event) -> None:
-    if event.event_type == "order.paid":
-        order_id = event.payload.get("order_id")
-        order = await get_order_by_id(session, order_id)
-        if not order:
-            raise RuntimeError("Order not found for outbox event")
-        await update_order_status(session, order, "FULFILLED")
-        logger.info("order.fulfilled", order_id=order_id)
+    handler = _handlers.get(event.event_type)
+    if handler is None:
+        logger.info("event.ignored", event_type=event.event_type, event_id=str(event.id))
         return
+    await handler(session, event)
+
+
+async def handle_outbox_events(
+    session: AsyncSession, event_type: str, events: list[OutboxEvent]
+) -> dict[str, str]:
+    return await _batch_handlers[event_type](session, events)
+
+
+@handles("order.paid")
+async def fulfill_order(session: AsyncSession, event) -> None:
+    # Same rules as the batch handler: only a PAID order is fulfilled, any other existing order
+    # is left as it is.
+    order_id = uuid.UUID(str(event.payload.get("order_id")))
+    if await fulfill_paid_orders(session, [order_id], datetime.now(timezone.utc)):
+        logger.info("order.fulfilled", order_id=str(order_id))
+    elif not await existing_order_ids(session, [order_id]):
+        raise RuntimeError("Order not found for outbox event")
+
+
+@handles_batch("order.paid")
+async def fulfill_orders(session: AsyncSession, events: list[OutboxEvent]) -> dict[str, str]:
+    failures: dict[str, str] = {}
+    order_ids: dict[str, uuid.UUID] = {}
+    for event in events:
+        try:
+            order_ids[str(event.id)] = uuid.UUID(str(event.payload.get("order_id")))
+        except ValueError:
+            failures[str(event.id)] = "Invalid order id in outbox event"
+    if not order_ids:
+        return failures
+
+    wanted = list(set(order_ids.values()))
+    fulfilled = await fulfill_paid_orders(session, wanted, datetime.now(timezone.utc))
+    # Orders that are no longer PAID (already fulfilled, cancelled) need nothing more; only a
+    # missing order is an error, and that is rare enough to check separately.
+    unchanged = [order_id for order_id in wanted if str(order_id) not in fulfilled]
+    existing = await existing_order_ids(session, unchanged) if unchanged else set()
+    for event_id, order_id in order_ids.items():
+        if str(order_id) in fulfilled or str(order_id) in existing:
+            continue
+        failures[event_id] = "Order not found for outbox event"
+    if fulfilled:
+        logger.info("order.fulfilled", order_ids=fulfilled)
+    return failures
+
 
-    logger.info("event.ignored", event_type=event.event_type, event_id=str(event.id))
+@handles("order.reservation_expired")
+async def expire_reservation(session: AsyncSession, event) -> None:
+    order_id = event.payload.get("order_id")
+    cancelled = await cancel_expired_orders(session, [order_id], datetime.now(timezone.utc))
+    await release_order_stock(session, cancelled)
+    if cancelled:
+        logger.info("order.cancelled", order_id=order_id, reason="reservation_expired")
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import structlog
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from eventcart.core.settings import settings
+from eventcart.db.session import SessionLocal
+from eventcart.repo.outbox_delivery_repo import (
+    lease_due_deliveries,
+    lock_leased_delivery,
+    mark_delivery_done,
+    mark_delivery_failed,
+    next_delivery_due_at,
+    release_delivery_leases,
+)
+from eventcart.services.outbox_service import DEFAULT_OWNER, failure_outcome
+from eventcart.services.subscriptions import Subscription, get_subscription
+
+logger = structlog.get_logger()
+
+
+async def seconds_until_next_delivery(session: AsyncSession, subscription: str) -> float | None:
+    due_at = await next_delivery_due_at(session, subscription)
+    if due_at is None:
+        return None
+    return max(0.0, (due_at - datetime.now(timezone.utc)).total_seconds())
+
+
+async def _deliver(
+    sessionmaker: async_sessionmaker, subscription: Subscription, event_id: str, owner: str
+) -> str:
+    # One transaction per delivery, like _process_event in outbox_dispatcher.
+    async with sessionmaker() as session:
+        async with session.begin():
+            locked = await lock_leased_delivery(session, subscription.name, event_id, owner)
+            if locked is None:
+                logger.warning(
+                    "subscription.lease_lost", subscription=subscription.name, event_id=event_id
+                )
+                return "skipped"
+            delivery, event = locked
+            try:
+                async with session.begin_nested():
+                    await subscription.handler(session, event)
+            except Exception as exc:  # noqa: BLE001
+                attempt = delivery.attempt_count + 1
+                status, next_attempt = failure_outcome(attempt, settings.worker_max_attempts)
+                await mark_delivery_failed(
+                    session, delivery, attempt, next_attempt, str(exc)[:1000], status
+                )
+                return "failed"
+            await mark_delivery_done(session, delivery, datetime.now(timezone.utc))
+            return "processed"
+
+
+async def _deliver_aggregate(
+    sessionmaker: async_sessionmaker,
+    subscription: Subscription,
+    event_ids: list[str],
+    owner: str,
+    semaphore: asyncio.Semaphore,
+) -> tuple[int, list[str]]:
+    # One aggregate's deliveries in order; returns how many were handled and the ones left
+    # behind a delivery that did not go through.
+    handled = 0
+    async with semaphore:
+        for position, event_id in enumerate(event_ids):
+            outcome = await _deliver(sessionmaker, subscription, event_id, owner)
+            handled += outcome != "skipped"
+            if outcome != "processed":
+                return handled, event_ids[position + 1 :]
+    return handled, []
+
+
+async def process_due_deliveries(
+    name: str,
+    sessionmaker: async_sessionmaker = SessionLocal,
+    batch_size: int | None = None,
+    concurrency: int | None = None,
+    owner: str = DEFAULT_OWNER,
+) -> int:
+    subscription = get_subscription(name)
+    if subscription is None:
+        raise ValueError(f"unknown subscription {name!r}")
+    now = datetime.now(timezone.utc)
+    lease_until = now + timedelta(seconds=settings.worker_event_lease_seconds)
+    async with sessionmaker() as session:
+        async with session.begin():
+            claimed = await lease_due_deliveries(
+                session, name, owner, now, lease_until, batch_size or settings.worker_batch_size
+            )
+            queues: dict[str, list[str]] = {}
+            for delivery in claimed:
+                queues.setdefault(str(delivery.aggregate_id), []).append(str(delivery.event_id))
+
+    # Aggregates side by side, each aggregate's deliveries one after the other.
+    semaphore = asyncio.Semaphore(concurrency or settings.worker_concurrency)
+    results = await asyncio.gather(
+        *(
+            _deliver_aggregate(sessionmaker, subscription, event_ids, owner, semaphore)
+            for event_ids in queues.values()
+        ),
+        return_exceptions=True,
+    )
+    handled = 0
+    held_back: list[str] = []
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.error("subscription.dispatch_failed", subscription=name, error=str(result))
+            continue
+        handled += result[0]
+        held_back.extend(result[1])
+    if held_back:
+        async with sessionmaker() as session:
+            async with session.begin():
+                await release_delivery_leases(session, name, held_back, owner)
+    return handled
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+import structlog
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from eventcart.core.settings import settings
+from eventcart.models.outbox import OutboxEvent
+
+logger = structlog.get_logger()
+
+SubscriptionHandler = Callable[[AsyncSession, OutboxEvent], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class Subscription:
+    name: str
+    event_types: frozenset[str]
+    handler: SubscriptionHandler
+
+
+_subscriptions: dict[str, Subscription] = {}
+
+# The relay (services/outbox_relay.py) is a subscription without a handler: it gets a delivery
+# of every event and publishes it to OUTBOX_RELAY_URL.
+RELAY_SUBSCRIPTION = "relay"
+
+
+def subscribes(
+    name: str, *event_types: str
+) -> Callable[[SubscriptionHandler], SubscriptionHandler]:
+    def register(handler: SubscriptionHandler) -> SubscriptionHandler:
+        _subscriptions[name] = Subscription(name, frozenset(event_types), handler)
+        return handler
+
+    return register
+
+
+def get_subscription(name: str) -> Subscription | None:
+    return _subscriptions.get(name)
+
+
+def registered_subscriptions() -> list[str]:
+    return sorted([*_subscriptions, RELAY_SUBSCRIPTION])
+
+
+def subscribers(event_type: str) -> list[str]:
+    # Enabled subscriptions that want this event type; each gets a delivery row with the event.
+    enabled = (name.strip() for name in settings.outbox_subscriptions.split(","))
+    return [
+        name
+        for name in enabled
+        if name == RELAY_SUBSCRIPTION
+        or (name in _subscriptions and event_type in _subscriptions[name].event_types)
+    ]
+
+
+@subscribes("order-notifications", "order.paid")
+async def notify_order_paid(session: AsyncSession, event: OutboxEvent) -> None:
+    # Stand-in for the confirmation email. It runs in its own worker pool, so a slow mail server
+    # only ever delays these notifications, never fulfillment.
+    logger.info(
+        "notification.order_paid",
+        order_id=event.payload.get("order_id"),
+        user_id=event.payload.get("user_id"),
+    )
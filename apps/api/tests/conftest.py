@@ -18,8 +18,12 @@ def event_loop():
 async def _cleanup(session):
     await session.execute(text("DELETE FROM order_items"))
     await session.execute(text("DELETE FROM orders"))
+    await session.execute(text("DELETE FROM outbox_deliveries"))
     await session.execute(text("DELETE FROM outbox_events"))
+    await session.execute(text("DELETE FROM outbox_partition_leases"))
+    await session.execute(text("DELETE FROM outbox_consumers"))
     await session.execute(text("DELETE FROM idempotency_keys"))
+    await session.execute(text("DELETE FROM product_stock_shards"))
     await session.execute(text("DELETE FROM products"))
     await session.execute(text("DELETE FROM sessions"))
     await session.execute(text("DELETE FROM users"))
@@ -29,5 +33,6 @@ async def _cleanup(session):
 async def db_session():
     async with SessionLocal() as session:
         yield session
+        await session.rollback()
         async with session.begin():
             await _cleanup(session)
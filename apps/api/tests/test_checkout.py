@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select, text
+
+from eventcart.core.security import hash_password
+from eventcart.models.order_item import OrderItem
+from eventcart.models.product import Product
+from eventcart.models.user import User
+from eventcart.services import order_service
+from eventcart.services.checkout_coalescer import CheckoutCoalescer
+from eventcart.services.order_service import create_order_with_idempotency, create_orders_batch
+
+
+async def test_multi_line_order_decrements_all_stock(db_session):
+    user = User(email="bulk@example.com", password_hash=hash_password("Password123!"))
+    products = [
+        Product(sku=f"SKU-B{idx}", name=f"Ticket {idx}", price_cents=100 * idx, stock_qty=10)
+        for idx in range(1, 6)
+    ]
+
+    async with db_session.begin():
+        db_session.add_all([user, *products])
+
+    items = [{"product_id": str(product.id), "qty": idx} for idx, product in enumerate(products, 1)]
+
+    async with db_session.begin():
+        response = await create_order_with_idempotency(db_session, str(user.id), items, None)
+
+    assert [item["product_id"] for item in response["items"]] == [i["product_id"] for i in items]
+    assert [item["unit_price_cents"] for item in response["items"]] == [100, 200, 300, 400, 500]
+    assert response["total_cents"] == sum(100 * idx * idx for idx in range(1, 6))
+
+    result = await db_session.execute(
+        select(Product.sku, Product.stock_qty).order_by(Product.sku)
+    )
+    assert [row.stock_qty for row in result] == [9, 8, 7, 6, 5]
+
+    result = await db_session.execute(
+        select(OrderItem).where(OrderItem.order_id == response["id"])
+    )
+    assert len(result.scalars().all()) == 5
+
+
+async def test_optimistic_checkout_rolls_back_whole_order(db_session):
+    user = User(email="optimistic@example.com", password_hash=hash_password("Password123!"))
+    plenty = Product(sku="SKU-O1", name="Plenty", price_cents=1000, stock_qty=10)
+    scarce = Product(sku="SKU-O2", name="Scarce", price_cents=2000, stock_qty=1)
+
+    async with db_session.begin():
+        db_session.add_all([user, plenty, scarce])
+
+    ok_items = [{"product_id": str(plenty.id), "qty": 2}, {"product_id": str(scarce.id), "qty": 1}]
+    async with db_session.begin():
+        response = await create_order_with_idempotency(
+            db_session, str(user.id), ok_items, None, inventory_strategy="optimistic"
+        )
+    assert response["total_cents"] == 4000
+
+    with pytest.raises(HTTPException) as excinfo:
+        async with db_session.begin():
+            await create_order_with_idempotency(
+                db_session, str(user.id), ok_items, None, inventory_strategy="optimistic"
+            )
+    assert excinfo.value.detail == "Insufficient stock for Scarce"
+
+    result = await db_session.execute(
+        select(Product.sku, Product.stock_qty).order_by(Product.sku)
+    )
+    assert [row.stock_qty for row in result] == [8, 0]
+
+
+async def test_batch_checkout_reports_each_cart(db_session):
+    user = User(email="batch@example.com", password_hash=hash_password("Password123!"))
+    first = Product(sku="SKU-C1", name="Floor", price_cents=1000, stock_qty=3)
+    second = Product(sku="SKU-C2", name="Balcony", price_cents=500, stock_qty=5)
+
+    async with db_session.begin():
+        db_session.add_all([user, first, second])
+
+    carts = [
+        {"items": [{"product_id": str(first.id), "qty": 2}], "idempotency_key": "cart-1"},
+        {"items": [{"product_id": str(first.id), "qty": 2}]},
+        {"items": [{"product_id": str(second.id), "qty": 1}, {"product_id": "nope", "qty": 1}]},
+        {
+            "items": [
+                {"product_id": str(second.id), "qty": 4},
+                {"product_id": str(first.id), "qty": 1},
+            ]
+        },
+        {"items": [{"product_id": str(first.id), "qty": 2}], "idempotency_key": "cart-1"},
+    ]
+    async with db_session.begin():
+        results = await create_orders_batch(
+            db_session, [{"user_id": str(user.id), **cart} for cart in carts]
+        )
+
+    assert [result["status"] for result in results] == [201, 400, 400, 201, 201]
+    assert results[1]["error"] == "Insufficient stock for Floor"
+    assert results[2]["error"] == "Invalid product"
+    assert results[4]["order"] == results[0]["order"]
+
+    result = await db_session.execute(
+        select(Product.sku, Product.stock_qty).order_by(Product.sku)
+    )
+    assert [row.stock_qty for row in result] == [0, 1]
+
+
+async def test_batch_checkout_contains_database_errors_to_their_cart(db_session, monkeypatch):
+    user = User(email="batch-db@example.com", password_hash=hash_password("Password123!"))
+    product = Product(sku="SKU-C3", name="Stalls", price_cents=700, stock_qty=5)
+    async with db_session.begin():
+        db_session.add_all([user, product])
+
+    reserve_stock = order_service.reserve_stock
+
+    async def failing_reserve_stock(session, items, strategy=None):
+        if items[0]["qty"] == 2:
+            await session.execute(text("SELECT 1 / 0"))
+        return await reserve_stock(session, items, strategy)
+
+    monkeypatch.setattr(order_service, "reserve_stock", failing_reserve_stock)
+    carts = [{"items": [{"product_id": str(product.id), "qty": qty}]} for qty in (1, 2, 1)]
+    async with db_session.begin():
+        results = await create_orders_batch(
+            db_session, [{"user_id": str(user.id), **cart} for cart in carts]
+        )
+
+    assert [result["status"] for result in results] == [201, 500, 201]
+    assert await db_session.scalar(select(Product.stock_qty)) == 3
+
+
+async def test_coalescer_commits_concurrent_checkouts_together(db_session):
+    user = User(email="burst@example.com", password_hash=hash_password("Password123!"))
+    product = Product(sku="SKU-D1", name="Standing", price_cents=700, stock_qty=2)
+
+    async with db_session.begin():
+        db_session.add_all([user, product])
+
+    coalescer = CheckoutCoalescer(window_ms=50, max_batch=10)
+    items = [{"product_id": str(product.id), "qty": 1}]
+    results = await asyncio.gather(
+        *(coalescer.submit(str(user.id), items, None) for _ in range(3)),
+        return_exceptions=True,
+    )
+    await coalescer.close()
+
+    assert coalescer.batches == 1
+    assert [result["total_cents"] for result in results[:2]] == [700, 700]
+    assert isinstance(results[2], HTTPException)
+    assert results[2].detail == "Insufficient stock for Standing"
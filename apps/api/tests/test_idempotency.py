@@ -1,11 +1,20 @@
 from __future__ import annotations
 
-from sqlalchemy import select
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import func, select, update
 
 from eventcart.core.security import hash_password
+from eventcart.db.session import SessionLocal
+from eventcart.main import app
+from eventcart.models.idempotency import IdempotencyKey
 from eventcart.models.order import Order
 from eventcart.models.product import Product
+from eventcart.models.session import Session
 from eventcart.models.user import User
+from eventcart.services.idempotency_service import purge_expired_keys, single_flight
 from eventcart.services.order_service import create_order_with_idempotency
 
 
@@ -33,3 +42,118 @@ async def test_idempotency_reuses_response(db_session):
     result = await db_session.execute(select(Order))
     orders = list(result.scalars().all())
     assert len(orders) == 1
+
+
+async def test_concurrent_duplicates_wait_for_the_first_claim(db_session):
+    user = User(email="racing@example.com", password_hash=hash_password("Password123!"))
+    product = Product(sku="SKU-2", name="Ticket", price_cents=1000, stock_qty=5)
+
+    async with db_session.begin():
+        db_session.add_all([user, product])
+
+    items = [{"product_id": str(product.id), "qty": 1}]
+
+    async def checkout() -> dict:
+        async with SessionLocal() as session:
+            async with session.begin():
+                return await create_order_with_idempotency(session, str(user.id), items, "race")
+
+    # Separate sessions, so only the database claim keeps the second one from checking out.
+    first, second = await asyncio.gather(checkout(), checkout())
+    assert first == second
+
+    result = await db_session.execute(select(Product.stock_qty, IdempotencyKey.status))
+    assert result.one() == (4, "COMPLETED")
+
+
+async def test_replays_do_not_lock_the_completed_key(db_session):
+    user = User(email="replay@example.com", password_hash=hash_password("Password123!"))
+    product = Product(sku="SKU-4", name="Ticket", price_cents=1000, stock_qty=5)
+
+    async with db_session.begin():
+        db_session.add_all([user, product])
+
+    items = [{"product_id": str(product.id), "qty": 1}]
+    async with db_session.begin():
+        first = await create_order_with_idempotency(db_session, str(user.id), items, "held")
+
+    async with SessionLocal() as holder, holder.begin():
+        await holder.execute(select(IdempotencyKey.id).with_for_update())
+
+        async def replay() -> dict:
+            async with SessionLocal() as session, session.begin():
+                return await create_order_with_idempotency(session, str(user.id), items, "held")
+
+        assert await asyncio.wait_for(replay(), timeout=5) == first
+
+
+async def test_single_flight_runs_duplicates_once():
+    calls = 0
+
+    async def run() -> dict:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"id": "order-1"}
+
+    results = await asyncio.gather(*(single_flight("user", "key", "hash", run) for _ in range(3)))
+    assert calls == 1
+    assert results == [{"id": "order-1"}] * 3
+
+
+async def test_expired_keys_are_reclaimed_and_purged(db_session):
+    user = User(email="expiry@example.com", password_hash=hash_password("Password123!"))
+    product = Product(sku="SKU-3", name="Ticket", price_cents=1000, stock_qty=5)
+
+    async with db_session.begin():
+        db_session.add_all([user, product])
+
+    items = [{"product_id": str(product.id), "qty": 1}]
+    async with db_session.begin():
+        first = await create_order_with_idempotency(db_session, str(user.id), items, "old")
+        await create_order_with_idempotency(db_session, str(user.id), items, "stale")
+        await db_session.execute(
+            update(IdempotencyKey).values(created_at=datetime.now(timezone.utc) - timedelta(days=2))
+        )
+
+    async with db_session.begin():
+        again = await create_order_with_idempotency(db_session, str(user.id), items, "old")
+    assert again["id"] != first["id"]
+
+    async with db_session.begin():
+        assert await purge_expired_keys(db_session) == 1
+    result = await db_session.execute(select(IdempotencyKey.key))
+    assert result.scalars().all() == ["old"]
+
+
+async def test_middleware_replays_stored_response_bytes(db_session):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        credentials = {"email": "replay@example.com", "password": "Password123!"}
+        headers = {"Idempotency-Key": "signup-1"}
+        first = await client.post("/auth/register", json=credentials, headers=headers)
+        # Token-issuing routes are not replayed (nothing with a token is stored), so a retry
+        # runs again.
+        client.cookies.clear()
+        second = await client.post("/auth/register", json=credentials, headers=headers)
+        assert (first.status_code, second.status_code) == (201, 409)
+
+        product = Product(sku="SKU-4", name="Ticket", price_cents=1000, stock_qty=5)
+        async with db_session.begin():
+            db_session.add(product)
+        auth = {"Authorization": f"Bearer {first.json()['access_token']}"}
+        order = await client.post(
+            "/orders", json={"items": [{"product_id": str(product.id), "qty": 1}]}, headers=auth
+        )
+        pay_headers = {**auth, "Idempotency-Key": "pay-1"}
+        path = f"/payments/confirm/{order.json()['id']}"
+        paid = [await client.post(path, headers=pay_headers) for _ in range(2)]
+        assert [response.status_code for response in paid] == [200, 200]
+        assert paid[0].content == paid[1].content
+
+    async with db_session.begin():
+        sessions = await db_session.scalar(select(func.count()).select_from(Session))
+        orders = await db_session.scalar(select(func.count()).select_from(Order))
+        keys = (await db_session.execute(select(IdempotencyKey.key))).scalars().all()
+    assert (sessions, orders) == (1, 1)
+    assert "signup-1" not in keys
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import base64
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from eventcart.api.orders import _decode_cursor, get_order_detail
+from eventcart.core.security import hash_password
+from eventcart.models.order import Order
+from eventcart.models.order_item import OrderItem
+from eventcart.models.product import Product
+from eventcart.models.user import User
+from eventcart.repo.order_repo import list_items_for_orders, list_orders, update_order_status
+
+
+async def test_orders_page_by_created_at_and_id(db_session):
+    user = User(email="pages@example.com", password_hash=hash_password("Password123!"))
+    product = Product(sku="SKU-P1", name="Pit", price_cents=100, stock_qty=100)
+    async with db_session.begin():
+        db_session.add_all([user, product])
+
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    # Two orders share a timestamp so the id tie-breaker is exercised.
+    stamps = [base, base + timedelta(minutes=1), base + timedelta(minutes=1), base + timedelta(2)]
+    orders = [
+        Order(
+            user_id=user.id,
+            status="PAID" if idx % 2 else "PENDING_PAYMENT",
+            total_cents=100,
+            created_at=stamp,
+            updated_at=stamp,
+        )
+        for idx, stamp in enumerate(stamps)
+    ]
+    async with db_session.begin():
+        db_session.add_all(orders)
+        await db_session.flush()
+        db_session.add_all(
+            [
+                OrderItem(order_id=order.id, product_id=product.id, qty=1, unit_price_cents=100)
+                for order in orders
+            ]
+        )
+
+    seen: list[str] = []
+    before = None
+    while True:
+        page = await list_orders(db_session, str(user.id), limit=3, before=before)
+        seen.extend(str(order.id) for order in page)
+        if len(page) < 3:
+            break
+        before = (page[-1].created_at, str(page[-1].id))
+
+    expected = sorted(orders, key=lambda order: (order.created_at, str(order.id)), reverse=True)
+    assert seen == [str(order.id) for order in expected]
+
+    paid = await list_orders(db_session, str(user.id), limit=10, status="PAID")
+    assert {order.status for order in paid} == {"PAID"} and len(paid) == 2
+
+    items = await list_items_for_orders(db_session, seen)
+    assert all(len(order_items) == 1 for order_items in items.values())
+
+
+def test_cursors_without_an_offset_are_rejected():
+    order_id = "00000000-0000-0000-0000-0000000000c1"
+    aware = base64.urlsafe_b64encode(f"2026-01-01T00:00:00+00:00|{order_id}".encode()).decode()
+    assert _decode_cursor(aware) == (datetime(2026, 1, 1, tzinfo=timezone.utc), order_id)
+
+    naive = base64.urlsafe_b64encode(f"2026-01-01T00:00:00|{order_id}".encode()).decode()
+    with pytest.raises(HTTPException) as excinfo:
+        _decode_cursor(naive)
+    assert excinfo.value.status_code == 400
+
+
+async def test_order_detail_etag_and_invalidation(db_session):
+    user = User(email="etag@example.com", password_hash=hash_password("Password123!"))
+    async with db_session.begin():
+        db_session.add(user)
+        await db_session.flush()
+        order = Order(user_id=user.id, status="PENDING_PAYMENT", total_cents=100)
+        db_session.add(order)
+    order_id = str(order.id)
+
+    first = await get_order_detail(order_id, db_session, user, None)
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and b"PENDING_PAYMENT" in first.body
+
+    cached = await get_order_detail(order_id, db_session, user, f"W/{etag}")
+    assert cached.status_code == 304 and cached.headers["etag"] == etag
+
+    await db_session.rollback()
+    async with db_session.begin():
+        await db_session.refresh(user)
+        await db_session.refresh(order)
+        await update_order_status(db_session, order, "PAID")
+    changed = await get_order_detail(order_id, db_session, user, etag)
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert b"PAID" in changed.body
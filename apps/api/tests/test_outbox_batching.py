@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from eventcart.core.metrics import Registry
+from eventcart.services.outbox_batching import AdaptiveBatchSize
+
+
+def test_batch_size_grows_with_backlog_and_shrinks_as_it_drains():
+    batch = AdaptiveBatchSize(minimum=10, maximum=200, target_seconds=1.0)
+    # Full claims well under the target double the size, up to the cap.
+    sizes = [batch.observe(batch.size, 0.01) for _ in range(6)]
+    assert sizes == [20, 40, 80, 160, 200, 200]
+
+    # A slow pass shrinks in proportion to the overrun.
+    assert batch.observe(200, 2.0) == 100
+    # Growth stops where the observed per-event cost would overshoot the target.
+    assert batch.observe(100, 0.8) == 125
+
+    # Mostly empty claims halve back to the minimum.
+    sizes = [batch.observe(0, 0.001) for _ in range(5)]
+    assert sizes == [62, 31, 15, 10, 10]
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    latency = registry.histogram("handler_seconds", "Handler time.", (0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value, event_type="order.paid")
+    registry.gauge("pending", "Pending events.").replace({"order.paid": 3}, "event_type")
+
+    lines = registry.render().splitlines()
+    assert 'handler_seconds_bucket{event_type="order.paid",le="0.1"} 1' in lines
+    assert 'handler_seconds_bucket{event_type="order.paid",le="1"} 3' in lines
+    assert 'handler_seconds_bucket{event_type="order.paid",le="+Inf"} 4' in lines
+    assert 'handler_seconds_count{event_type="order.paid"} 4' in lines
+    assert 'pending{event_type="order.paid"} 3' in lines
+
+    registry.common_labels = {"worker": "2"}
+    assert 'pending{worker="2",event_type="order.paid"} 3' in registry.render().splitlines()
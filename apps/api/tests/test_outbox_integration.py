@@ -1,16 +1,45 @@
 from __future__ import annotations
 
-from sqlalchemy import select
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+from sqlalchemy import event, select, text
+from sqlalchemy.engine import make_url
 
 from eventcart.core.security import hash_password
+from eventcart.core.settings import settings
+from eventcart.db.session import SessionLocal, engine
 from eventcart.models.order import Order
+from eventcart.models.outbox import OutboxEvent
+from eventcart.models.outbox_delivery import OutboxDelivery
 from eventcart.models.product import Product
 from eventcart.models.user import User
 from eventcart.repo.order_repo import get_order_by_id
+from eventcart.repo.outbox_archive_repo import create_partition, list_partitions
+from eventcart.repo.outbox_delivery_repo import lease_due_deliveries
+from eventcart.repo.outbox_repo import (
+    OUTBOX_CHANNEL,
+    count_due_events,
+    create_outbox_event,
+    outbox_partition,
+    pending_counts_by_type,
+)
 from eventcart.services.order_service import create_order_with_idempotency
+from eventcart.services.dead_letter_service import count_dead, list_dead, requeue_dead
+from eventcart.services.outbox_dispatcher import process_due_events
+from eventcart.services.outbox_partitions import leave_partitions, refresh_partition_leases
+from eventcart.services.outbox_retention import (
+    clear_partition_deliveries,
+    create_upcoming_partitions,
+    expired_partitions,
+    retire_partition,
+)
 from eventcart.services.payment_service import confirm_payment
 from eventcart.services.outbox_service import claim_due_events, mark_processed
 from eventcart.services.processor import handle_outbox_event
+from eventcart.services.subscription_dispatcher import process_due_deliveries
+from eventcart.services.subscriptions import subscribers, subscribes
 
 
 async def test_order_payment_outbox_flow(db_session):
@@ -38,6 +67,397 @@ async def test_order_payment_outbox_flow(db_session):
         await handle_outbox_event(db_session, events[0])
         await mark_processed(db_session, events[0])
 
-    result = await db_session.execute(select(Order).where(Order.id == order_id))
-    updated = result.scalar_one()
-    assert updated.status == "FULFILLED"
+    # The handler updates the row without touching the Order loaded above, so read the column.
+    result = await db_session.execute(select(Order.status).where(Order.id == order_id))
+    assert result.scalar_one() == "FULFILLED"
+
+
+async def test_order_paid_leaves_an_order_that_is_no_longer_paid(db_session):
+    user = User(email="cancelled@example.com", password_hash=hash_password("Password123!"))
+    async with db_session.begin():
+        db_session.add(user)
+        await db_session.flush()
+        order = Order(user_id=user.id, status="CANCELLED", total_cents=100)
+        db_session.add(order)
+        await db_session.flush()
+        order_id = str(order.id)
+        event = await create_outbox_event(
+            db_session, "order", order_id, "order.paid", {"order_id": order_id}
+        )
+        await handle_outbox_event(db_session, event)
+
+    assert await db_session.scalar(select(Order.status)) == "CANCELLED"
+
+
+async def test_due_outbox_events_notify_on_commit(db_session):
+    dsn = make_url(settings.database_url).set(drivername="postgresql")
+    listener = await asyncpg.connect(dsn.render_as_string(hide_password=False))
+    notified = asyncio.Queue()
+    await listener.add_listener(OUTBOX_CHANNEL, lambda *args: notified.put_nowait(args))
+    try:
+        aggregate_id = "00000000-0000-0000-0000-000000000001"
+        async with db_session.begin():
+            later = datetime.now(timezone.utc) + timedelta(minutes=5)
+            await create_outbox_event(db_session, "order", aggregate_id, "order.later", {}, later)
+        async with db_session.begin():
+            await create_outbox_event(db_session, "order", aggregate_id, "order.now", {})
+            await asyncio.sleep(0.1)
+            assert notified.empty()
+        await asyncio.wait_for(notified.get(), timeout=2)
+        assert notified.empty()
+    finally:
+        await listener.close()
+
+
+async def test_dispatcher_isolates_failures_per_event(db_session):
+    user = User(email="dispatch@example.com", password_hash=hash_password("Password123!"))
+    async with db_session.begin():
+        db_session.add(user)
+        await db_session.flush()
+        order = Order(user_id=user.id, status="PAID", total_cents=100)
+        db_session.add(order)
+        await db_session.flush()
+        order_id = str(order.id)
+        broken = "00000000-0000-0000-0000-00000000000b"
+        payload = {"order_id": order_id}
+        await create_outbox_event(db_session, "order", order_id, "order.paid", payload)
+        # A database error (invalid uuid) and a handler error, on the same aggregate: the
+        # event queued behind them has to wait.
+        await create_outbox_event(db_session, "order", broken, "order.paid", {"order_id": "nope"})
+        await create_outbox_event(db_session, "order", broken, "order.paid", {"order_id": broken})
+
+    assert await process_due_events(batch_size=10, concurrency=4) == 2
+
+    result = await db_session.execute(
+        select(OutboxEvent.status, OutboxEvent.attempt_count).order_by(OutboxEvent.created_at)
+    )
+    assert result.all() == [("PROCESSED", 0), ("PENDING", 1), ("PENDING", 0)]
+    assert await db_session.scalar(select(Order.status)) == "FULFILLED"
+
+
+async def test_partition_leases_are_shared_between_workers(db_session):
+    async with db_session.begin():
+        first = await refresh_partition_leases(db_session, "worker-a")
+    assert first == list(range(settings.outbox_partitions))
+
+    async with db_session.begin():
+        second = await refresh_partition_leases(db_session, "worker-b")
+        # worker-a hands back its surplus on its next refresh, and worker-b picks it up.
+        first = await refresh_partition_leases(db_session, "worker-a")
+        second = await refresh_partition_leases(db_session, "worker-b")
+    assert len(first) == len(second) == settings.outbox_partitions // 2
+    assert set(first).isdisjoint(second)
+
+    async with db_session.begin():
+        await leave_partitions(db_session, "worker-b")
+        first = await refresh_partition_leases(db_session, "worker-a")
+    assert first == list(range(settings.outbox_partitions))
+
+
+async def test_events_wait_behind_a_retrying_event_of_the_same_aggregate(db_session):
+    aggregate_id = "00000000-0000-0000-0000-0000000000a1"
+    partition = outbox_partition(aggregate_id)
+    async with db_session.begin():
+        retrying = await create_outbox_event(db_session, "order", aggregate_id, "order.one", {})
+        retrying.attempt_count = 1
+        retrying.next_attempt_at = datetime.now(timezone.utc) + timedelta(minutes=1)
+        later = datetime.now(timezone.utc) + timedelta(minutes=5)
+        await create_outbox_event(db_session, "order", aggregate_id, "order.later", {}, later)
+        await create_outbox_event(db_session, "order", aggregate_id, "order.two", {})
+
+    others = [p for p in range(settings.outbox_partitions) if p != partition]
+    assert await process_due_events(partitions=others) == 0
+    assert await process_due_events(partitions=[partition]) == 0
+
+    async with db_session.begin():
+        retrying.next_attempt_at = datetime.now(timezone.utc)
+    assert await process_due_events(partitions=[partition]) == 2
+
+
+async def test_claim_commits_a_lease_that_expires_after_a_crash(db_session):
+    aggregate_id = "00000000-0000-0000-0000-0000000000c1"
+    async with db_session.begin():
+        await create_outbox_event(db_session, "order", aggregate_id, "order.one", {})
+        await create_outbox_event(db_session, "order", aggregate_id, "order.two", {})
+
+    # worker-a claims and then dies without recording anything.
+    async with db_session.begin():
+        claimed = await claim_due_events(db_session, batch_size=1, owner="worker-a")
+    assert [event.event_type for event in claimed] == ["order.one"]
+    assert claimed[0].locked_by == "worker-a"
+    # The claimed event is leased, and the one behind it waits for it.
+    assert await process_due_events(owner="worker-b") == 0
+
+    async with db_session.begin():
+        claimed[0].locked_until = datetime.now(timezone.utc) - timedelta(seconds=1)
+    assert await process_due_events(owner="worker-b") == 2
+
+    result = await db_session.execute(
+        select(OutboxEvent.status, OutboxEvent.locked_by).execution_options(populate_existing=True)
+    )
+    assert result.all() == [("PROCESSED", None), ("PROCESSED", None)]
+
+
+async def test_paid_orders_are_fulfilled_in_one_batch(db_session):
+    user = User(email="batch-fulfil@example.com", password_hash=hash_password("Password123!"))
+    async with db_session.begin():
+        db_session.add(user)
+        await db_session.flush()
+        orders = [Order(user_id=user.id, status="PAID", total_cents=100) for _ in range(3)]
+        orders.append(Order(user_id=user.id, status="FULFILLED", total_cents=100))
+        db_session.add_all(orders)
+        await db_session.flush()
+        for order in orders:
+            payload = {"order_id": str(order.id)}
+            await create_outbox_event(db_session, "order", str(order.id), "order.paid", payload)
+        missing = "00000000-0000-0000-0000-0000000000d1"
+        await create_outbox_event(db_session, "order", missing, "order.paid", {"order_id": missing})
+
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        assert await process_due_events(batch_size=10) == 5
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+    assert sum(s.startswith("UPDATE orders") for s in statements) == 1
+    # One statement for the processed events and one for the failed one.
+    assert sum(s.startswith("UPDATE outbox_events SET status") for s in statements) == 2
+    result = await db_session.execute(
+        select(Order.status).execution_options(populate_existing=True)
+    )
+    assert set(result.scalars()) == {"FULFILLED"}
+    result = await db_session.execute(
+        select(OutboxEvent.status, OutboxEvent.last_error).order_by(OutboxEvent.created_at)
+    )
+    assert result.all()[-1] == ("PENDING", "Order not found for outbox event")
+
+
+async def test_subscriptions_retry_on_their_own(db_session, monkeypatch):
+    calls = []
+
+    @subscribes("test-flaky", "order.noted")
+    async def flaky(session, event):
+        calls.append(event.payload["n"])
+        if calls == [0]:
+            raise RuntimeError("mail server down")
+
+    monkeypatch.setattr(settings, "outbox_subscriptions", "test-flaky,order-notifications")
+    assert subscribers("order.noted") == ["test-flaky"]
+    aggregate_id = "00000000-0000-0000-0000-0000000000d1"
+    async with db_session.begin():
+        for n in range(2):
+            await create_outbox_event(
+                db_session,
+                "order",
+                aggregate_id,
+                "order.noted",
+                {"n": n},
+                subscriptions=subscribers("order.noted"),
+            )
+
+    # The worker's handlers finish the events whatever the subscriber does.
+    assert await process_due_events() == 2
+    # The failed delivery holds back the next one for the same aggregate.
+    assert await process_due_deliveries("test-flaky") == 1
+    statuses = select(OutboxDelivery.status, OutboxDelivery.attempt_count).order_by(
+        OutboxDelivery.event_created_at
+    )
+    assert (await db_session.execute(statuses)).all() == [("PENDING", 1), ("PENDING", 0)]
+    assert set(await db_session.scalars(select(OutboxEvent.status))) == {"PROCESSED"}
+
+    await db_session.execute(
+        OutboxDelivery.__table__.update().values(next_attempt_at=datetime.now(timezone.utc))
+    )
+    await db_session.commit()
+    assert await process_due_deliveries("test-flaky") == 2
+    assert calls == [0, 0, 1]
+    db_session.expire_all()
+    assert (await db_session.execute(statuses)).all() == [("PROCESSED", 1), ("PROCESSED", 0)]
+
+
+async def test_event_leases_stop_at_the_limit(db_session):
+    aggregate_ids = [f"00000000-0000-0000-0000-0000000000c{n}" for n in range(3)]
+    async with db_session.begin():
+        for n in range(9):
+            await create_outbox_event(db_session, "order", aggregate_ids[n % 3], "order.noted", {})
+    async with db_session.begin():
+        assert len(await claim_due_events(db_session, batch_size=8)) == 8
+
+
+async def test_delivery_leases_stop_at_the_limit(db_session):
+    aggregate_ids = [f"00000000-0000-0000-0000-0000000000c{n}" for n in range(3)]
+    async with db_session.begin():
+        for n in range(9):
+            await create_outbox_event(
+                db_session, "order", aggregate_ids[n % 3], "order.noted", {}, subscriptions=["s"]
+            )
+    async with db_session.begin():
+        now = datetime.now(timezone.utc)
+        leased = await lease_due_deliveries(
+            db_session, "s", "owner", now, now + timedelta(seconds=60), 8
+        )
+    assert len(leased) == 8
+
+
+async def test_two_subscription_consumers_keep_each_aggregate_in_order(db_session):
+    delivered = []
+
+    @subscribes("test-ordered", "order.noted")
+    async def record(session, event):
+        await asyncio.sleep(0.005)
+        delivered.append((str(event.aggregate_id), event.payload["n"]))
+
+    aggregate_ids = [f"00000000-0000-0000-0000-0000000000b{n}" for n in range(4)]
+    async with db_session.begin():
+        for n in range(12):
+            await create_outbox_event(
+                db_session,
+                "order",
+                aggregate_ids[n % 4],
+                "order.noted",
+                {"n": n},
+                subscriptions=["test-ordered"],
+            )
+
+    # The second lease pass waits for the first to commit and then leaves the rest of the
+    # aggregate it leased alone.
+    now = datetime.now(timezone.utc)
+    until = now + timedelta(seconds=60)
+    async with SessionLocal() as first, SessionLocal() as second:
+
+        async def lease_second():
+            async with second.begin():
+                return await lease_due_deliveries(second, "test-ordered", "b", now, until, 12)
+
+        async with first.begin():
+            [leased] = await lease_due_deliveries(first, "test-ordered", "a", now, until, 1)
+            other = asyncio.create_task(lease_second())
+            await asyncio.sleep(0.2)
+            assert not other.done()
+        other_aggregates = {delivery.aggregate_id for delivery in await other}
+    assert len(other_aggregates) == 3 and leased.aggregate_id not in other_aggregates
+
+    async with db_session.begin():
+        await db_session.execute(
+            OutboxDelivery.__table__.update().values(locked_by=None, locked_until=None)
+        )
+    for _ in range(50):
+        if len(delivered) == 12:
+            break
+        await asyncio.gather(
+            process_due_deliveries("test-ordered", batch_size=2, owner="a"),
+            process_due_deliveries("test-ordered", batch_size=2, owner="b"),
+        )
+    assert len(delivered) == 12
+    for aggregate_id in aggregate_ids:
+        numbers = [n for delivered_to, n in delivered if delivered_to == aggregate_id]
+        assert numbers == sorted(numbers)
+
+
+async def test_finished_deliveries_are_cleared_in_chunks_before_the_detach(db_session):
+    aggregate_id = "00000000-0000-0000-0000-0000000000a1"
+    async with db_session.begin():
+        for _ in range(3):
+            event = await create_outbox_event(
+                db_session, "order", aggregate_id, "order.noted", {}, subscriptions=["a", "b"]
+            )
+            event.status = "PROCESSED"
+        partitions = await list_partitions(db_session)
+    today = datetime.now(timezone.utc).date()
+    [name] = [name for name, start, end in partitions if start <= today < end]
+    deliveries = select(OutboxDelivery.status)
+
+    # A pending delivery keeps the partition, and nothing is deleted.
+    assert await clear_partition_deliveries(SessionLocal, name, 2) is False
+    assert len((await db_session.scalars(deliveries)).all()) == 6
+    await db_session.execute(OutboxDelivery.__table__.update().values(status="PROCESSED"))
+    await db_session.commit()
+
+    assert await clear_partition_deliveries(SessionLocal, name, 2) is True
+    assert (await db_session.scalars(deliveries)).all() == []
+
+
+async def test_finished_old_partitions_are_retired(db_session):
+    # DDL is transactional: everything here is rolled back by the fixture.
+    # The migrations' own partitions start on whatever day they ran, so the test's partitions go
+    # before the oldest of those and the checks below look only at the ones the test touches.
+    today = datetime.now(timezone.utc).date()
+    existing = await list_partitions(db_session)
+    first_day = min([start for _, start, _ in existing] + [today - timedelta(days=28)])
+    resume = max([end for _, _, end in existing] + [today])
+    done_day, open_day = first_day - timedelta(days=2), first_day - timedelta(days=1)
+    done = await create_partition(db_session, done_day, done_day + timedelta(days=1))
+    still_open = await create_partition(db_session, open_day, open_day + timedelta(days=1))
+    aggregate_id = "00000000-0000-0000-0000-0000000000e1"
+    for day, status in [(done_day, "PROCESSED"), (done_day, "DEAD"), (open_day, "PENDING")]:
+        event = await create_outbox_event(db_session, "order", aggregate_id, "order.old", {})
+        event.created_at = datetime(day.year, day.month, day.day, 12, tzinfo=timezone.utc)
+        event.status = status
+    await db_session.flush()
+
+    assert (await expired_partitions(db_session, today, 7))[:2] == [done, still_open]
+    assert await retire_partition(db_session, still_open, "archive") is False
+    assert await retire_partition(db_session, done, "archive") is True
+    names = [name for name, _, _ in await list_partitions(db_session)]
+    assert done not in names and still_open in names
+    archived = await db_session.scalar(text(f"SELECT count(*) FROM outbox_archive.{done}"))
+    assert archived == 2
+
+    # Upcoming partitions continue from the newest one without gaps (or from today, if that one
+    # has already ended); after the first call there is nothing left to create.
+    await create_upcoming_partitions(db_session, today)
+    assert await create_upcoming_partitions(db_session, today) == []
+    assert await create_upcoming_partitions(db_session, today + timedelta(days=2))
+    ranges = [
+        (start, end) for _, start, end in await list_partitions(db_session) if start >= resume
+    ]
+    assert ranges[0][0] == resume
+    assert all(prev[1] == cur[0] for prev, cur in zip(ranges, ranges[1:]))
+    assert ranges[-1][1] > today + timedelta(days=2 + settings.outbox_partitions_ahead)
+
+
+async def test_stats_counts_stop_at_the_limit(db_session):
+    aggregate_id = "00000000-0000-0000-0000-0000000000e1"
+    async with db_session.begin():
+        for event_type in ["order.paid", "order.paid", "order.other"]:
+            await create_outbox_event(db_session, "order", aggregate_id, event_type, {})
+        now = datetime.now(timezone.utc)
+        assert await count_due_events(db_session, now, None, 10) == 3
+        assert await count_due_events(db_session, now, None, 2) == 2
+        assert await pending_counts_by_type(db_session, 10) == {"order.paid": 2, "order.other": 1}
+        assert sum((await pending_counts_by_type(db_session, 2)).values()) == 2
+
+
+async def test_dead_events_are_filtered_and_requeued_in_chunks(db_session):
+    aggregate_id = "00000000-0000-0000-0000-0000000000f1"
+    async with db_session.begin():
+        for idx in range(5):
+            event_type = "order.paid" if idx < 4 else "order.other"
+            event = await create_outbox_event(db_session, "order", aggregate_id, event_type, {})
+            event.status = "DEAD"
+            event.attempt_count = settings.worker_max_attempts
+            event.next_attempt_at = datetime.now(timezone.utc) + timedelta(days=365)
+            event.last_error = "connection timeout" if idx % 2 else "Order not found"
+
+    assert await count_dead(db_session) == {"order.other": 1, "order.paid": 4}
+    timeouts = await list_dead(db_session, error_pattern="%timeout%")
+    assert [event.last_error for event in timeouts] == ["connection timeout"] * 2
+    future = datetime.now(timezone.utc) + timedelta(minutes=1)
+    assert await count_dead(db_session, since=future) == {}
+    await db_session.rollback()
+
+    requeued = await requeue_dead(batch_size=2, rate_per_second=1000, event_type="order.paid")
+    assert requeued == 4
+    result = await db_session.execute(
+        select(OutboxEvent.event_type, OutboxEvent.status, OutboxEvent.attempt_count)
+        .order_by(OutboxEvent.created_at)
+        .execution_options(populate_existing=True)
+    )
+    assert result.all() == [("order.paid", "PENDING", 0)] * 4 + [
+        ("order.other", "DEAD", settings.worker_max_attempts)
+    ]
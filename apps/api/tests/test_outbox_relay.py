@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+import uuid
+
+import orjson
+import pytest
+from sqlalchemy import select
+
+from eventcart.core.settings import settings
+from eventcart.models.outbox import OutboxEvent
+from eventcart.models.outbox_delivery import OutboxDelivery
+from eventcart.repo.outbox_repo import create_outbox_event
+from eventcart.services.outbox_relay import relay_due_deliveries
+from eventcart.services.outbox_sinks import FileSink, RedisStreamSink, SinkError, create_sink
+from eventcart.services.subscriptions import RELAY_SUBSCRIPTION, subscribers
+
+
+class FakeRedis:
+    # Enough of a Redis server for the stream sink: XADD appends, anything else is +OK.
+    def __init__(self, fail_xadd: bool = False, fail_auth: bool = False) -> None:
+        self.streams: dict[str, list[dict]] = {}
+        self.fail_xadd = fail_xadd
+        self.fail_auth = fail_auth
+        self.server: asyncio.Server | None = None
+        self.connections: set[asyncio.Task] = set()
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"redis://127.0.0.1:{port}/0?stream=orders"
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+        # The clients are closed by now; let their handlers see EOF before the loop goes away.
+        await asyncio.wait_for(asyncio.gather(*self.connections), 5)
+
+    async def _serve(self, reader, writer) -> None:
+        self.connections.add(asyncio.current_task())
+        try:
+            while True:
+                header = await reader.readline()
+                if not header:
+                    break
+                args = []
+                for _ in range(int(header[1:])):
+                    length = int((await reader.readline())[1:])
+                    args.append((await reader.readexactly(length + 2))[:-2].decode())
+                writer.write(self._execute(args))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    def _execute(self, args: list[str]) -> bytes:
+        if args[0] == "AUTH" and self.fail_auth:
+            return b"-WRONGPASS invalid password\r\n"
+        if args[0] != "XADD":
+            return b"+OK\r\n"
+        if self.fail_xadd:
+            return b"-OOM command not allowed\r\n"
+        stream, fields = args[1], args[args.index("*") + 1 :]
+        entries = self.streams.setdefault(stream, [])
+        entries.append(dict(zip(fields[::2], fields[1::2])))
+        entry_id = f"1-{len(entries)}".encode()
+        return b"$%d\r\n%s\r\n" % (len(entry_id), entry_id)
+
+
+async def _events(db_session, count: int) -> list[str]:
+    aggregate_ids = [str(uuid.uuid4()) for _ in range(3)]
+    async with db_session.begin():
+        events = [
+            await create_outbox_event(
+                db_session,
+                "order",
+                aggregate_ids[number % 3],
+                "order.paid",
+                {"n": number},
+                subscriptions=[RELAY_SUBSCRIPTION],
+            )
+            for number in range(count)
+        ]
+    return [str(event.id) for event in events]
+
+
+async def _statuses(db_session, model=OutboxDelivery) -> set[tuple[str, int]]:
+    db_session.expire_all()
+    async with db_session.begin():
+        result = await db_session.execute(select(model.status, model.attempt_count))
+        return set(result.tuples())
+
+
+async def test_relay_publishes_pipelined_batches_to_a_redis_stream(db_session, monkeypatch):
+    # Once enabled, the relay wants every event type.
+    monkeypatch.setattr(settings, "outbox_subscriptions", RELAY_SUBSCRIPTION)
+    assert subscribers("order.anything") == [RELAY_SUBSCRIPTION]
+    event_ids = await _events(db_session, 9)
+    redis = FakeRedis()
+    sink = create_sink(await redis.start())
+    try:
+        assert isinstance(sink, RedisStreamSink)
+        assert await relay_due_deliveries(sink, batch_size=2, in_flight=4) == 8
+        assert await relay_due_deliveries(sink, batch_size=2, in_flight=4) == 1
+    finally:
+        await sink.close()
+        await redis.stop()
+
+    entries = redis.streams["orders"]
+    assert sorted(entry["event_id"] for entry in entries) == sorted(event_ids)
+    # Each aggregate's events arrive in the order they were written.
+    for aggregate_id in {entry["aggregate_id"] for entry in entries}:
+        numbers = [
+            orjson.loads(entry["data"])["payload"]["n"]
+            for entry in entries
+            if entry["aggregate_id"] == aggregate_id
+        ]
+        assert numbers == sorted(numbers)
+    assert await _statuses(db_session) == {("PROCESSED", 0)}
+    # Publishing is the relay's own delivery; the events are still there for the handlers.
+    assert await _statuses(db_session, OutboxEvent) == {("PENDING", 0)}
+
+
+async def test_relay_retries_batches_the_sink_rejects(db_session, tmp_path):
+    await _events(db_session, 3)
+    redis = FakeRedis(fail_xadd=True)
+    sink = RedisStreamSink(await redis.start())
+    try:
+        assert await relay_due_deliveries(sink) == 3
+    finally:
+        await sink.close()
+        await redis.stop()
+    assert await _statuses(db_session) == {("PENDING", 1)}
+
+    async with db_session.begin():
+        await db_session.execute(
+            OutboxDelivery.__table__.update().values(
+                next_attempt_at=OutboxDelivery.event_created_at
+            )
+        )
+    sink = FileSink(str(tmp_path / "events.jsonl"))
+    try:
+        assert await relay_due_deliveries(sink) == 3
+    finally:
+        await sink.close()
+    lines = (tmp_path / "events.jsonl").read_bytes().splitlines()
+    assert [orjson.loads(line)["attempt"] for line in lines] == [2, 2, 2]
+    assert await _statuses(db_session) == {("PROCESSED", 1)}
+
+
+async def test_redis_sink_reconnects_after_a_failed_auth():
+    redis = FakeRedis(fail_auth=True)
+    url = (await redis.start()).replace("redis://", "redis://:secret@")
+    sink = RedisStreamSink(url)
+    message = {"id": "e1", "event_type": "order.paid", "aggregate_id": "a1"}
+    try:
+        with pytest.raises(SinkError):
+            await sink.publish([message])
+        redis.fail_auth = False
+        await sink.publish([message])
+    finally:
+        await sink.close()
+        await redis.stop()
+    assert [entry["event_id"] for entry in redis.streams["orders"]] == ["e1"]
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select, update
+
+from eventcart.core.security import hash_password
+from eventcart.models.order import Order
+from eventcart.models.outbox import OutboxEvent
+from eventcart.models.product import Product
+from eventcart.models.user import User
+from eventcart.repo.order_repo import get_order_by_id
+from eventcart.services.order_service import create_order_with_idempotency
+from eventcart.services.outbox_service import claim_due_events, mark_processed
+from eventcart.services.payment_service import confirm_payment
+from eventcart.services.processor import handle_outbox_event
+
+
+async def test_expired_reservation_cancels_order_and_restores_stock(db_session):
+    user = User(email="expiry@example.com", password_hash=hash_password("Password123!"))
+    product = Product(sku="SKU-R1", name="Front Row", price_cents=9000, stock_qty=4)
+
+    async with db_session.begin():
+        db_session.add_all([user, product])
+
+    async with db_session.begin():
+        response = await create_order_with_idempotency(
+            db_session, str(user.id), [{"product_id": str(product.id), "qty": 3}], None
+        )
+    order_id = response["id"]
+    assert response["reserved_until"] is not None
+
+    async with db_session.begin():
+        assert await claim_due_events(db_session, batch_size=5) == []
+
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    async with db_session.begin():
+        await db_session.execute(
+            update(Order).where(Order.id == order_id).values(reserved_until=past)
+        )
+        await db_session.execute(update(OutboxEvent).values(next_attempt_at=past))
+
+    async with db_session.begin():
+        order = await get_order_by_id(db_session, order_id)
+        with pytest.raises(HTTPException) as excinfo:
+            await confirm_payment(db_session, order)
+        assert excinfo.value.status_code == 409
+
+    async with db_session.begin():
+        events = await claim_due_events(db_session, batch_size=5)
+        assert [event.event_type for event in events] == ["order.reservation_expired"]
+        await handle_outbox_event(db_session, events[0])
+        await mark_processed(db_session, events[0])
+
+    result = await db_session.execute(select(Order.status).where(Order.id == order_id))
+    assert result.scalar_one() == "CANCELLED"
+    result = await db_session.execute(select(Product.stock_qty).where(Product.id == product.id))
+    assert result.scalar_one() == 4
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from eventcart.core.security import hash_password
+from eventcart.models.product import Product
+from eventcart.models.product_stock_shard import ProductStockShard
+from eventcart.models.user import User
+from eventcart.repo.stock_shard_repo import sum_shard_stock
+from eventcart.services.inventory_service import shard_product_stock
+from eventcart.services.order_service import create_order_with_idempotency
+
+
+@pytest.mark.parametrize("strategy", ["locking", "optimistic"])
+async def test_sharded_checkout_spreads_and_drains_shards(db_session, strategy):
+    user = User(email=f"shards-{strategy}@example.com", password_hash=hash_password("Password1!"))
+    product = Product(sku="SKU-S1", name="Drop", price_cents=5000, stock_qty=6)
+
+    async with db_session.begin():
+        db_session.add_all([user, product])
+    async with db_session.begin():
+        await shard_product_stock(db_session, product, 3)
+
+    product_id = str(product.id)
+    for qty in (2, 3):
+        async with db_session.begin():
+            response = await create_order_with_idempotency(
+                db_session,
+                str(user.id),
+                [{"product_id": product_id, "qty": qty}],
+                None,
+                inventory_strategy=strategy,
+            )
+        assert response["items"][0]["unit_price_cents"] == 5000
+
+    with pytest.raises(HTTPException) as excinfo:
+        async with db_session.begin():
+            await create_order_with_idempotency(
+                db_session,
+                str(user.id),
+                [{"product_id": product_id, "qty": 2}],
+                None,
+                inventory_strategy=strategy,
+            )
+    assert excinfo.value.detail == "Insufficient stock for Drop"
+
+    assert await sum_shard_stock(db_session, [product_id]) == {product_id: 1}
+    result = await db_session.execute(
+        select(ProductStockShard.stock_qty).where(ProductStockShard.product_id == product_id)
+    )
+    assert all(qty >= 0 for qty in result.scalars())
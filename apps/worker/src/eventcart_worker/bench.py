@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+import orjson
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from eventcart.core.settings import settings
+from eventcart.db.session import engine
+from eventcart.repo.outbox_repo import outbox_partition
+from eventcart_worker import main as worker_main
+
+BENCH_TYPE = "bench"
+
+ORDER_COLUMNS = ["id", "user_id", "status", "total_cents", "created_at", "updated_at"]
+EVENT_COLUMNS = [
+    "id",
+    "aggregate_type",
+    "aggregate_id",
+    "partition_no",
+    "event_type",
+    "payload",
+    "status",
+    "attempt_count",
+    "next_attempt_at",
+    "created_at",
+]
+
+
+class RoundTrips:
+    # Counts what the worker's engine sends to Postgres while it processes events: statements
+    # (savepoints included), transaction begins and ends, and the pre-ping on every pool
+    # checkout. Housekeeping between passes (partition leases, purges, maintenance, stats) is
+    # left out, and so is the bench's own connection.
+    def __init__(self) -> None:
+        self.counts = {"statements": 0, "transactions": 0, "pings": 0}
+        self.active = False
+
+    def _count(self, kind: str):
+        def listener(*args, **kwargs) -> None:
+            if self.active:
+                self.counts[kind] += 1
+
+        return listener
+
+    def measure(self, process):
+        # Nothing else uses the engine while a pass runs, so a flag is enough.
+        async def measured(*args, **kwargs):
+            self.active = True
+            try:
+                return await process(*args, **kwargs)
+            finally:
+                self.active = False
+
+        return measured
+
+    def attach(self) -> None:
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", self._count("statements"))
+        # BEGIN and COMMIT (or ROLLBACK) are one round trip each.
+        event.listen(sync_engine, "begin", self._count("transactions"))
+        event.listen(sync_engine, "commit", self._count("transactions"))
+        event.listen(sync_engine, "rollback", self._count("transactions"))
+        event.listen(sync_engine.pool, "checkout", self._count("pings"))
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+
+async def _connect() -> asyncpg.Connection:
+    dsn = make_url(settings.database_url).set(drivername="postgresql")
+    return await asyncpg.connect(dsn.render_as_string(hide_password=False))
+
+
+async def _seed(conn: asyncpg.Connection, events: int) -> uuid.UUID:
+    # One user, a PAID order per event and its order.paid event, all loaded with COPY.
+    # In one transaction, so a failed seed leaves nothing behind for _teardown to miss.
+    user_id = uuid.uuid4()
+    now = datetime.now(timezone.utc)
+    order_ids = [uuid.uuid4() for _ in range(events)]
+    async with conn.transaction():
+        await conn.execute(
+            "INSERT INTO users (id, email, password_hash, created_at) "
+            "VALUES ($1, $2, '-', now())",
+            user_id,
+            f"bench-{user_id.hex}@example.invalid",
+        )
+        await conn.copy_records_to_table(
+            "orders",
+            columns=ORDER_COLUMNS,
+            records=((order_id, user_id, "PAID", 100, now, now) for order_id in order_ids),
+        )
+        # Consecutive created_at values keep the claim order the insert order.
+        await conn.copy_records_to_table(
+            "outbox_events",
+            columns=EVENT_COLUMNS,
+            records=(
+                (
+                    uuid.uuid4(),
+                    BENCH_TYPE,
+                    order_id,
+                    outbox_partition(str(order_id)),
+                    "order.paid",
+                    orjson.dumps({"order_id": str(order_id), "user_id": str(user_id)}).decode(),
+                    "PENDING",
+                    0,
+                    now + timedelta(microseconds=number),
+                    now + timedelta(microseconds=number),
+                )
+                for number, order_id in enumerate(order_ids)
+            ),
+        )
+    await conn.execute("ANALYZE orders")
+    await conn.execute("ANALYZE outbox_events")
+    return user_id
+
+
+async def _others_pending(conn: asyncpg.Connection) -> bool:
+    return await conn.fetchval(
+        "SELECT EXISTS (SELECT 1 FROM outbox_events WHERE aggregate_type <> $1 "
+        "AND status = 'PENDING')",
+        BENCH_TYPE,
+    )
+
+
+async def _skip_housekeeping() -> None:
+    return None
+
+
+async def _pending(conn: asyncpg.Connection) -> int:
+    return await conn.fetchval(
+        "SELECT count(*) FROM outbox_events WHERE aggregate_type = $1 AND status = 'PENDING'",
+        BENCH_TYPE,
+    )
+
+
+async def _latencies(conn: asyncpg.Connection, drain_started: datetime) -> dict:
+    # Worker start -> processed_at, so seeding and ANALYZE are left out; every event is in the
+    # backlog from the start, so this includes the time spent waiting behind the events ahead.
+    row = await conn.fetchrow(
+        """
+        SELECT count(*) FILTER (WHERE status = 'PROCESSED') AS processed,
+               count(*) FILTER (WHERE status = 'DEAD') AS dead,
+               percentile_cont(ARRAY[0.5, 0.95, 0.99]) WITHIN GROUP (
+                   ORDER BY extract(epoch FROM processed_at - $2)
+               ) FILTER (WHERE status = 'PROCESSED') AS latencies
+        FROM outbox_events WHERE aggregate_type = $1
+        """,
+        BENCH_TYPE,
+        drain_started,
+    )
+    p50, p95, p99 = row["latencies"] or (None, None, None)
+    return {
+        "processed": row["processed"],
+        "dead": row["dead"],
+        "latency_ms": {
+            name: None if value is None else round(value * 1000, 1)
+            for name, value in (("p50", p50), ("p95", p95), ("p99", p99))
+        },
+    }
+
+
+async def _teardown(conn: asyncpg.Connection, user_id: uuid.UUID) -> None:
+    async with conn.transaction():
+        await conn.execute("DELETE FROM outbox_events WHERE aggregate_type = $1", BENCH_TYPE)
+        await conn.execute("DELETE FROM orders WHERE user_id = $1", user_id)
+        await conn.execute("DELETE FROM users WHERE id = $1", user_id)
+
+
+async def bench(
+    events: int, batch_size: int, batch_size_max: int, concurrency: int, timeout: float
+) -> dict:
+    # The claim size starts at batch_size and adapts up to batch_size_max (equal pins it).
+    settings.worker_batch_size = batch_size
+    settings.worker_batch_size_max = max(batch_size, batch_size_max)
+    settings.worker_concurrency = concurrency
+    settings.worker_metrics_port = 0
+    settings.worker_metrics_textfile = ""
+
+    started_at = datetime.now(timezone.utc)
+    conn = await _connect()
+    user_id = None
+    try:
+        # worker_loop claims every due event, not only the bench's; refuse rather than process
+        # (and time) someone else's backlog.
+        if await _others_pending(conn):
+            raise SystemExit("outbox_events has PENDING events of its own; use an idle database")
+        seed_started = time.perf_counter()
+        user_id = await _seed(conn, events)
+        seed_seconds = time.perf_counter() - seed_started
+
+        round_trips = RoundTrips()
+        round_trips.attach()
+        process_due_events = worker_main.process_due_events
+        worker_main.process_due_events = round_trips.measure(process_due_events)
+        # The idempotency purge and partition retirement are not part of what is measured, and
+        # must not drop or archive anything in the target database on the bench's behalf.
+        housekeeping = worker_main.purge_idempotency_keys, worker_main.maintain_outbox_partitions
+        worker_main.purge_idempotency_keys = _skip_housekeeping
+        worker_main.maintain_outbox_partitions = _skip_housekeeping
+        drain_started = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        worker = asyncio.create_task(worker_main.worker_loop())
+        try:
+            while await _pending(conn):
+                if worker.done():
+                    worker.result()
+                if time.perf_counter() - started > timeout:
+                    raise TimeoutError(f"backlog not drained within {timeout}s")
+                await asyncio.sleep(0.05)
+            elapsed = time.perf_counter() - started
+        finally:
+            worker.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await worker
+            worker_main.process_due_events = process_due_events
+            (
+                worker_main.purge_idempotency_keys,
+                worker_main.maintain_outbox_partitions,
+            ) = housekeeping
+
+        outcome = await _latencies(conn, drain_started)
+        return {
+            "started_at": started_at.isoformat(),
+            "params": {
+                "events": events,
+                "batch_size": batch_size,
+                "batch_size_max": settings.worker_batch_size_max,
+                "concurrency": concurrency,
+            },
+            "seed_seconds": round(seed_seconds, 2),
+            "drain_seconds": round(elapsed, 3),
+            "events_per_second": round(events / elapsed, 1),
+            **outcome,
+            "round_trips": {
+                **round_trips.counts,
+                "total": round_trips.total,
+                "per_event": round(round_trips.total / events, 2),
+            },
+        }
+    finally:
+        if user_id is not None:
+            await _teardown(conn, user_id)
+        await conn.close()
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Outbox worker throughput: seeds order.paid events with COPY, runs the "
+        "worker until they are drained and reports JSON (bench rows are deleted afterwards)."
+    )
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--batch-size", type=int, default=settings.worker_batch_size)
+    parser.add_argument("--batch-size-max", type=int, default=settings.worker_batch_size_max)
+    parser.add_argument("--concurrency", type=int, default=settings.worker_concurrency)
+    parser.add_argument("--timeout", type=float, default=600.0, help="seconds to drain")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+    report = asyncio.run(
+        bench(args.events, args.batch_size, args.batch_size_max, args.concurrency, args.timeout)
+    )
+    data = orjson.dumps(report, option=orjson.OPT_INDENT_2)
+    print(data.decode())
+    if args.output:
+        with open(args.output, "wb") as handle:
+            handle.write(data + b"\n")
+
+
+if __name__ == "__main__":
+    main()
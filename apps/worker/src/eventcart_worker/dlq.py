@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import argparse
+import uuid
+from datetime import datetime, timezone
+
+import orjson
+
+from eventcart.db.session import SessionLocal
+from eventcart.services.dead_letter_service import count_dead, get_event, list_dead, requeue_dead
+
+
+def _timestamp(value: str) -> datetime:
+    # ISO 8601; without an offset the value is taken as UTC.
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _add_filters(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--type", dest="event_type", help="event_type, e.g. order.paid")
+    parser.add_argument("--since", type=_timestamp, help="created at or after (ISO 8601)")
+    parser.add_argument("--until", type=_timestamp, help="created before (ISO 8601)")
+    parser.add_argument(
+        "--error", dest="error_pattern", help="last_error ILIKE pattern, e.g. '%%timeout%%'"
+    )
+
+
+def add_parser(subparsers) -> None:
+    dlq = subparsers.add_parser("dlq", help="inspect and replay DEAD outbox events")
+    commands = dlq.add_subparsers(dest="dlq_command", required=True)
+
+    listing = commands.add_parser("list", help="list DEAD events, oldest first")
+    _add_filters(listing)
+    listing.add_argument("--limit", type=int, default=50)
+    listing.add_argument("--offset", type=int, default=0)
+
+    counting = commands.add_parser("count", help="count DEAD events per event_type")
+    _add_filters(counting)
+
+    show = commands.add_parser("show", help="print one event in full")
+    show.add_argument("event_id", type=uuid.UUID)
+
+    requeue = commands.add_parser("requeue", help="put DEAD events back to PENDING")
+    _add_filters(requeue)
+    requeue.add_argument("--batch-size", type=int, default=500)
+    requeue.add_argument(
+        "--rate", type=float, default=200.0, help="events per second; 0 disables the limit"
+    )
+    requeue.add_argument("--limit", type=int, help="stop after this many events")
+    requeue.add_argument("--dry-run", action="store_true", help="only count what would be requeued")
+
+
+def _filters(args: argparse.Namespace) -> dict:
+    return {
+        "event_type": args.event_type,
+        "since": args.since,
+        "until": args.until,
+        "error_pattern": args.error_pattern,
+    }
+
+
+async def run(args: argparse.Namespace) -> int:
+    if args.dlq_command == "requeue" and not args.dry_run:
+        requeued = await requeue_dead(
+            batch_size=args.batch_size,
+            rate_per_second=args.rate or None,
+            limit=args.limit,
+            **_filters(args),
+        )
+        print(f"requeued {requeued}")
+        return 0
+
+    async with SessionLocal() as session:
+        if args.dlq_command == "show":
+            event = await get_event(session, str(args.event_id))
+            if event is None:
+                print(f"no event {args.event_id}")
+                return 1
+            row = {column: getattr(event, column) for column in event.__table__.columns.keys()}
+            print(orjson.dumps(row, default=str, option=orjson.OPT_INDENT_2).decode())
+        elif args.dlq_command == "list":
+            for event in await list_dead(session, args.limit, args.offset, **_filters(args)):
+                error = (event.last_error or "").replace("\n", " ")[:80]
+                print(
+                    f"{event.id}\t{event.created_at.isoformat()}\t{event.event_type}\t"
+                    f"{event.attempt_count}\t{error}"
+                )
+        else:
+            counts = await count_dead(session, **_filters(args))
+            for event_type, count in counts.items():
+                print(f"{event_type}\t{count}")
+            if args.dlq_command == "count":
+                print(f"total\t{sum(counts.values())}")
+            else:
+                print(f"would requeue {sum(counts.values())}")
+    return 0
@@ -1,46 +1,322 @@
 from __future__ import annotations
 
+import argparse
 import asyncio
-from datetime import datetime, timezone
+import functools
+import os
+import signal
+import socket
+import time
+import uuid
 
+import asyncpg
 import structlog
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.engine import make_url
 
 from eventcart.core.logging import configure_logging
+from eventcart.core.metrics import registry
 from eventcart.core.settings import settings
 from eventcart.db.session import SessionLocal
-from eventcart.services.processor import handle_outbox_event
-from eventcart.services.outbox_service import claim_due_events, mark_failed, mark_processed
+from eventcart.repo.outbox_repo import OUTBOX_CHANNEL
+from eventcart.services.idempotency_service import purge_expired_keys
+from eventcart.services.outbox_batching import AdaptiveBatchSize, DrainRate
+from eventcart.services.outbox_dispatcher import process_due_events
+from eventcart.services.outbox_metrics import BATCH_SIZE, refresh_outbox_gauges
+from eventcart.services.outbox_partitions import leave_partitions, refresh_partition_leases
+from eventcart.services.outbox_relay import relay_due_deliveries
+from eventcart.services.outbox_retention import maintain_outbox_partitions
+from eventcart.services.outbox_service import count_backlog, seconds_until_next_due
+from eventcart.services.outbox_sinks import create_sink
+from eventcart.services.subscription_dispatcher import (
+    process_due_deliveries,
+    seconds_until_next_delivery,
+)
+from eventcart.services.subscriptions import RELAY_SUBSCRIPTION, registered_subscriptions
+from eventcart_worker import dlq
+from eventcart_worker.metrics import start_metrics_server, write_textfile
+from eventcart_worker.supervisor import process_count, supervise
 
 logger = structlog.get_logger()
 
 
-async def worker_loop() -> None:
-    configure_logging(settings.api_log_level)
-    logger.info("worker.started")
+class OutboxWakeup:
+    # Dedicated LISTEN connection outside the SQLAlchemy pool; notifications set an event the
+    # idle loop waits on.
+    def __init__(self) -> None:
+        self._event = asyncio.Event()
+        self._conn: asyncpg.Connection | None = None
+
+    @property
+    def listening(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    async def connect(self) -> None:
+        if self.listening or not settings.worker_listen_enabled:
+            return
+        dsn = make_url(settings.database_url).set(drivername="postgresql")
+        try:
+            self._conn = await asyncpg.connect(dsn.render_as_string(hide_password=False))
+            await self._conn.add_listener(OUTBOX_CHANNEL, self._notified)
+        except (OSError, asyncpg.PostgresError) as exc:
+            self._conn = None
+            logger.warning("worker.listen_failed", error=str(exc))
+            return
+        # Anything committed while we were not listening is picked up by the next poll.
+        self._event.set()
+        logger.info("worker.listening", channel=OUTBOX_CHANNEL)
+
+    def _notified(self, *args) -> None:
+        self._event.set()
+
+    def wake(self) -> None:
+        self._event.set()
+
+    def clear(self) -> None:
+        self._event.clear()
+
+    async def wait(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+
+async def _idle_timeout(wakeup: OutboxWakeup, subscription: str | None = None) -> float:
+    if not wakeup.listening:
+        return settings.worker_poll_interval_seconds
+    async with SessionLocal() as session:
+        if subscription is None:
+            due_in = await seconds_until_next_due(session)
+        else:
+            due_in = await seconds_until_next_delivery(session, subscription)
+    if due_in is None:
+        return settings.worker_fallback_poll_seconds
+    if due_in == 0:
+        # Due but not claimable: claimed by another worker or in partitions owned by one.
+        return settings.worker_poll_interval_seconds
+    return min(due_in, settings.worker_fallback_poll_seconds)
+
+
+async def purge_idempotency_keys() -> int:
+    # Small transactions, one chunk each, so no purge holds row locks for long.
+    purged = 0
     while True:
-        events = []
         async with SessionLocal() as session:
             async with session.begin():
-                events = await claim_due_events(session, batch_size=10)
-                for event in events:
-                    try:
-                        await handle_outbox_event(session, event)
-                        await mark_processed(session, event)
-                    except Exception as exc:  # noqa: BLE001
-                        attempt = event.attempt_count + 1
-                        await mark_failed(
-                            session,
-                            event,
-                            attempt,
-                            str(exc)[:1000],
-                            settings.worker_max_attempts,
-                        )
-        if not events:
-            await asyncio.sleep(settings.worker_poll_interval_seconds)
-        else:
-            await asyncio.sleep(0)
+                deleted = await purge_expired_keys(session)
+        purged += deleted
+        if deleted < settings.idempotency_purge_batch_size:
+            break
+        await asyncio.sleep(0)
+    if purged:
+        logger.info("idempotency.purged", count=purged)
+    return purged
+
+
+async def _refresh_partitions(consumer_id: str, current: list[int]) -> list[int]:
+    async with SessionLocal() as session:
+        async with session.begin():
+            partitions = await refresh_partition_leases(session, consumer_id)
+    if partitions != current:
+        logger.info("worker.partitions", consumer_id=consumer_id, partitions=partitions)
+    return partitions
+
+
+async def _leave(consumer_id: str) -> None:
+    async with SessionLocal() as session:
+        async with session.begin():
+            await leave_partitions(session, consumer_id)
+
+
+def _metrics_textfile(index: int | None) -> str:
+    # Under the supervisor every process writes its own file: worker.prom -> worker-3.prom.
+    path = settings.worker_metrics_textfile
+    if not path or index is None:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}-{index}{extension}"
+
+
+async def _report(
+    batch: AdaptiveBatchSize,
+    drain: DrainRate,
+    partitions: list[int],
+    textfile: str,
+    index: int | None,
+) -> None:
+    async with SessionLocal() as session:
+        backlog = await count_backlog(session, partitions)
+        # The gauges describe the whole outbox, so one process per host refreshes them rather
+        # than every process repeating the same queries.
+        if not index:
+            await refresh_outbox_gauges(session)
+    if textfile:
+        write_textfile(textfile)
+    handled, rate = drain.take()
+    if handled or backlog:
+        logger.info(
+            "worker.throughput",
+            batch_size=batch.size,
+            backlog=backlog,
+            backlog_capped=backlog >= settings.worker_stats_count_limit,
+            handled=handled,
+            drain_rate=round(rate, 1),
+            eta_seconds=round(backlog / rate) if rate else None,
+        )
+
+
+def _stop_on_signals(consumer_id: str, wakeup: OutboxWakeup) -> asyncio.Event:
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    def _request_stop() -> None:
+        # The pass in progress runs to the end; a second signal gets the default behaviour.
+        logger.info("worker.stopping", consumer_id=consumer_id)
+        stopping.set()
+        wakeup.wake()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.remove_signal_handler(signum)
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, _request_stop)
+    return stopping
+
+
+async def worker_loop(index: int | None = None) -> None:
+    # ``index`` is set when running under the supervisor: one worker process out of several.
+    configure_logging(settings.api_log_level)
+    consumer_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    logger.info("worker.started", consumer_id=consumer_id, worker=index)
+    wakeup = OutboxWakeup()
+    stopping = _stop_on_signals(consumer_id, wakeup)
+    partitions: list[int] = []
+    next_lease_at = 0.0
+    next_purge_at = 0.0
+    next_maintenance_at = 0.0
+    batch = AdaptiveBatchSize()
+    drain = DrainRate()
+    next_stats_at = 0.0
+    textfile = _metrics_textfile(index)
+    metrics_server = None
+    if settings.worker_metrics_port:
+        port = settings.worker_metrics_port + (index or 0)
+        metrics_server = await start_metrics_server(port)
+    try:
+        while not stopping.is_set():
+            await wakeup.connect()
+            if time.monotonic() >= next_lease_at:
+                partitions = await _refresh_partitions(consumer_id, partitions)
+                next_lease_at = time.monotonic() + settings.worker_lease_seconds / 3
+            if time.monotonic() >= next_purge_at:
+                await purge_idempotency_keys()
+                next_purge_at = time.monotonic() + settings.idempotency_purge_interval_seconds
+            if time.monotonic() >= next_maintenance_at:
+                await maintain_outbox_partitions()
+                interval = settings.outbox_maintenance_interval_seconds
+                next_maintenance_at = time.monotonic() + interval
+            # Cleared before claiming, so a notification arriving mid-batch triggers another pass.
+            wakeup.clear()
+            started = time.monotonic()
+            handled = await process_due_events(
+                batch_size=batch.size, partitions=partitions, owner=consumer_id
+            )
+            previous = batch.size
+            if batch.observe(handled, time.monotonic() - started) != previous:
+                logger.debug("worker.batch_size", batch_size=batch.size, previous=previous)
+            BATCH_SIZE.set(batch.size)
+            drain.add(handled)
+            if time.monotonic() >= next_stats_at:
+                await _report(batch, drain, partitions, textfile, index)
+                next_stats_at = time.monotonic() + settings.worker_stats_interval_seconds
+            if stopping.is_set():
+                break
+            if not handled:
+                timeout = await _idle_timeout(wakeup)
+                await wakeup.wait(min(timeout, max(0.0, next_lease_at - time.monotonic())))
+            else:
+                await asyncio.sleep(0)
+    finally:
+        if metrics_server is not None:
+            metrics_server.close()
+        await wakeup.close()
+        await _leave(consumer_id)
+        logger.info("worker.stopped", consumer_id=consumer_id)
+
+
+async def subscription_loop(subscription: str, index: int | None = None) -> None:
+    # A pool of its own for one named subscription: only its deliveries, none of the outbox
+    # housekeeping, which the main workers do.
+    configure_logging(settings.api_log_level)
+    consumer_id = f"{subscription}@{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    logger.info("worker.started", consumer_id=consumer_id, subscription=subscription, worker=index)
+    # The relay publishes its deliveries to a sink rather than running a handler.
+    sink = None
+    if subscription == RELAY_SUBSCRIPTION:
+        sink = create_sink(settings.outbox_relay_url)
+    wakeup = OutboxWakeup()
+    stopping = _stop_on_signals(consumer_id, wakeup)
+    try:
+        while not stopping.is_set():
+            await wakeup.connect()
+            wakeup.clear()
+            if sink is not None:
+                handled = await relay_due_deliveries(sink, owner=consumer_id)
+            else:
+                handled = await process_due_deliveries(subscription, owner=consumer_id)
+            if stopping.is_set():
+                break
+            if not handled:
+                await wakeup.wait(await _idle_timeout(wakeup, subscription))
+            else:
+                await asyncio.sleep(0)
+    finally:
+        if sink is not None:
+            await sink.close()
+        await wakeup.close()
+        logger.info("worker.stopped", consumer_id=consumer_id)
+
+
+def run_worker(index: int | None = None, subscription: str | None = None) -> None:
+    if index is not None:
+        # Processes export the same series; the label keeps them apart.
+        registry.common_labels = {"worker": str(index)}
+    if subscription is not None:
+        asyncio.run(subscription_loop(subscription, index))
+        return
+    asyncio.run(worker_loop(index))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="EventCart outbox worker.")
+    subparsers = parser.add_subparsers(dest="command")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        help="worker processes (default WORKER_PROCESSES; 0 = one per CPU, 1 = no supervisor)",
+    )
+    parser.add_argument(
+        "--subscription",
+        choices=registered_subscriptions(),
+        help="deliver one named subscription instead of running the outbox handlers",
+    )
+    dlq.add_parser(subparsers)
+    args = parser.parse_args()
+    if args.command == "dlq":
+        raise SystemExit(asyncio.run(dlq.run(args)))
+    if args.subscription == RELAY_SUBSCRIPTION and not settings.outbox_relay_url:
+        parser.error("the relay subscription needs OUTBOX_RELAY_URL")
+    processes = process_count(args.processes)
+    if processes == 1:
+        run_worker(subscription=args.subscription)
+        return
+    configure_logging(settings.api_log_level)
+    supervise(functools.partial(run_worker, subscription=args.subscription), processes)
 
 
 if __name__ == "__main__":
-    asyncio.run(worker_loop())
+    main()
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import asyncio
+import os
+
+from eventcart.core.metrics import registry
+
+CONTENT_TYPE = b"text/plain; version=0.0.4; charset=utf-8"
+
+
+async def _respond(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    # Just enough HTTP for a Prometheus scrape: GET /metrics, one response, close.
+    try:
+        request = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request.split()
+        if len(parts) >= 2 and parts[0] == b"GET" and parts[1].split(b"?")[0] == b"/metrics":
+            status, body = b"200 OK", registry.render().encode()
+        else:
+            status, body = b"404 Not Found", b"not found\n"
+        writer.write(
+            b"HTTP/1.1 " + status + b"\r\nContent-Type: " + CONTENT_TYPE
+            + b"\r\nContent-Length: " + str(len(body)).encode()
+            + b"\r\nConnection: close\r\n\r\n" + body
+        )
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(port: int) -> asyncio.Server:
+    return await asyncio.start_server(_respond, host="0.0.0.0", port=port)
+
+
+def write_textfile(path: str) -> None:
+    # Written aside and renamed, so the collector never reads a half-written file.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        handle.write(registry.render())
+    os.replace(tmp_path, path)
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import signal
+import time
+from collections.abc import Callable
+from multiprocessing.connection import wait
+
+import structlog
+
+from eventcart.core.settings import settings
+
+logger = structlog.get_logger()
+
+# Fresh interpreters rather than forks, so no engine, pool or event loop of the parent is shared.
+_context = multiprocessing.get_context("spawn")
+
+# A child that crashes soon after starting is restarted after 1s, 2s, 4s ... up to the cap; one
+# that ran for a while before exiting is restarted after the first step again.
+RESTART_DELAY_MIN = 1.0
+RESTART_DELAY_MAX = 30.0
+STABLE_AFTER_SECONDS = 60.0
+
+
+def process_count(requested: int | None = None) -> int:
+    processes = settings.worker_processes if requested is None else requested
+    if processes > 0:
+        return processes
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _size_child_pools() -> None:
+    # Children read their settings afresh; unless configured, each gets a pool for its own
+    # handlers instead of the API-sized default times the number of processes.
+    if "db_pool_size" not in settings.model_fields_set:
+        os.environ["DB_POOL_SIZE"] = str(settings.worker_concurrency)
+    if "db_max_overflow" not in settings.model_fields_set:
+        os.environ["DB_MAX_OVERFLOW"] = "2"
+
+
+def _start(target: Callable[[int], None], index: int) -> multiprocessing.Process:
+    child = _context.Process(target=target, args=(index,), name=f"eventcart-worker-{index}")
+    child.start()
+    logger.info("supervisor.child_started", worker=index, pid=child.pid)
+    return child
+
+
+def _stop_children(children: dict[int, multiprocessing.Process]) -> None:
+    # SIGTERM lets every child finish the batch it is on; whatever is still running at the
+    # deadline is killed and its leased events go back to the queue when the leases expire.
+    for child in children.values():
+        if child.is_alive():
+            child.terminate()
+    deadline = time.monotonic() + settings.worker_shutdown_seconds
+    for index, child in children.items():
+        child.join(max(0.0, deadline - time.monotonic()))
+        if child.is_alive():
+            logger.warning("supervisor.child_killed", worker=index, pid=child.pid)
+            child.kill()
+            child.join()
+
+
+def supervise(target: Callable[[int], None], processes: int) -> None:
+    stopping = False
+
+    def _request_stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+    _size_child_pools()
+    logger.info("supervisor.started", processes=processes)
+
+    children = {index: _start(target, index) for index in range(processes)}
+    started_at = dict.fromkeys(children, time.monotonic())
+    delays: dict[int, float] = {}
+    restart_at: dict[int, float] = {}
+    try:
+        while not stopping:
+            sentinels = [child.sentinel for child in children.values() if child.is_alive()]
+            if sentinels:
+                wait(sentinels, timeout=1.0)
+            else:
+                time.sleep(1.0)
+            now = time.monotonic()
+            for index, child in children.items():
+                if stopping or child.is_alive():
+                    continue
+                if index not in restart_at:
+                    if now - started_at[index] >= STABLE_AFTER_SECONDS:
+                        delays[index] = RESTART_DELAY_MIN
+                    else:
+                        delays[index] = min(
+                            delays.get(index, RESTART_DELAY_MIN / 2) * 2, RESTART_DELAY_MAX
+                        )
+                    restart_at[index] = now + delays[index]
+                    logger.warning(
+                        "supervisor.child_exited",
+                        worker=index,
+                        pid=child.pid,
+                        exitcode=child.exitcode,
+                        restart_in=delays[index],
+                    )
+                elif now >= restart_at[index]:
+                    del restart_at[index]
+                    children[index] = _start(target, index)
+                    started_at[index] = now
+    finally:
+        logger.info("supervisor.stopping", processes=processes)
+        _stop_children(children)
+        logger.info("supervisor.stopped")